@@ -1,13 +1,22 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import re
 import os
-import requests
-from bs4 import BeautifulSoup
+import time
+
+from school_selector.article_images import ArticleImageFetcher
+from school_selector.card_renderer import AD_HTML, CardRenderer
+from school_selector.charts import CHART_SPECS, MAX_COMPARISON_SCHOOLS, ChartCache
+from school_selector.data_loader import get_data_source
+from school_selector.dataset import REFRESH_INTERVAL, DatasetRefresher, load_dataset
+from school_selector.feature_tags import FEATURE_MAPPING
+from school_selector.prefetch_articles import load_manifest
+from school_selector.query_cache import QueryCache, canonicalize_filters
+from school_selector.similarity import similar_schools
+from school_selector.timing import SIDEBAR_ENABLED, record_span, register_gauge, span, start_metrics_server, start_rerun
 
 # --- Streamlit 應用程式介面 ---
 st.set_page_config(page_title="「01教育」小學概覽搜尋器", layout="centered")
+rerun_timer = start_rerun()
 st.title('「01教育」小學概覽搜尋器')
 st.markdown(
     '<div style="border: 2px dashed #cccccc; padding: 20px; text-align: center; margin-top: 20px; margin-bottom: 20px;">廣告空間</div>',
@@ -20,222 +29,195 @@ if 'page' not in st.session_state:
     st.session_state.page = 0
 if 'active_filters_cache' not in st.session_state:
     st.session_state.active_filters_cache = None
+if 'query_cache_stats' not in st.session_state:
+    st.session_state.query_cache_stats = {'hits': 0, 'misses': 0}
 
-# --- 獲取文章 Meta Data 的快取函式 ---
-@st.cache_data(ttl=3600)
-def get_article_metadata(url):
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        og_image_tag = soup.find('meta', property='og:image')
-        
-        if og_image_tag and og_image_tag.get('content'):
-            return og_image_tag['content']
-            
-    except requests.RequestException:
-        return None
-    return None
-
-# --- 文字處理函式 ---
-def format_and_highlight_text(text, keywords):
-    text_str = str(text).strip()
-    if not text_str: return ""
-    list_marker_pattern = re.compile(r'(\s*[（(]?\d+[.)）]\s*|\s*[①②③④⑤⑥⑦⑧⑨⑩]\s*)')
-    parts = list_marker_pattern.split(text_str)
-    html_output = f'<p style="margin:0; padding:0;">{parts[0]}'
-    for i in range(1, len(parts), 2):
-        if i + 1 < len(parts):
-            marker = parts[i].strip(); content = parts[i+1].strip()
-            html_output += f'<div style="margin-left: 2em; text-indent: -2em; padding-top: 5px;">{marker} {content}</div>'
-    html_output += '</p>'
-    if keywords:
-        flat_keywords = []
-        for item in keywords:
-            if isinstance(item, list):
-                flat_keywords.extend(item)
-            else:
-                flat_keywords.append(item)
-        
-        pattern = '|'.join([re.escape(keyword) for keyword in flat_keywords])
-        if pattern:
-            html_output = re.sub(
-                pattern,
-                lambda match: f'<span style="background-color: yellow;">{match.group(0)}</span>',
-                html_output,
-                flags=re.IGNORECASE
-            )
-    return html_output
-
-# --- 核心功能函式 (處理資料) ---
-@st.cache_data
-def process_dataframe(df, articles_df=None):
-    df.replace('-', '沒有', inplace=True)
-
-    if articles_df is not None and not articles_df.empty:
-        if '學校名稱' in articles_df.columns and '文章標題' in articles_df.columns and '文章連結' in articles_df.columns:
-            articles_df.dropna(subset=['文章標題', '文章連結'], inplace=True)
-            articles_grouped = articles_df.groupby('學校名稱').apply(
-                lambda x: list(zip(x['文章標題'], x['文章連結']))
-            ).reset_index(name='articles')
-            df = pd.merge(df, articles_grouped, on='學校名稱', how='left')
-            df['articles'] = df['articles'].apply(lambda x: x if isinstance(x, list) else [])
-        else:
-            st.warning("Excel 檔案中的「相關文章」工作表缺少必要的欄位（學校名稱, 文章標題, 文章連結），將忽略相關文章。")
-            df['articles'] = [[] for _ in range(len(df))]
-    else:
-        df['articles'] = [[] for _ in range(len(df))]
-    
-    df['full_text_search'] = df.astype(str).agg(' '.join, axis=1)
-
-    text_columns_for_features = [
-        '學校關注事項', '學習和教學策略', '小學教育課程更新重點的發展', '共通能力的培養', '正確價值觀、態度和行為的培養',
-        '全校參與照顧學生的多樣性', '全校參與模式融合教育', '非華語學生的教育支援', '課程剪裁及調適措施',
-        '家校合作', '校風', '學校發展計劃', '教師專業培訓及發展', '其他未來發展', '辦學宗旨', '全方位學習', '特別室', '其他學校設施'
-    ]
-    existing_feature_columns = [col for col in text_columns_for_features if col in df.columns]
-    df['features_text'] = df[existing_feature_columns].fillna('').astype(str).agg(' '.join, axis=1)
-    percentage_cols = [
-        '已接受師資培訓(佔全校教師人數%)', '學士(佔全校教師人數%)', '碩士、博士或以上 (佔全校教師人數%)', '特殊教育培訓 (佔全校教師人數%)',
-        '0-4年資 (佔全校教師人數%)', '5-9年資(佔全校教師人數%)', '10年或以上年資 (佔全校教師人數%)'
-    ]
-    for col in percentage_cols:
-        if col in df.columns:
-            s = pd.to_numeric(df[col].astype(str).str.replace('%', '', regex=False), errors='coerce').fillna(0)
-            if not s.empty and s.max() > 0 and s.max() <= 1: s = s * 100
-            df[col] = s.round(1)
-    
-    teacher_count_cols = ['核准編制教師職位數目', '全校教師總人數']
-    for col in teacher_count_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    exam_count_cols = [
-        '一年級全年全科測驗次數', '一年級全年全科考試次數',
-        '二至六年級全年全科測驗次數', '二至六年級全年全科考試次數'
-    ]
-    for col in exam_count_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-            
-    yes_no_cols = {
-        '小一上學期以多元化的進展性評估代替測驗及考試': 'p1_no_exam_assessment',
-        '避免緊接在長假期後安排測考，讓學生在假期有充分的休息': 'avoid_holiday_exams',
-        '按校情靈活編排時間表，盡量在下午安排導修時段，讓學生能在教師指導下完成部分家課': 'afternoon_tutorial',
-        '家教會': 'has_pta'
-    }
-    for col, new_name in yes_no_cols.items():
-        if col in df.columns:
-            df[new_name] = df[col].apply(lambda x: '是' if str(x).strip().lower() in ['有', 'yes'] else '否')
-    
-    if '學校類別' in df.columns:
-        def standardize_category(cat):
-            cat_str = str(cat)
-            if '官立' in cat_str: return '官立'
-            if '直資' in cat_str: return '直資'
-            if '資助' in cat_str: return '資助'
-            if '私立' in cat_str: return '私立'
-            return cat
-        df['學校類別'] = df['學校類別'].apply(standardize_category)
-
-    bus_series = df['校車服務'].fillna('沒有').astype(str) if '校車服務' in df.columns else pd.Series('沒有', index=df.index)
-    has_bus_data = bus_series.str.strip().isin(['', '沒有']) == False
-    df['has_school_bus'] = '否'
-    df.loc[has_bus_data, 'has_school_bus'] = '是'
-    df['bus_service_text'] = '沒有'
-    cond_both = bus_series.str.contains("校車") & bus_series.str.contains("保姆車")
-    cond_bus_only = bus_series.str.contains("校車") & ~bus_series.str.contains("保姆車")
-    cond_nanny_only = ~bus_series.str.contains("校車") & bus_series.str.contains("保姆車")
-    df.loc[cond_both, 'bus_service_text'] = '有校車及保姆車'
-    df.loc[cond_bus_only, 'bus_service_text'] = '有校車'
-    df.loc[cond_nanny_only, 'bus_service_text'] = '有保姆車'
-    
-    feeder_cols = ['一條龍中學', '直屬中學', '聯繫中學']
-    existing_feeder_cols = [col for col in feeder_cols if col in df.columns]
-    if existing_feeder_cols:
-         df['has_feeder_school'] = df[existing_feeder_cols].apply(
-            lambda row: '是' if any(pd.notna(val) and str(val).strip() not in ['', '沒有'] for val in row) else '否',
-            axis=1
+# --- 文章縮圖 (所有 session 共用連線池及磁碟快取) ---
+@st.cache_resource
+def get_article_image_fetcher():
+    return ArticleImageFetcher()
+
+# --- 預先抓取的縮圖清單 (只採用與目前資料版本相同的清單) ---
+@st.cache_resource(max_entries=2)
+def get_image_manifest(data_version):
+    return load_manifest(source_digest=data_version)
+
+# --- 資料來源更新 (設定 SCHOOL_SELECTOR_REFRESH_INTERVAL 後於背景檢查，所有 session 共用) ---
+@st.cache_resource
+def get_dataset_refresher(source):
+    return DatasetRefresher(source).start()
+
+# --- 搜尋結果快取 (所有 session 共用) ---
+@st.cache_resource
+def get_query_cache():
+    return QueryCache(maxsize=int(os.environ.get('SCHOOL_SELECTOR_QUERY_CACHE_SIZE', 256)))
+
+# --- 篩選選項的即時數目 (與搜尋結果分開快取，不計入搜尋快取命中率) ---
+@st.cache_resource
+def get_facet_count_cache():
+    return QueryCache(maxsize=int(os.environ.get('SCHOOL_SELECTOR_QUERY_CACHE_SIZE', 256)))
+
+# --- 結果卡片 (按資料版本快取，所有 session 共用) ---
+@st.cache_resource(max_entries=2)
+def get_card_renderer(_dataset, data_version):
+    return CardRenderer(_dataset)
+
+# --- 師資比例圖表 (figure JSON 按資料版本快取，所有 session 共用) ---
+@st.cache_resource
+def get_chart_cache():
+    return ChartCache()
+
+# --- 效能數據 (SCHOOL_SELECTOR_TIMING 等環境變數，見 school_selector/timing.py) ---
+@st.cache_resource
+def setup_metrics():
+    query_cache = get_query_cache()
+    image_fetcher = get_article_image_fetcher()
+    register_gauge('query_cache_hits', lambda: query_cache.hits)
+    register_gauge('query_cache_misses', lambda: query_cache.misses)
+    register_gauge('query_cache_entries', lambda: len(query_cache))
+    for source in image_fetcher.stats:
+        register_gauge(f'article_images_{source}', lambda source=source: image_fetcher.stats[source])
+    return start_metrics_server()
+
+def render_timing_sidebar(timer):
+    with st.sidebar:
+        st.markdown("#### ⏱️ 本次重跑效能")
+        st.dataframe(
+            pd.DataFrame([{'階段': name, '毫秒': round(seconds * 1000, 2)} for name, seconds in timer.spans]),
+            hide_index=True, use_container_width=True
         )
-    else:
-        df['has_feeder_school'] = '否'
-    return df
+        st.write(f"**總時間:** {timer.total * 1000:.1f} ms")
+        session_stats = st.session_state.query_cache_stats
+        session_total = session_stats['hits'] + session_stats['misses']
+        if session_total:
+            st.write(f"**搜尋快取命中率 (本 session):** {session_stats['hits'] / session_total:.0%} ({session_stats['hits']}/{session_total})")
+        cache_stats = get_query_cache().stats()
+        st.write(f"**搜尋快取命中率 (全部):** {cache_stats['hit_ratio']:.0%}，共 {cache_stats['size']} 項")
+        image_stats = get_article_image_fetcher().stats
+        st.write(f"**文章縮圖來源:** 清單 {image_stats['manifest']} / 快取 {image_stats['cache']} / 網絡 {image_stats['network']}")
+
+# --- 篩選器設定 ---
+# widget key -> 篩選條件類型 (見 school_selector/filter_engine.py)，次序即 active_filters 的次序
+BASIC_FILTER_KEYS = {
+    'category_select': 'category', 'gender_select': 'gender', 'religion_select': 'religion',
+    'language_select': 'language', 'body_select': 'body', 'feeder': 'feeder', 'bus': 'bus',
+    'district_select': 'district', 'net_select': 'net',
+}
+FEATURE_TAG_KEYS = ['features1', 'features2', 'features3']
+TEACHER_SLIDERS = [
+    {
+        '已接受師資培訓(佔全校教師人數%)': '師資培訓比例 (%)',
+        '學士(佔全校教師人數%)': '學士學歷比例 (%)',
+        '碩士、博士或以上 (佔全校教師人數%)': '碩士或以上學歷比例 (%)'
+    },
+    {
+        '0-4年資 (佔全校教師人數%)': '0-4年資比例 (%)',
+        '5-9年資(佔全校教師人數%)': '5-9年資比例 (%)',
+        '10年或以上年資 (佔全校教師人數%)': '10年以上年資比例 (%)'
+    },
+    {
+        '特殊教育培訓 (佔全校教師人數%)': '特殊教育培訓比例 (%)'
+    },
+]
+HOMEWORK_FILTER_KEYS = {
+    'p1_test': 'max_p1_tests', 'p2-6_test': 'max_p2_6_tests', 'p1_exam': 'max_p1_exams', 'p2-6_exam': 'max_p2_6_exams',
+    'p1_no_exam_radio': 'p1_no_exam', 'holiday': 'avoid_holiday', 'tutorial': 'afternoon_tut',
+}
+# widget key -> (範圍條件類型, 'min' 或 'max')：選項為數值，學費以元、時間以分鐘 (由午夜起計) 表示
+RANGE_FILTER_KEYS = {
+    'fee_max': ('fee', 'max'), 'start_time_min': ('start_time', 'min'), 'end_time_max': ('end_time', 'max'),
+    'site_area_min': ('site_area', 'min'), 'founded_min': ('founded', 'min'),
+}
+# 代表「不設此條件」的選項
+ANY_CHOICES = ('不限', '任何次數')
+
+def format_clock(minutes):
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{'上午' if hours < 12 else '下午'} {hours - 12 if hours > 12 else hours}:{minutes:02d}"
+
+def filters_from_state(state, columns):
+    active_filters = []
+    def add_choices(keys):
+        for key, filter_type in keys.items():
+            value = state.get(key)
+            if isinstance(value, list):
+                if value: active_filters.append((filter_type, value))
+            elif value is not None and value not in ANY_CHOICES:
+                active_filters.append((filter_type, value))
+    if state.get('name_search'): active_filters.append(('name', state['name_search']))
+    add_choices(BASIC_FILTER_KEYS)
+    if state.get('full_text_search'): active_filters.append(('full_text', state['full_text_search']))
+    selected_tags = [tag for key in FEATURE_TAG_KEYS for tag in state.get(key, [])]
+    if selected_tags: active_filters.append(('features', selected_tags))
+    for sliders in TEACHER_SLIDERS:
+        for col_name in sliders:
+            min_val = state.get(col_name, 0)
+            if col_name in columns and min_val > 0: active_filters.append(('slider', (col_name, min_val)))
+    add_choices(HOMEWORK_FILTER_KEYS)
+    for key, (filter_type, bound) in RANGE_FILTER_KEYS.items():
+        value = state.get(key)
+        if value is not None and value not in ANY_CHOICES:
+            active_filters.append((filter_type, (value, None) if bound == 'min' else (None, value)))
+    return active_filters
 
 # --- 主要應用程式邏輯 ---
 try:
-    DATA_URL = "https://raw.githubusercontent.com/kingyeung625/hk-school-selector/3f177778e7a09e9d890e77d07017c2a7364cebb1/school_data_with_articles.xlsx"
+    DATA_URL = get_data_source()
+    if rerun_timer is not None:
+        setup_metrics()
     
-    main_dataframe = pd.read_excel(DATA_URL, sheet_name='學校資料', engine='openpyxl')
+    # 整個進程共用同一份已處理的資料表及索引，以來源檔案的雜湊值作為版本，不會逐個 session 複製
+    with span('load_data'):
+        if REFRESH_INTERVAL > 0:
+            dataset = get_dataset_refresher(DATA_URL).dataset
+        else:
+            dataset = load_dataset(DATA_URL, warn=st.warning)
+        processed_df = dataset.table
+        data_version = dataset.version
+        filter_engine = dataset.filter_engine
     
-    try:
-        articles_dataframe = pd.read_excel(DATA_URL, sheet_name='相關文章', engine='openpyxl')
-    except Exception:
-        articles_dataframe = None
+    # 由 widget 狀態得出篩選條件：在 widget 建立前先取得本次重跑的條件，用於計算各選項的即時數目
+    facets = dataset.facets
+    with span('facet_counts'):
+        state_filters = filters_from_state(st.session_state, processed_df.columns)
+        facet_counts = get_facet_count_cache().get_or_compute(
+            (data_version, canonicalize_filters(state_filters)),
+            lambda: facets.live_counts(filter_engine, state_filters)
+        )
+
+    def format_facet(filter_type):
+        counts = facet_counts.get(filter_type, {})
+        return lambda option: option if option == '不限' else f"{option} ({counts.get(option, 0)})"
 
-    processed_df = process_dataframe(main_dataframe, articles_dataframe)
-    
-    active_filters = []
     with st.expander("📝 按學校名稱搜尋", expanded=True):
-        search_keyword = st.text_input("**輸入學校名稱關鍵字：**", key="name_search")
-        if search_keyword: active_filters.append(('name', search_keyword))
+        st.text_input("**輸入學校名稱關鍵字：**", key="name_search")
     with st.expander("ℹ️ 按學校基本資料搜尋", expanded=True):
         col1, col2, col3 = st.columns(3)
         with col1:
-            if '學校類別' in processed_df.columns:
-                cat_options = sorted(processed_df['學校類別'].dropna().unique())
-                selected_cats = st.multiselect("學校類別", options=cat_options, key="category_select")
-                if selected_cats: active_filters.append(('category', selected_cats))
-            if '學生性別' in processed_df.columns:
-                gender_options = sorted(processed_df['學生性別'].dropna().unique())
-                selected_genders = st.multiselect("學生性別", options=gender_options, key="gender_select")
-                if selected_genders: active_filters.append(('gender', selected_genders))
+            if 'category' in facets.facets:
+                st.multiselect("學校類別", options=facets.options('category'), format_func=format_facet('category'), key="category_select")
+            if 'gender' in facets.facets:
+                st.multiselect("學生性別", options=facets.options('gender'), format_func=format_facet('gender'), key="gender_select")
         with col2:
-            if '宗教' in processed_df.columns:
-                religion_options = sorted(processed_df['宗教'].dropna().unique())
-                selected_religions = st.multiselect("宗教", options=religion_options, key="religion_select")
-                if selected_religions: active_filters.append(('religion', selected_religions))
-            if '教學語言' in processed_df.columns:
-                lang_options = ['不限'] + sorted(processed_df['教學語言'].dropna().unique())
-                selected_lang = st.selectbox("教育語言", options=lang_options, key="language_select")
-                if selected_lang != '不限': active_filters.append(('language', selected_lang))
+            if 'religion' in facets.facets:
+                st.multiselect("宗教", options=facets.options('religion'), format_func=format_facet('religion'), key="religion_select")
+            if 'language' in facets.facets:
+                st.selectbox("教育語言", options=['不限'] + facets.options('language'), format_func=format_facet('language'), key="language_select")
         with col3:
-            if '辦學團體' in processed_df.columns:
-                body_counts = processed_df['辦學團體'].value_counts()
-                body_df = body_counts.reset_index()
-                body_df.columns = ['辦學團體', 'count']
-                body_df_sorted = body_df.sort_values(by=['count', '辦學團體'], ascending=[False, True])
-                
-                formatted_body_options = [
-                    f"{row['辦學團體']} ({row['count']})" for index, row in body_df_sorted.iterrows()
-                ]
-                
-                selected_formatted_bodies = st.multiselect("辦學團體", options=formatted_body_options, key="body_select")
-                
-                if selected_formatted_bodies:
-                    original_body_names = [item.rsplit(' (', 1)[0] for item in selected_formatted_bodies]
-                    active_filters.append(('body', original_body_names))
+            if 'body' in facets.facets:
+                # 選項按學校總數排列，括號內為目前條件下的數目
+                st.multiselect("辦學團體", options=facets.options('body'), format_func=format_facet('body'), key="body_select")
             
-            feeder_choice = st.radio("有關聯中學？", ['不限', '是', '否'], horizontal=True, key='feeder')
-            if feeder_choice != '不限': active_filters.append(('feeder', feeder_choice))
+            st.radio("有關聯中學？", ['不限', '是', '否'], format_func=format_facet('feeder'), horizontal=True, key='feeder')
             
-            bus_choice = st.radio("有校車或保姆車服務？", ['不限', '是', '否'], horizontal=True, key='bus')
-            if bus_choice != '不限': active_filters.append(('bus', bus_choice))
+            st.radio("有校車或保姆車服務？", ['不限', '是', '否'], format_func=format_facet('bus'), horizontal=True, key='bus')
             
     with st.expander("📍 按地區及校網搜尋", expanded=False):
         col1, col2 = st.columns(2)
         with col1:
-            all_districts = sorted(processed_df['地區'].dropna().unique()); selected_districts = st.multiselect("**選擇地區 (可多選)**", options=all_districts, key="district_select")
-            if selected_districts: active_filters.append(('district', selected_districts))
+            selected_districts = st.multiselect("**選擇地區 (可多選)**", options=facets.options('district'), format_func=format_facet('district'), key="district_select")
         with col2:
-            if selected_districts: available_nets = sorted(processed_df[processed_df['地區'].isin(selected_districts)]['校網'].dropna().unique())
-            else: available_nets = sorted(processed_df['校網'].dropna().unique())
-            selected_nets = st.multiselect("**選擇校網 (可多選)**", options=available_nets, key="net_select")
-            if selected_nets: active_filters.append(('net', selected_nets))
+            st.multiselect("**選擇校網 (可多選)**", options=facets.nets_for(selected_districts), format_func=format_facet('net'), key="net_select")
 
     st.markdown(
         '<div style="border: 2px dashed #cccccc; padding: 20px; text-align: center; margin-top: 20px; margin-bottom: 20px;">廣告空間</div>',
@@ -243,68 +225,53 @@ try:
     )
 
     with st.expander("🌟 按辦學特色搜尋", expanded=False):
-        full_search_term = st.text_input("輸入任何關鍵字搜尋全校資料 (例如：奧數、面試班):", key="full_text_search")
-        if full_search_term:
-            active_filters.append(('full_text', full_search_term))
+        st.text_input("輸入任何關鍵字搜尋全校資料 (例如：奧數、面試班):", key="full_text_search")
         st.markdown("---")
         st.markdown("**按預設標籤篩選：**")
 
-        feature_mapping = {"【教學模式與重點】": {"自主學習及探究": ['自主學習', '探究'],"STEAM": ['STEAM', '創客'], "電子學習": ['電子學習', 'e-learning'], "閱讀": ['閱讀'], "資優教育": ['資優'], "專題研習": ['專題研習'], "跨課程學習": ['跨課程'], "兩文三語": ['兩文三語'], "英文教育": ['英文'], "家校合作": ['家校合作'], "境外交流": ['境外交流'], "藝術": ['藝術'], "體育": ['體育']},"【價值觀與品德】": {"中華文化教育": ['中華文化'], "正向、價值觀、生命教育": ['正向', '價值觀', '生命教育'], "國民教育、國安教育": ['國民', '國安'], "服務教育": ['服務'], "關愛及精神健康": ['關愛', '健康']},"【學生支援與發展】": {"全人發展": ['全人發展', '多元發展'], "生涯規劃、啟發潛能": ['生涯規劃', '潛能'], "拔尖補底、照顧差異": ['拔尖補底', '個別差異'], "融合教育": ['融合教育']}}
-        col1, col2, col3 = st.columns(3); all_selected_options = []
-        with col1: selected1 = st.multiselect("教學模式與重點", options=list(feature_mapping["【教學模式與重點】"].keys()), key="features1"); all_selected_options.extend(selected1)
-        with col2: selected2 = st.multiselect("價值觀與品德", options=list(feature_mapping["【價值觀與品德】"].keys()), key="features2"); all_selected_options.extend(selected2)
-        with col3: selected3 = st.multiselect("學生支援與發展", options=list(feature_mapping["【學生支援與發展】"].keys()), key="features3"); all_selected_options.extend(selected3)
-        if all_selected_options: active_filters.append(('features', all_selected_options))
+        feature_mapping = FEATURE_MAPPING
+        format_tag = format_facet('features')
+        col1, col2, col3 = st.columns(3)
+        with col1: st.multiselect("教學模式與重點", options=list(feature_mapping["【教學模式與重點】"].keys()), format_func=format_tag, key="features1")
+        with col2: st.multiselect("價值觀與品德", options=list(feature_mapping["【價值觀與品德】"].keys()), format_func=format_tag, key="features2")
+        with col3: st.multiselect("學生支援與發展", options=list(feature_mapping["【學生支援與發展】"].keys()), format_func=format_tag, key="features3")
     
     with st.expander("🎓 按師資條件搜尋", expanded=False):
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            col1_sliders = {
-                '已接受師資培訓(佔全校教師人數%)': '師資培訓比例 (%)',
-                '學士(佔全校教師人數%)': '學士學歷比例 (%)',
-                '碩士、博士或以上 (佔全校教師人數%)': '碩士或以上學歷比例 (%)'
-            }
-            for col_name, slider_label in col1_sliders.items():
-                if col_name in processed_df.columns:
-                    min_val = st.slider(slider_label, 0, 100, 0, 5, key=col_name)
-                    if min_val > 0: active_filters.append(('slider', (col_name, min_val)))
-        with col2:
-            col2_sliders = {
-                '0-4年資 (佔全校教師人數%)': '0-4年資比例 (%)',
-                '5-9年資(佔全校教師人數%)': '5-9年資比例 (%)',
-                '10年或以上年資 (佔全校教師人數%)': '10年以上年資比例 (%)'
-            }
-            for col_name, slider_label in col2_sliders.items():
-                if col_name in processed_df.columns:
-                    min_val = st.slider(slider_label, 0, 100, 0, 5, key=col_name)
-                    if min_val > 0: active_filters.append(('slider', (col_name, min_val)))
-        with col3:
-            col3_sliders = {
-                '特殊教育培訓 (佔全校教師人數%)': '特殊教育培訓比例 (%)'
-            }
-            for col_name, slider_label in col3_sliders.items():
-                if col_name in processed_df.columns:
-                    min_val = st.slider(slider_label, 0, 100, 0, 5, key=col_name)
-                    if min_val > 0: active_filters.append(('slider', (col_name, min_val)))
+        for slider_col, sliders in zip(st.columns(len(TEACHER_SLIDERS)), TEACHER_SLIDERS):
+            with slider_col:
+                for col_name, slider_label in sliders.items():
+                    if col_name in processed_df.columns:
+                        st.slider(slider_label, 0, 100, 0, 5, key=col_name)
 
     with st.expander("📚 按課業安排搜尋", expanded=False):
         st.markdown("**評估次數**"); col1, col2 = st.columns(2)
         with col1:
-            max_p1_tests = st.selectbox('小一全年最多測驗次數', options=['任何次數', 0, 1, 2, 3, 4], index=0, key='p1_test')
-            if max_p1_tests != '任何次數': active_filters.append(('max_p1_tests', max_p1_tests))
-            max_p2_6_tests = st.selectbox('二至六年級最多測驗次數', options=['任何次數', 0, 1, 2, 3, 4], index=0, key='p2-6_test')
-            if max_p2_6_tests != '任何次數': active_filters.append(('max_p2_6_tests', max_p2_6_tests))
+            st.selectbox('小一全年最多測驗次數', options=['任何次數', 0, 1, 2, 3, 4], index=0, key='p1_test')
+            st.selectbox('二至六年級最多測驗次數', options=['任何次數', 0, 1, 2, 3, 4], index=0, key='p2-6_test')
         with col2:
-            max_p1_exams = st.selectbox('小一全年最多考試次數', options=['任何次數', 0, 1, 2, 3], index=0, key='p1_exam')
-            if max_p1_exams != '任何次數': active_filters.append(('max_p1_exams', max_p1_exams))
-            max_p2_6_exams = st.selectbox('二至六年級最多考試次數', options=['任何次數', 0, 1, 2, 3, 4], index=0, key='p2-6_exam')
-            if max_p2_6_exams != '任何次數': active_filters.append(('max_p2_6_exams', max_p2_6_exams))
-        st.markdown("**其他安排**"); p1_no_exam = st.radio("小一上學期以多元化評估代替測考？", ['不限', '是', '否'], horizontal=True, key="p1_no_exam_radio")
-        if p1_no_exam != '不限': active_filters.append(('p1_no_exam', p1_no_exam))
-        avoid_holiday = st.radio("避免長假後測考？", ['不限', '是', '否'], horizontal=True, key='holiday')
-        if avoid_holiday != '不限': active_filters.append(('avoid_holiday', avoid_holiday))
-        afternoon_tut = st.radio("設下午導修時段？", ['不限', '是', '否'], horizontal=True, key='tutorial')
-        if afternoon_tut != '不限': active_filters.append(('afternoon_tut', afternoon_tut))
+            st.selectbox('小一全年最多考試次數', options=['任何次數', 0, 1, 2, 3], index=0, key='p1_exam')
+            st.selectbox('二至六年級最多考試次數', options=['任何次數', 0, 1, 2, 3, 4], index=0, key='p2-6_exam')
+        st.markdown("**其他安排**"); st.radio("小一上學期以多元化評估代替測考？", ['不限', '是', '否'], format_func=format_facet('p1_no_exam'), horizontal=True, key="p1_no_exam_radio")
+        st.radio("避免長假後測考？", ['不限', '是', '否'], format_func=format_facet('avoid_holiday'), horizontal=True, key='holiday')
+        st.radio("設下午導修時段？", ['不限', '是', '否'], format_func=format_facet('afternoon_tut'), horizontal=True, key='tutorial')
+
+    with st.expander("🕒 按學費、上課時間及校舍搜尋", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.selectbox('每年學費上限', options=['不限', 0, 20000, 40000, 60000, 80000, 100000],
+                         format_func=lambda v: v if v == '不限' else ('免學費' if v == 0 else f"${v:,} 或以下"), key='fee_max')
+            st.selectbox('最早上學時間', options=['不限', 465, 480, 495, 510],
+                         format_func=lambda v: v if v == '不限' else f"{format_clock(v)} 或之後", key='start_time_min')
+            st.selectbox('最遲放學時間', options=['不限', 900, 915, 930, 945, 960],
+                         format_func=lambda v: v if v == '不限' else f"{format_clock(v)} 或之前", key='end_time_max')
+        with col2:
+            st.selectbox('學校佔地面積最少', options=['不限', 2000, 4000, 6000, 8000, 10000],
+                         format_func=lambda v: v if v == '不限' else f"{v:,} 平方米或以上", key='site_area_min')
+            st.selectbox('創校年份', options=['不限', 1950, 1970, 1990, 2000, 2010],
+                         format_func=lambda v: v if v == '不限' else f"{v} 年或之後", key='founded_min')
+
+    # widget 可能已修正無效的選擇 (例如改選地區後不再適用的校網)，以最終狀態為準
+    active_filters = filters_from_state(st.session_state, processed_df.columns)
     
     def reset_filters():
         keys_to_reset = [
@@ -312,13 +279,9 @@ try:
             "language_select", "body_select", "feeder", "bus", "district_select",
             "net_select", "full_text_search", "features1", "features2", "features3",
             "p1_test", "p2-6_test", "p1_exam", "p2-6_exam", "p1_no_exam_radio",
-            "holiday", "tutorial"
-        ]
-        slider_key_names = [
-            '已接受師資培訓(佔全校教師人數%)', '學士(佔全校教師人數%)', '碩士、博士或以上 (佔全校教師人數%)', '特殊教育培訓 (佔全校教師人數%)',
-            '0-4年資 (佔全校教師人數%)', '5-9年資(佔全校教師人數%)', '10年或以上年資 (佔全校教師人數%)'
+            "holiday", "tutorial", *RANGE_FILTER_KEYS
         ]
-        keys_to_reset.extend(slider_key_names)
+        keys_to_reset.extend(col_name for sliders in TEACHER_SLIDERS for col_name in sliders)
         for key in keys_to_reset:
             if key in st.session_state:
                 del st.session_state[key]
@@ -334,61 +297,60 @@ try:
     if not active_filters:
         st.info("☝️ 請使用上方的篩選器開始尋找學校。")
     else:
-        filtered_df = processed_df.copy()
-        all_selected_keywords_for_highlight = []
-        for filter_type, value in active_filters:
-            if filter_type == 'name': filtered_df = filtered_df[filtered_df['學校名稱'].str.contains(value, case=False, na=False)]
-            elif filter_type == 'category': filtered_df = filtered_df[filtered_df['學校類別'].isin(value)]
-            elif filter_type == 'gender': filtered_df = filtered_df[filtered_df['學生性別'].isin(value)]
-            elif filter_type == 'religion': filtered_df = filtered_df[filtered_df['宗教'].isin(value)]
-            elif filter_type == 'language': filtered_df = filtered_df[filtered_df['教學語言'] == value]
-            elif filter_type == 'body': filtered_df = filtered_df[filtered_df['辦學團體'].isin(value)]
-            elif filter_type == 'feeder': filtered_df = filtered_df[filtered_df['has_feeder_school'] == value]
-            elif filter_type == 'bus': filtered_df = filtered_df[filtered_df['has_school_bus'] == value]
-            elif filter_type == 'full_text':
-                filtered_df = filtered_df[filtered_df['full_text_search'].str.contains(value, case=False, na=False)]
-                all_selected_keywords_for_highlight.append(value)
-            elif filter_type == 'district': filtered_df = filtered_df[filtered_df['地區'].isin(value)]
-            elif filter_type == 'net': filtered_df = filtered_df[filtered_df['校網'].isin(value)]
-            elif filter_type == 'features':
-                for option in value:
-                    search_terms = [];
-                    for category in feature_mapping.values():
-                        if option in category: search_terms = category[option]; all_selected_keywords_for_highlight.append(search_terms); break
-                    if search_terms:
-                        regex_pattern = '|'.join([re.escape(term) for term in search_terms])
-                        filtered_df = filtered_df[filtered_df['features_text'].str.contains(regex_pattern, case=False, na=False, regex=True)]
-            elif filter_type == 'slider':
-                col_name, min_val = value; filtered_df = filtered_df[filtered_df[col_name] >= min_val]
-            elif filter_type == 'max_p1_tests': filtered_df = filtered_df[filtered_df['一年級全年全科測驗次數'] <= int(value)]
-            elif filter_type == 'max_p2_6_tests': filtered_df = filtered_df[filtered_df['二至六年級全年全科測驗次數'] <= int(value)]
-            elif filter_type == 'max_p1_exams': filtered_df = filtered_df[filtered_df['一年級全年全科考試次數'] <= int(value)]
-            elif filter_type == 'max_p2_6_exams': filtered_df = filtered_df[filtered_df['二至六年級全年全科考試次數'] <= int(value)]
-            elif filter_type == 'p1_no_exam': filtered_df = filtered_df[filtered_df['p1_no_exam_assessment'] == value]
-            elif filter_type == 'avoid_holiday': filtered_df = filtered_df[filtered_df['avoid_holiday_exams'] == value]
-            elif filter_type == 'afternoon_tut': filtered_df = filtered_df[filtered_df['afternoon_tutorial'] == value]
+        with span('filter'):
+            filter_result = get_query_cache().get_or_compute(
+                (data_version, canonicalize_filters(active_filters)),
+                lambda: filter_engine.apply(active_filters),
+                session_stats=st.session_state.query_cache_stats
+            )
         
         st.video("https://www.youtube.com/watch?v=5LNrTnWvuho")
-        st.info(f"綜合所有條件，共找到 {len(filtered_df)} 所學校。")
+        st.info(f"綜合所有條件，共找到 {len(filter_result)} 所學校。")
         
-        if not filtered_df.empty:
+        if len(filter_result) > 0:
+            # 有全文關鍵字或預設標籤時可改按相關程度 (BM25) 排序，預設保持原有次序
+            ranker = None
+            if filter_result.ranking_terms:
+                sort_order = st.radio("排序方式", ['預設次序', '相關程度'], horizontal=True, key="sort_order")
+                if sort_order == '相關程度':
+                    ranker = dataset.ranker
+
+            if st.checkbox("📊 比較所有結果的師資比例", key="compare_charts"):
+                chart_started = time.perf_counter()
+                compare_kind = st.radio(
+                    "比較項目", list(CHART_SPECS), format_func=lambda kind: CHART_SPECS[kind][0],
+                    horizontal=True, key="compare_kind"
+                )
+                if len(filter_result) > MAX_COMPARISON_SCHOOLS:
+                    st.caption(f"只顯示首 {MAX_COMPARISON_SCHOOLS} 所學校。")
+                st.plotly_chart(
+                    get_chart_cache().comparison(data_version, processed_df, filter_result.rows, compare_kind),
+                    use_container_width=True, key="compare_chart"
+                )
+                record_span('plotly_charts', chart_started)
+
             ITEMS_PER_PAGE = 10
-            total_items = len(filtered_df)
+            total_items = len(filter_result)
             total_pages = (total_items + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
             st.session_state.page = max(0, min(st.session_state.page, total_pages - 1))
             
-            start_idx = st.session_state.page * ITEMS_PER_PAGE
-            end_idx = min(start_idx + ITEMS_PER_PAGE, total_items)
-            
-            page_df = filtered_df.iloc[start_idx:end_idx]
+            # 只取出當頁學校的卡片 (靜態部分按資料版本快取)
+            page_rows = filter_result.page(st.session_state.page, ITEMS_PER_PAGE, ranker)
+            page_cards = get_card_renderer(dataset, data_version).cards(page_rows)
+            # 一次過並行取得當頁所有文章的縮圖
+            with span('article_images'):
+                article_images = get_article_image_fetcher().resolve(
+                    (url for card in page_cards for _, url in card.articles), get_image_manifest(data_version)
+                )
             
-            for index, school in page_df.iterrows():
-                with st.expander(f"**{school.get('學校名稱', 'N/A')}** ({school.get('地區', 'N/A')})"):
-                    articles = school.get('articles', [])
-                    if articles:
+            render_started = time.perf_counter()
+            highlighter = filter_result.highlighter
+            for row, card in zip(page_rows, page_cards):
+                with st.expander(card.title):
+                    if card.articles:
                         st.markdown("#### 📖 相關報導")
-                        for title, url in articles:
-                            image_url = get_article_metadata(url)
+                        for title, url in card.articles:
+                            image_url = article_images.get(url)
                             if image_url:
                                 st.markdown(
                                     f'<a href="{url}" target="_blank"><img src="{image_url}" alt="{title}" style="width:100%; max-width:400px; border-radius: 8px; margin-bottom: 5px;"></a>', 
@@ -399,139 +361,41 @@ try:
                                 st.markdown(f"- [{title}]({url})")
                         st.markdown("---")
 
-                    st.markdown("#### 📖 學校基本資料")
-                    info_col1, info_col2 = st.columns(2)
-                    with info_col1:
-                        st.write(f"**學校類別:** {school.get('學校類別', '未提供')}")
-                        st.write(f"**辦學團體:** {school.get('辦學團體', '未提供')}")
-                        st.write(f"**創校年份:** {school.get('創校年份', '未提供')}")
-                        st.write(f"**校長:** {school.get('校長_', '未提供')}")
-                        st.write(f"**教學語言:** {school.get('教學語言', '未提供')}")
-                    with info_col2:
-                        st.write(f"**學生性別:** {school.get('學生性別', '未提供')}")
-                        st.write(f"**宗教:** {school.get('宗教', '未提供')}")
-                        st.write(f"**校網:** {school.get('校網', '未提供')}")
-                        st.write(f"**校監:** {school.get('校監／學校管理委員會主席', '未提供')}")
-                        st.write(f"**家教會:** {school.get('has_pta', '未提供')}")
-
-                    st.write(f"**學校佔地面積:** {school.get('學校佔地面積', '未提供')}")
-                    st.write(f"**學費/堂費:** {school.get('fees_text', '沒有')}")
-                    st.write(f"**校車服務:** {school.get('bus_service_text', '沒有')}")
-                    
-                    feeder_schools = {"一條龍中學": school.get('一條龍中學'), "直屬中學": school.get('直屬中學'), "聯繫中學": school.get('聯繫中學')}
-                    for title, value in feeder_schools.items():
-                        if pd.notna(value) and str(value).strip() not in ['', '沒有']: st.write(f"**{title}:** {value}")
-                    
-                    st.markdown(
-                        '<div style="border: 2px dashed #cccccc; padding: 15px; text-align: center; margin-top: 15px; margin-bottom: 15px;">廣告空間</div>',
-                        unsafe_allow_html=True
-                    )
+                    st.markdown(card.summary_html, unsafe_allow_html=True)
+                    if st.button("📊 顯示師資比例圖表", key=f"chart_btn_{row}"):
+                        chart_started = time.perf_counter()
+                        st.markdown("#### 📊 師資比例分佈圖")
+                        chart_cache = get_chart_cache()
+                        for pie_col, kind in zip(st.columns(len(CHART_SPECS)), CHART_SPECS):
+                            with pie_col:
+                                st.markdown(f"**{CHART_SPECS[kind][0]}**")
+                                fig = chart_cache.pie(data_version, row, kind, card.teacher_ratios)
+                                if fig is not None:
+                                    st.plotly_chart(fig, use_container_width=True, key=f"{kind}_pie_{row}")
+                                else: st.text("無相關數據")
+                        record_span('plotly_charts', chart_started)
                     
-                    st.markdown("---")
-                    st.markdown("#### 🏫 學校設施詳情")
-                    facility_counts = (f"🏫 課室: {school.get('課室數目', 'N/A')} | 🏛️ 禮堂: {school.get('禮堂數目', 'N/A')} | 🤸 操場: {school.get('操場數目', 'N/A')} | 📚 圖書館: {school.get('圖書館數目', 'N/A')}")
-                    st.markdown(facility_counts)
-                    other_facilities = {"特別室": "特別室", "支援有特殊教育需要學生的設施": "SEN 支援設施", "其他學校設施": "其他學校設施"}
-                    for column_name, display_title in other_facilities.items():
-                        detail_value = school.get(column_name, '');
-                        if pd.notna(detail_value) and str(detail_value).strip() not in ['', '沒有']: st.write(f"**{display_title}:** {detail_value}")
+                    st.markdown(card.details_html, unsafe_allow_html=True)
+                    # --- 在「照顧學生多樣性」之後插入廣告空間 ---
+                    if card.feature_ad_after == 0:
+                        st.markdown(AD_HTML, unsafe_allow_html=True)
+                    for index, (column_name, display_title, detail_value) in enumerate(card.feature_fields):
+                        formatted_content, should_expand = highlighter.format_cached((row, column_name), detail_value)
+                        with st.expander(f"**{display_title}**", expanded=should_expand):
+                            st.markdown(formatted_content, unsafe_allow_html=True)
+                        if index + 1 == card.feature_ad_after:
+                            st.markdown(AD_HTML, unsafe_allow_html=True)
                     
-                    st.markdown("---")
-                    st.markdown("#### 🧑‍🏫 師資團隊概覽")
-                    approved_teachers = school.get('核准編制教師職位數目')
-                    total_teachers = school.get('全校教師總人數')
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if pd.isna(approved_teachers):
-                            st.metric("核准編制教師職位", "沒有資料")
-                        else:
-                            st.metric("核准編制教師職位", f"{int(approved_teachers)} 人")
-                    with col2:
-                        if pd.isna(total_teachers):
-                            st.metric("全校教師總人數", "沒有資料")
-                        else:
-                            if not pd.isna(approved_teachers):
-                                diff = total_teachers - approved_teachers
-                                if diff >= 0:
-                                    st.metric("全校教師總人數", f"{int(total_teachers)} 人", f"+{int(diff)}", delta_color="normal")
-                                else:
-                                    st.metric("全校教師總人數", f"{int(total_teachers)} 人", f"{int(diff)}", delta_color="inverse")
-                            else:
-                                st.metric("全校教師總人數", f"{int(total_teachers)} 人")
-                    if st.button("📊 顯示師資比例圖表", key=f"chart_btn_{index}"):
-                        st.markdown("#### 📊 師資比例分佈圖"); pie_col1, pie_col2 = st.columns(2)
-                        with pie_col1:
-                            st.markdown("**學歷分佈**"); edu_data = {'類別': ['學士', '碩士或以上'],'比例': [school.get('學士(佔全校教師人數%)', 0), school.get('碩士、博士或以上 (佔全校教師人數%)', 0)]}; edu_df = pd.DataFrame(edu_data)
-                            if edu_df['比例'].sum() > 0:
-                                fig1 = px.pie(edu_df, values='比例', names='類別', color_discrete_sequence=px.colors.sequential.Greens_r)
-                                fig1.update_layout(
-                                    showlegend=False, margin=dict(l=70, r=70, t=40, b=40), height=380, font=dict(size=16),
-                                    uniformtext_minsize=14, uniformtext_mode='hide'
-                                )
-                                fig1.update_traces(textposition='inside', textinfo='percent+label', textfont_color='white'); st.plotly_chart(fig1, use_container_width=True, key=f"edu_pie_{index}")
-                            else: st.text("無相關數據")
-                        with pie_col2:
-                            st.markdown("**年資分佈**"); exp_data = {'類別': ['0-4年', '5-9年', '10年以上'],'比例': [school.get('0-4年資 (佔全校教師人數%)', 0), school.get('5-9年資(佔全校教師人數%)', 0), school.get('10年或以上年資 (佔全校教師人數%)', 0)]}; exp_df = pd.DataFrame(exp_data)
-                            if exp_df['比例'].sum() > 0:
-                                fig2 = px.pie(exp_df, values='比例', names='類別', color_discrete_sequence=px.colors.sequential.Blues_r)
-                                fig2.update_layout(
-                                    showlegend=False, margin=dict(l=70, r=70, t=40, b=40), height=380, font=dict(size=16),
-                                    uniformtext_minsize=14, uniformtext_mode='hide'
-                                )
-                                fig2.update_traces(textposition='inside', textinfo='percent+label', textfont_color='white'); st.plotly_chart(fig2, use_container_width=True, key=f"exp_pie_{index}")
-                            else: st.text("無相關數據")
+                    if st.button("🔍 尋找類似學校", key=f"similar_btn_{row}"):
+                        with span('similar_schools'):
+                            similar = similar_schools(dataset, row)
+                        st.markdown("#### 🔍 類似學校\n\n" + "\n".join(
+                            f"- **{item['學校名稱']}** ({item['地區']})　相似度 {item['similarity']:.0%}" for item in similar
+                        ))
                     
-                    st.markdown(
-                        '<div style="border: 2px dashed #cccccc; padding: 15px; text-align: center; margin-top: 15px; margin-bottom: 15px;">廣告空間</div>',
-                        unsafe_allow_html=True
-                    )
+                    st.markdown(AD_HTML, unsafe_allow_html=True)
 
-                    st.markdown("---")
-                    st.markdown("#### 📚 課業與評估安排")
-                    homework_details = {"小一測驗/考試次數": f"{school.get('一年級全年全科測驗次數', 'N/A')} / {school.get('一年級全年全科考試次數', 'N/A')}", "高年級測驗/考試次數": f"{school.get('二至六年級全年全科測驗次數', 'N/A')} / {school.get('二至六年級全年全科考試次數', 'N/A')}", "小一免試評估": school.get('p1_no_exam_assessment', 'N/A'), "多元學習評估": school.get('多元學習評估', '未提供'), "避免長假後測考": school.get('avoid_holiday_exams', 'N/A'), "下午導修時段": school.get('afternoon_tutorial', 'N/A')}
-                    for title, value in homework_details.items():
-                        if pd.notna(value) and str(value).strip() != '': st.write(f"**{title}:** {value}")
-                    
-                    st.markdown("---")
-                    st.markdown("#### ✨ 辦學特色與發展計劃")
-                    feature_text_map = {
-                        "學校關注事項": "學校關注事項", "學習和教學策略": "學習和教學策略", "小學教育課程更新重點的發展": "課程更新重點", 
-                        "共通能力的培養": "共通能力培養", "正確價值觀、態度和行為的培養": "價值觀培養", "全校參與照顧學生的多樣性": "照顧學生多樣性",
-                        "全校參與模式融合教育": "融合教育模式", "非華語學生的教育支援": "非華語學生支援", "課程剪裁及調適措施": "課程剪裁調適",
-                        "家校合作": "家校合作", "校風": "校風", "學校發展計劃": "學校發展計劃", "教師專業培訓及發展": "教師專業發展", 
-                        "其他未來發展": "其他未來發展"
-                    }
-                    for column_name, display_title in feature_text_map.items():
-                        detail_value = school.get(column_name, '')
-                        if pd.notna(detail_value) and str(detail_value).strip() not in ['', '沒有']:
-                            
-                            should_expand = False
-                            if all_selected_keywords_for_highlight:
-                                text_to_check = str(detail_value).lower()
-                                flat_keywords = []
-                                for item in all_selected_keywords_for_highlight:
-                                    if isinstance(item, list):
-                                        flat_keywords.extend(item)
-                                    else:
-                                        flat_keywords.append(item)
-                                if any(keyword.lower() in text_to_check for keyword in flat_keywords):
-                                    should_expand = True
-                            
-                            with st.expander(f"**{display_title}**", expanded=should_expand):
-                                formatted_content = format_and_highlight_text(detail_value, all_selected_keywords_for_highlight)
-                                st.markdown(formatted_content, unsafe_allow_html=True)
-                        
-                        # --- 新增：在指定位置插入廣告空間 ---
-                        if column_name == "全校參與照顧學生的多樣性":
-                            st.markdown(
-                                '<div style="border: 2px dashed #cccccc; padding: 15px; text-align: center; margin-top: 15px; margin-bottom: 15px;">廣告空間</div>',
-                                unsafe_allow_html=True
-                            )
-                    
-                    st.markdown(
-                        '<div style="border: 2px dashed #cccccc; padding: 15px; text-align: center; margin-top: 15px; margin-bottom: 15px;">廣告空間</div>',
-                        unsafe_allow_html=True
-                    )
+            record_span('render_results', render_started)
 
             st.markdown("---")
             col1, col2, col3 = st.columns([1, 1, 1])
@@ -568,3 +432,8 @@ except FileNotFoundError:
     st.info("請確認您已將正確的 Raw URL 貼入程式碼中。")
 except Exception as e:
     st.error(f"處理資料時發生錯誤：{e}")
+finally:
+    if rerun_timer is not None:
+        rerun_timer.finish()
+        if SIDEBAR_ENABLED:
+            render_timing_sidebar(rerun_timer)
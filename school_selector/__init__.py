@@ -0,0 +1 @@
+# 「01教育」小學概覽搜尋器的資料處理套件，供 app.py 及離線工具共用。
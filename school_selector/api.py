@@ -0,0 +1,290 @@
+import argparse
+import base64
+import json
+import logging
+import math
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from .dataset import REFRESH_INTERVAL, DatasetRefresher, load_dataset
+from .feature_tags import tag_keywords
+from .query_cache import QueryCache, canonicalize_filters
+from .similarity import DEFAULT_TOP_K, similar_schools
+
+logger = logging.getLogger(__name__)
+
+# --- 查詢參數與 active_filters 的對應 ---
+# 與 app.py 的篩選器相同，例如：
+#   GET /schools?district=沙田區&district=大埔區&category=直資&feature=STEAM&min_master=40&limit=20
+#   GET /schools?max_fee=40000&max_end_time=15:30&min_site_area=5000
+#   GET /similar?id=12&k=5  (id 為 /schools 回傳的 id)
+LIST_PARAMS = {
+    'category': 'category', 'gender': 'gender', 'religion': 'religion', 'body': 'body',
+    'district': 'district', 'net': 'net', 'feature': 'features',
+}
+TEXT_PARAMS = {'name': 'name', 'q': 'full_text'}
+CHOICE_PARAMS = {
+    'language': 'language', 'feeder': 'feeder', 'bus': 'bus',
+    'p1_no_exam': 'p1_no_exam', 'avoid_holiday': 'avoid_holiday', 'afternoon_tut': 'afternoon_tut',
+}
+YES_NO_PARAMS = {'feeder', 'bus', 'p1_no_exam', 'avoid_holiday', 'afternoon_tut'}
+MAX_PARAMS = {
+    'max_p1_tests': 'max_p1_tests', 'max_p2_6_tests': 'max_p2_6_tests',
+    'max_p1_exams': 'max_p1_exams', 'max_p2_6_exams': 'max_p2_6_exams',
+}
+SLIDER_PARAMS = {
+    'min_trained': '已接受師資培訓(佔全校教師人數%)',
+    'min_bachelor': '學士(佔全校教師人數%)',
+    'min_master': '碩士、博士或以上 (佔全校教師人數%)',
+    'min_special_ed': '特殊教育培訓 (佔全校教師人數%)',
+    'min_exp_0_4': '0-4年資 (佔全校教師人數%)',
+    'min_exp_5_9': '5-9年資(佔全校教師人數%)',
+    'min_exp_10': '10年或以上年資 (佔全校教師人數%)',
+}
+# min_<名稱> / max_<名稱> -> 範圍條件；時間以 24 小時制「15:30」表示
+RANGE_PARAMS = {
+    'fee': 'fee', 'start_time': 'start_time', 'end_time': 'end_time',
+    'site_area': 'site_area', 'founded': 'founded', 'school_days': 'school_days',
+}
+TIME_PARAMS = {'start_time', 'end_time'}
+RANGE_PARAM_KEYS = {f"{bound}_{name}" for name in RANGE_PARAMS for bound in ('min', 'max')}
+PAGING_PARAMS = {'limit', 'cursor', 'fields'}
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+SUMMARY_FIELDS = [
+    '學校名稱', '地區', '校網', '學校類別', '學生性別', '宗教', '教學語言', '辦學團體',
+    'has_feeder_school', 'has_school_bus',
+]
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _single(params, key):
+    values = params[key]
+    if len(values) != 1:
+        raise QueryError(f"參數 {key} 只可提供一次")
+    return values[0]
+
+
+def _number(params, key, cast=float):
+    try:
+        value = cast(_single(params, key))
+    except ValueError:
+        raise QueryError(f"參數 {key} 必須是數字") from None
+    if isinstance(value, float) and not math.isfinite(value):
+        raise QueryError(f"參數 {key} 必須是數字")
+    return value
+
+
+def _clock(params, key):
+    # 「15:30」-> 930 (由午夜起計的分鐘)，與 processing.parse_clock 相同
+    hours, _, minutes = _single(params, key).partition(':')
+    try:
+        hours, minutes = int(hours), int(minutes or 0)
+    except ValueError:
+        raise QueryError(f"參數 {key} 必須是 24 小時制時間，例如 15:30") from None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise QueryError(f"參數 {key} 必須是 24 小時制時間，例如 15:30")
+    return hours * 60 + minutes
+
+
+def parse_filters(params):
+    # params：parse_qs 的結果 {名稱: [值, ...]}；回傳與 app.py 相同格式的 active_filters
+    unknown = set(params) - set(LIST_PARAMS) - set(TEXT_PARAMS) - set(CHOICE_PARAMS) - set(MAX_PARAMS) - set(SLIDER_PARAMS) - RANGE_PARAM_KEYS - PAGING_PARAMS
+    if unknown:
+        raise QueryError(f"不支援的參數：{', '.join(sorted(unknown))}")
+    active_filters = []
+    for key, filter_type in TEXT_PARAMS.items():
+        if key in params and _single(params, key):
+            active_filters.append((filter_type, _single(params, key)))
+    for key, filter_type in LIST_PARAMS.items():
+        values = [value for value in params.get(key, []) if value]
+        if key == 'feature':
+            unknown_tags = set(values) - set(tag_keywords())
+            if unknown_tags:
+                raise QueryError(f"未知的標籤：{', '.join(sorted(unknown_tags))}")
+        if values:
+            active_filters.append((filter_type, values))
+    for key, filter_type in CHOICE_PARAMS.items():
+        # 與其他參數相同，空值 (例如 language=) 視為不限
+        if key in params and _single(params, key):
+            value = _single(params, key)
+            if key in YES_NO_PARAMS and value not in ('是', '否'):
+                raise QueryError(f"參數 {key} 只接受「是」或「否」")
+            active_filters.append((filter_type, value))
+    for key, filter_type in MAX_PARAMS.items():
+        if key in params:
+            active_filters.append((filter_type, _number(params, key, int)))
+    for key, col_name in SLIDER_PARAMS.items():
+        if key in params:
+            active_filters.append(('slider', (col_name, _number(params, key))))
+    for name, filter_type in RANGE_PARAMS.items():
+        parse = _clock if name in TIME_PARAMS else _number
+        bounds = tuple(parse(params, f"{bound}_{name}") if f"{bound}_{name}" in params else None for bound in ('min', 'max'))
+        if bounds != (None, None):
+            active_filters.append((filter_type, bounds))
+    return active_filters
+
+
+# --- 游標分頁 ---
+# 結果按行位置排序，游標記錄資料版本及上一頁最後一所學校的行位置
+def encode_cursor(version, last_row):
+    return base64.urlsafe_b64encode(f"{version[:16]}:{int(last_row)}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, version):
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        cursor_version, last_row = decoded.rsplit(':', 1)
+        last_row = int(last_row)
+    except (ValueError, UnicodeDecodeError):
+        raise QueryError("無效的 cursor") from None
+    if cursor_version != version[:16]:
+        raise QueryError("資料已更新，cursor 已失效，請重新查詢")
+    return last_row
+
+
+def to_json_value(value):
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    try:
+        if value != value:  # pd.NA / NaT
+            return None
+    except TypeError:
+        return None
+    return str(value)
+
+
+def query_schools(dataset, params, cache=None):
+    active_filters = parse_filters(params)
+    limit = _number(params, 'limit', int) if 'limit' in params else DEFAULT_LIMIT
+    if not 1 <= limit <= MAX_LIMIT:
+        raise QueryError(f"limit 必須介乎 1 至 {MAX_LIMIT}")
+    fields = SUMMARY_FIELDS
+    if 'fields' in params:
+        fields = [field for field in _single(params, 'fields').split(',') if field]
+    if cache is not None:
+        result = cache.get_or_compute(
+            (dataset.version, canonicalize_filters(active_filters)), lambda: dataset.filter_engine.apply(active_filters)
+        )
+    else:
+        result = dataset.filter_engine.apply(active_filters)
+
+    start = 0
+    if 'cursor' in params:
+        start = int(np.searchsorted(result.rows, decode_cursor(_single(params, 'cursor'), dataset.version), side='right'))
+    page_rows = result.rows[start:start + limit]
+    items = []
+    for row, record in zip(page_rows.tolist(), dataset.records(page_rows) if len(page_rows) else []):
+        items.append({'id': row, **{field: to_json_value(record.get(field)) for field in fields}})
+    has_more = start + limit < len(result.rows)
+    return {
+        'version': dataset.version,
+        'total': int(len(result.rows)),
+        'items': items,
+        'next_cursor': encode_cursor(dataset.version, page_rows[-1]) if has_more else None,
+    }
+
+
+def query_similar(dataset, params):
+    if 'id' not in params:
+        raise QueryError("缺少參數 id")
+    row = _number(params, 'id', int)
+    if not 0 <= row < len(dataset.table):
+        raise QueryError(f"找不到 id 為 {row} 的學校")
+    k = _number(params, 'k', int) if 'k' in params else DEFAULT_TOP_K
+    if not 1 <= k <= MAX_LIMIT:
+        raise QueryError(f"k 必須介乎 1 至 {MAX_LIMIT}")
+    return {
+        'version': dataset.version,
+        'id': row,
+        '學校名稱': to_json_value(dataset.table['學校名稱'].iloc[row]),
+        'items': [{key: to_json_value(value) for key, value in item.items()} for item in similar_schools(dataset, row, k)],
+    }
+
+
+# --- HTTP 伺服器 ---
+class SchoolApiHandler(BaseHTTPRequestHandler):
+    server_version = 'SchoolSelectorAPI/1'
+    cache = QueryCache(maxsize=1024)
+    dataset_loader = staticmethod(load_dataset)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        started = time.perf_counter()
+        try:
+            if url.path == '/health':
+                self._send_json(200, {'status': 'ok', 'version': self.dataset_loader().version})
+            elif url.path == '/schools':
+                params = parse_qs(url.query, keep_blank_values=True)
+                payload = query_schools(self.dataset_loader(), params, self.cache)
+                payload['took_ms'] = round((time.perf_counter() - started) * 1000, 2)
+                self._send_json(200, payload)
+            elif url.path == '/similar':
+                params = parse_qs(url.query, keep_blank_values=True)
+                payload = query_similar(self.dataset_loader(), params)
+                payload['took_ms'] = round((time.perf_counter() - started) * 1000, 2)
+                self._send_json(200, payload)
+            else:
+                self._send_json(404, {'error': f"找不到 {url.path}"})
+        except QueryError as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception:
+            logger.exception("處理 %s 時發生錯誤", self.path)
+            self._send_json(500, {'error': '伺服器錯誤'})
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def make_server(host='127.0.0.1', port=8600):
+    return ThreadingHTTPServer((host, port), SchoolApiHandler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以 JSON 提供學校搜尋，不需 Streamlit。")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if REFRESH_INTERVAL > 0:
+        refresher = DatasetRefresher().start()
+        SchoolApiHandler.dataset_loader = staticmethod(lambda: refresher.dataset)
+        dataset = refresher.dataset
+    else:
+        dataset = load_dataset()
+    server = make_server(args.host, args.port)
+    print(f"已載入 {len(dataset.table)} 所學校 (版本 {dataset.version[:12]})，於 http://{args.host}:{args.port}/schools 提供查詢")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
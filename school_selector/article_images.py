@@ -0,0 +1,186 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from .data_loader import CACHE_DIR
+
+# --- 文章縮圖 (og:image) 設定 ---
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# (連線, 讀取) 逾時秒數
+REQUEST_TIMEOUT = (3, 5)
+MAX_WORKERS = 8
+# 找不到 </head> 時最多讀取的位元組數
+MAX_HEAD_BYTES = 256 * 1024
+SUCCESS_TTL = 30 * 24 * 3600
+# 失敗亦會快取，避免每次重跑都再等同一個慢網站
+FAILURE_TTL = 3600
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, 'article_images.sqlite3')
+
+_HEAD_END = re.compile(rb'</head\s*>', re.IGNORECASE)
+_CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+class FetchError(Exception):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        # 4xx (429 除外) 重試也不會成功
+        self.retryable = retryable
+
+
+def make_session(pool_size=MAX_WORKERS):
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def read_head(response, max_bytes=MAX_HEAD_BYTES):
+    # 只讀到 </head> 為止，不下載整個頁面
+    buffer = b''
+    for chunk in response.iter_content(chunk_size=8192):
+        buffer += chunk
+        match = _HEAD_END.search(buffer)
+        if match:
+            return buffer[:match.end()]
+        if len(buffer) >= max_bytes:
+            break
+    return buffer
+
+
+def declared_encoding(response):
+    # 只採用 Content-Type 明確聲明的 charset；requests 對沒有 charset 的 text/html
+    # 會假設 ISO-8859-1，令非 ASCII 的網址變成亂碼
+    match = _CHARSET.search(response.headers.get('Content-Type', ''))
+    return match.group(1) if match else None
+
+
+def parse_og_image(head_bytes, encoding=None):
+    # 沒有指定編碼時交由 BeautifulSoup 按 <meta charset> 等自行判斷
+    soup = BeautifulSoup(head_bytes, 'html.parser', from_encoding=encoding)
+    og_image_tag = soup.find('meta', property='og:image')
+    if og_image_tag and og_image_tag.get('content'):
+        return og_image_tag['content']
+    return None
+
+
+def fetch_og_image(url, session, timeout=REQUEST_TIMEOUT):
+    try:
+        with session.get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            head = read_head(response)
+            return parse_og_image(head, declared_encoding(response))
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        raise FetchError(str(e), retryable=status is None or status >= 500 or status == 429) from e
+    except requests.RequestException as e:
+        raise FetchError(str(e)) from e
+
+
+# --- 磁碟快取 ---
+class ArticleImageCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, success_ttl=SUCCESS_TTL, failure_ttl=FAILURE_TTL):
+        self.path = path
+        self.success_ttl = success_ttl
+        self.failure_ttl = failure_ttl
+        self._memory = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS article_images ('
+                'url TEXT PRIMARY KEY, image_url TEXT, ok INTEGER NOT NULL, fetched_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _is_fresh(self, ok, fetched_at, now):
+        return now - fetched_at < (self.success_ttl if ok else self.failure_ttl)
+
+    def get_many(self, urls):
+        # 回傳 {url: image_url 或 None}；不在快取或已過期的網址不會出現在結果中
+        now = time.time()
+        found = {}
+        missing = []
+        with self._lock:
+            for url in urls:
+                entry = self._memory.get(url)
+                if entry is not None and self._is_fresh(entry[1], entry[2], now):
+                    found[url] = entry[0]
+                else:
+                    missing.append(url)
+        if missing:
+            with self._connect() as conn:
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT url, image_url, ok, fetched_at FROM article_images WHERE url IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for url, image_url, ok, fetched_at in rows:
+                        if self._is_fresh(ok, fetched_at, now):
+                            found[url] = image_url
+                            with self._lock:
+                                self._memory[url] = (image_url, ok, fetched_at)
+        return found
+
+    def put_many(self, results):
+        # results: {url: (image_url, ok)}
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO article_images (url, image_url, ok, fetched_at) VALUES (?, ?, ?, ?)',
+                [(url, image_url, int(ok), now) for url, (image_url, ok) in results.items()]
+            )
+        with self._lock:
+            for url, (image_url, ok) in results.items():
+                self._memory[url] = (image_url, int(ok), now)
+
+
+# --- 並行取得文章縮圖 ---
+class ArticleImageFetcher:
+    def __init__(self, cache=None, session=None, max_workers=MAX_WORKERS, timeout=REQUEST_TIMEOUT, manifest=None):
+        self.cache = cache if cache is not None else ArticleImageCache()
+        # 預先抓取的 {文章網址: 縮圖網址}，見 prefetch_articles
+        self.manifest = manifest or {}
+        self.session = session if session is not None else make_session(max_workers)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        # 累計每個網址的來源：manifest / cache / network
+        self.stats = {'manifest': 0, 'cache': 0, 'network': 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='og-image')
+
+    def _fetch(self, url):
+        try:
+            return fetch_og_image(url, self.session, self.timeout), True
+        except FetchError:
+            return None, False
+
+    def resolve(self, urls, manifest=None):
+        # manifest：本次使用的縮圖清單 (例如按資料版本載入)，沒有則用建立時提供的清單
+        manifest = self.manifest if manifest is None else manifest
+        urls = list(dict.fromkeys(urls))
+        images = {url: manifest[url] for url in urls if url in manifest}
+        remaining = [url for url in urls if url not in images]
+        self.stats['manifest'] += len(images)
+        if not remaining:
+            return images
+        cached = self.cache.get_many(remaining)
+        self.stats['cache'] += len(cached)
+        images.update(cached)
+        missing = [url for url in urls if url not in images]
+        self.stats['network'] += len(missing)
+        if missing:
+            fetched = dict(zip(missing, self._executor.map(self._fetch, missing)))
+            self.cache.put_many(fetched)
+            images.update({url: image_url for url, (image_url, _) in fetched.items()})
+        return images
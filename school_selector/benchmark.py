@@ -0,0 +1,215 @@
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from .card_renderer import CardRenderer
+from .data_loader import ARTICLES_SHEET, MAIN_SHEET, content_hash, read_source_bytes, read_workbook
+from .dataset import SchoolDataset
+from .detail_store import remove_stores
+from .feature_tags import TagMatrix
+from .processing import process_dataframe
+from .ranking import Bm25Ranker
+from .search_index import NgramIndex
+from .similarity import SimilarityIndex
+
+# --- 基準測試 ---
+# 以附帶的 Excel 檔 (及按倍數放大的合成資料) 量度各階段的時間及記憶體峰值：
+#   python -m school_selector.benchmark --scales 1,10,100 --json results.json
+#   python -m school_selector.benchmark --baseline results.json   # 比較並檢查退步
+DEFAULT_SOURCE = 'school_data_with_articles.xlsx'
+ITEMS_PER_PAGE = 10
+# 很快的項目 (例如不足 1 毫秒的篩選) 重複至總時間達到這個秒數 (最多 MAX_REPEAT 次)，減少雜訊
+MIN_MEASURE_SECONDS = 0.2
+MAX_REPEAT = 200
+# 比較基準時，相差少於這個毫秒數不當作退步
+DEFAULT_MIN_DELTA_MS = 1.0
+
+# 具代表性的 active_filters 組合
+BENCHMARK_FILTERS = {
+    'district+category': [('district', ['沙田區', '大埔區']), ('category', ['直資', '資助'])],
+    'name+gender': [('name', '聖'), ('gender', ['男女'])],
+    'religion+language+bus': [('religion', ['天主教', '基督教']), ('language', '中文'), ('bus', '是')],
+    'features': [('features', ['STEAM', '閱讀', '電子學習'])],
+    'full_text': [('full_text', '奧數')],
+    'full_text+slider': [('full_text', '面試'), ('slider', ('碩士、博士或以上 (佔全校教師人數%)', 40))],
+    'homework': [('max_p1_tests', 0), ('max_p2_6_exams', 2), ('p1_no_exam', '是'), ('avoid_holiday', '是')],
+}
+
+
+def scale_frames(main_df, articles_df, factor):
+    # 複製學校並加上編號後綴，令學校名稱保持唯一，文章亦隨之複製
+    if factor == 1:
+        return main_df, articles_df
+    mains, articles = [], []
+    for i in range(factor):
+        suffix = '' if i == 0 else f' #{i}'
+        mains.append(main_df.assign(學校名稱=main_df['學校名稱'].astype(str) + suffix))
+        if articles_df is not None:
+            articles.append(articles_df.assign(學校名稱=articles_df['學校名稱'].astype(str) + suffix))
+    return pd.concat(mains, ignore_index=True), (pd.concat(articles, ignore_index=True) if articles else None)
+
+
+def to_workbook_bytes(main_df, articles_df):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        main_df.to_excel(writer, sheet_name=MAIN_SHEET, index=False)
+        if articles_df is not None:
+            articles_df.to_excel(writer, sheet_name=ARTICLES_SHEET, index=False)
+    return buffer.getvalue()
+
+
+def measure(func, repeat):
+    # 先跑一次熱身 (不計時)，再計時 (不開 tracemalloc 以免拖慢)，最後另跑一次量度記憶體峰值
+    result = func()
+    timings = []
+    while len(timings) < repeat or (sum(timings) < MIN_MEASURE_SECONDS and len(timings) < MAX_REPEAT):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {'seconds': statistics.median(timings), 'min_seconds': min(timings), 'peak_bytes': peak}
+
+
+def render_page(dataset, active_filters, ranker=None):
+    # 與 app 相同的顯示路徑 (不經 Streamlit)：篩選、(可選) 按相關程度排序、從 detail store 取出當頁資料
+    # 並生成卡片，再標示卡片上的「辦學特色」各欄。每次都建立新的 CardRenderer 及 Highlighter，
+    # 並清空 detail store 的快取，量度未有快取時的成本
+    filter_result = dataset.filter_engine.apply(active_filters)
+    rows = filter_result.page(0, ITEMS_PER_PAGE, ranker)
+    if dataset.detail_store is not None:
+        dataset.detail_store.clear_cache()
+    cards = CardRenderer(dataset).cards(rows)
+    highlighter = filter_result.highlighter
+    return [
+        highlighter.format_cached((row, column_name), value)
+        for row, card in zip(rows, cards) for column_name, _, value in card.feature_fields
+    ]
+
+
+def run_benchmarks(source=DEFAULT_SOURCE, scales=(1, 10), repeat=5, phases=None, filters=None):
+    phases = set(phases or ['load', 'process', 'index', 'filter', 'render'])
+    filters = filters or BENCHMARK_FILTERS
+    data = read_source_bytes(source)
+    base_main, base_articles = read_workbook(data)
+    results = []
+
+    def record(scale, phase, case, stats, rows):
+        results.append({'scale': scale, 'rows': rows, 'phase': phase, 'case': case, **stats})
+
+    for scale in scales:
+        main_df, articles_df = scale_frames(base_main, base_articles, scale)
+        rows = len(main_df)
+        if 'load' in phases:
+            workbook_bytes = data if scale == 1 else to_workbook_bytes(main_df, articles_df)
+            _, stats = measure(lambda: read_workbook(workbook_bytes), max(1, repeat // 2) if scale > 1 else repeat)
+            record(scale, 'load', 'read_workbook', stats, rows)
+
+        table, stats = measure(
+            lambda: process_dataframe(main_df.copy(), articles_df.copy() if articles_df is not None else None), repeat
+        )
+        if 'process' in phases:
+            record(scale, 'process', 'process_dataframe', stats, rows)
+
+        search_index, stats = measure(lambda: NgramIndex.from_table(table), max(1, repeat // 2))
+        if 'index' in phases:
+            record(scale, 'index', 'NgramIndex.from_table', stats, rows)
+        tag_matrix, stats = measure(lambda: TagMatrix.from_table(table), repeat)
+        if 'index' in phases:
+            record(scale, 'index', 'TagMatrix.from_table', stats, rows)
+        similarity, stats = measure(lambda: SimilarityIndex.from_table(table), max(1, repeat // 2))
+        if 'index' in phases:
+            record(scale, 'index', 'SimilarityIndex.from_table', stats, rows)
+        ranker, stats = measure(lambda: Bm25Ranker.from_index(search_index), max(1, repeat // 2))
+        if 'index' in phases:
+            record(scale, 'index', 'Bm25Ranker.from_index', stats, rows)
+        # 與 app 相同：篩選用的常駐資料表，其餘欄位存於 detail store；版本按來源及倍數區分
+        version = content_hash(f"{content_hash(data)}x{scale}".encode())
+        dataset = SchoolDataset.from_table(version, table, indexes={
+            'search_index': search_index, 'tag_matrix': tag_matrix, 'similarity': similarity, 'ranker': ranker,
+        })
+        engine = dataset.filter_engine
+        try:
+            for case, active_filters in filters.items():
+                filter_result, stats = measure(lambda: engine.apply(active_filters), repeat)
+                if 'filter' in phases:
+                    record(scale, 'filter', case, stats, rows)
+                if 'render' in phases:
+                    _, stats = measure(lambda: render_page(dataset, active_filters), repeat)
+                    record(scale, 'render', case, stats, rows)
+                    if filter_result.ranking_terms:
+                        _, stats = measure(lambda: render_page(dataset, active_filters, dataset.ranker), repeat)
+                        record(scale, 'render', f"{case}+rank", stats, rows)
+        finally:
+            if dataset.detail_store is not None:
+                dataset.detail_store.close()
+            remove_stores(version)
+    return results
+
+
+def format_results(results):
+    lines = [f"{'scale':>5} {'rows':>7}  {'phase':<8} {'case':<26} {'median ms':>10} {'min ms':>9} {'peak MiB':>9}"]
+    for r in results:
+        lines.append(
+            f"{r['scale']:>5} {r['rows']:>7}  {r['phase']:<8} {r['case']:<26} "
+            f"{r['seconds'] * 1000:>10.2f} {r['min_seconds'] * 1000:>9.2f} {r['peak_bytes'] / 2 ** 20:>9.2f}"
+        )
+    return '\n'.join(lines)
+
+
+def find_regressions(results, baseline, tolerance, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    # 須同時慢了 tolerance 的比例及 min_delta_ms 毫秒才算退步：不足 1 毫秒的項目單靠比例只會反映雜訊
+    previous = {(r['scale'], r['phase'], r['case']): r for r in baseline}
+    regressions = []
+    for r in results:
+        before = previous.get((r['scale'], r['phase'], r['case']))
+        if not before:
+            continue
+        slower_ms = (r['min_seconds'] - before['min_seconds']) * 1000
+        if r['min_seconds'] > before['min_seconds'] * (1 + tolerance) and slower_ms > min_delta_ms:
+            regressions.append(
+                f"{r['phase']}/{r['case']} (x{r['scale']})：{before['min_seconds'] * 1000:.2f} ms -> {r['min_seconds'] * 1000:.2f} ms"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="量度載入、處理、篩選及顯示各階段的時間與記憶體。")
+    parser.add_argument('--source', default=DEFAULT_SOURCE, help="Excel 檔案路徑或 URL")
+    parser.add_argument('--scales', default='1,10', help="資料放大倍數，以逗號分隔 (例如 1,10,100)")
+    parser.add_argument('--repeat', type=int, default=5, help="每項重複次數")
+    parser.add_argument('--phases', default=None, help="只執行指定階段 (load,process,index,filter,render)")
+    parser.add_argument('--json', dest='json_path', default=None, help="把結果寫入 JSON 檔")
+    parser.add_argument('--baseline', default=None, help="與之前輸出的 JSON 比較")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="可接受的退步比例 (預設 0.25 = 慢 25%%)")
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA_MS, help="可接受的退步毫秒數 (預設 1.0)")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(',') if s.strip()]
+    phases = args.phases.split(',') if args.phases else None
+    results = run_benchmarks(args.source, scales, args.repeat, phases)
+    print(format_results(results))
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance, args.min_delta)
+        for line in regressions:
+            print(f"退步：{line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from .compact import compare_memory, dataset_memory_report, format_dataset_memory, format_memory_report
+from .data_loader import SourceWatcher, get_data_source, read_workbook, source_key
+from .feature_tags import TagMatrix
+from .processing import (
+    EXAM_COUNT_COLS, PARSED_COLS, PERCENTAGE_COLS, YES_NO_COLS, process_dataframe, row_keys, unparsed_values
+)
+from .ranking import Bm25Ranker
+from .search_index import NgramIndex
+from .similarity import SimilarityIndex
+
+# --- 預先處理的學校資料表 ---
+# 處理流程或欄位有變時遞增，舊檔案便不會被載入
+ARTIFACT_VERSION = 4
+DEFAULT_ARTIFACT_PATH = os.environ.get(
+    'SCHOOL_SELECTOR_ARTIFACT',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'build', 'school_table.pkl')
+)
+
+# 欄位名稱 -> numpy dtype kind；app 依賴這些衍生欄位
+REQUIRED_COLUMNS = {
+    '學校名稱': 'O', '地區': 'O', '校網': 'O', '學校類別': 'O',
+    'articles': 'O', 'full_text_search': 'O', 'features_text': 'O',
+    'has_school_bus': 'O', 'bus_service_text': 'O', 'has_feeder_school': 'O',
+    **{col: 'f' for col in PERCENTAGE_COLS},
+    **{col: 'i' for col in EXAM_COUNT_COLS},
+    **{col: 'O' for col in YES_NO_COLS.values()},
+    **{new_name: 'f' for new_name, _ in PARSED_COLS.values()},
+    'total_fee': 'f', 'fees_text': 'O',
+}
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def check_schema(df):
+    problems = []
+    for col, kind in REQUIRED_COLUMNS.items():
+        if col not in df.columns:
+            problems.append(f"缺少欄位「{col}」")
+        elif df[col].dtype.kind != kind:
+            problems.append(f"欄位「{col}」的型別為 {df[col].dtype}，應為 {kind}")
+    if problems:
+        raise ArtifactError('；'.join(problems))
+
+
+def build_indexes(table):
+    # 全文索引、標籤矩陣、相似度向量及 BM25 統計；build 時建立並存入檔案，worker 啟動時直接載入
+    search_index = NgramIndex.from_table(table)
+    return {
+        'search_index': search_index,
+        'tag_matrix': TagMatrix.from_table(table),
+        'similarity': SimilarityIndex.from_table(table),
+        'ranker': Bm25Ranker.from_index(search_index),
+    }
+
+
+def build_artifact(source=None):
+    source = source or get_data_source()
+    # 記下來源的 mtime / 大小或 ETag，app 啟動時毋須重新讀取整個檔案便可確認來源未有更改
+    watcher = SourceWatcher(source)
+    digest, data = watcher.poll()
+    main_df, articles_df = read_workbook(data)
+    table = process_dataframe(main_df, articles_df)
+    check_schema(table)
+    return {
+        'version': ARTIFACT_VERSION,
+        'source': source_key(source),
+        'source_digest': digest,
+        'source_validators': watcher.validators,
+        'built_at': time.time(),
+        'schema': {col: str(dtype) for col, dtype in table.dtypes.items()},
+        # 有文字但未能解析成數值的欄位值，範圍篩選不會包括這些學校
+        'unparsed': unparsed_values(table).to_dict('records'),
+        'table': table,
+        'indexes': build_indexes(table),
+        # 來源更新時 DatasetRefresher 以此比對，只重新處理改動的行
+        'row_keys': row_keys(main_df, articles_df),
+    }
+
+
+def write_artifact(payload, path=DEFAULT_ARTIFACT_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pd.to_pickle(payload, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_artifact(path=DEFAULT_ARTIFACT_PATH):
+    try:
+        payload = pd.read_pickle(path)
+    except Exception as e:
+        raise ArtifactError(f"無法讀取 {path}：{e}") from e
+    if not isinstance(payload, dict) or payload.get('version') != ARTIFACT_VERSION:
+        raise ArtifactError(f"{path} 的版本與程式 (v{ARTIFACT_VERSION}) 不符，請重新執行 build。")
+    check_schema(payload['table'])
+    indexes = payload.get('indexes')
+    if (not isinstance(indexes, dict) or indexes['search_index'].num_rows != len(payload['table'])
+            or len(payload.get('row_keys', ())) != len(payload['table'])):
+        raise ArtifactError(f"{path} 的索引與資料表不符，請重新執行 build。")
+    return payload
+
+
+# --- 啟動時載入 ---
+# 進程內只保留檔案的描述 (版本、來源等)，不保留資料表及索引：交給 SchoolDataset 後便不再需要。
+# 首次讀取時回傳完整內容；之後只回傳描述，with_table=True 時才重新讀取整個檔案。
+ARTIFACT_DATA_KEYS = ('table', 'indexes', 'row_keys')
+_artifact_cache = {}
+_artifact_lock = threading.Lock()
+
+
+def load_prebuilt_artifact(path=DEFAULT_ARTIFACT_PATH, with_table=False):
+    if not os.path.exists(path):
+        return None
+    key = (path, os.path.getmtime(path))
+    with _artifact_lock:
+        if key in _artifact_cache and (_artifact_cache[key] is None or not with_table):
+            return _artifact_cache[key]
+        try:
+            payload = read_artifact(path)
+        except ArtifactError as e:
+            logging.getLogger(__name__).warning("忽略預先處理的資料表：%s", e)
+            payload = None
+        _artifact_cache[key] = None if payload is None else {
+            name: value for name, value in payload.items() if name not in ARTIFACT_DATA_KEYS
+        }
+        return payload
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="預先處理學校資料，輸出 app 啟動時直接載入的資料表。")
+    parser.add_argument('--source', default=None, help="Excel 檔案路徑或 URL (預設為 SCHOOL_DATA_SOURCE 或 DATA_URL)")
+    parser.add_argument('--output', default=DEFAULT_ARTIFACT_PATH, help="輸出檔案路徑")
+    parser.add_argument('--memory-report', action='store_true', help="列出各欄位及 app 每個進程常駐的資料 (包括索引) 的記憶體用量")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    started = time.perf_counter()
+    payload = build_artifact(args.source)
+    write_artifact(payload, args.output)
+    table = payload['table']
+    print(f"已輸出 {args.output}：{len(table)} 所學校、{len(table.columns)} 個欄位，"
+          f"來源 {payload['source_digest'][:12]}，用時 {time.perf_counter() - started:.2f} 秒")
+    unparsed = payload['unparsed']
+    if unparsed:
+        print(f"有 {len(unparsed)} 個欄位值未能解析成數值 (範圍篩選不會包括這些學校)：")
+        for item in unparsed:
+            print(f"  {item['學校名稱']}　{item['欄位']}：{item['原文']!r}")
+    if args.memory_report:
+        print(format_memory_report(*compare_memory(table)))
+        # 與 app 相同的設定：常駐資料表、索引及 detail store 的快取
+        from .dataset import SchoolDataset
+        for compact in (False, True):
+            dataset = SchoolDataset.from_table(payload['source_digest'], table, compact=compact, indexes=payload['indexes'])
+            print(f"\nSchoolDataset ({'精簡模式' if compact else '一般模式'})：")
+            print(format_dataset_memory(dataset_memory_report(dataset)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
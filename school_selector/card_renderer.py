@@ -0,0 +1,156 @@
+import html
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .query_cache import QueryCache
+
+# --- 結果卡片 ---
+# 每間學校的卡片大部分內容與搜尋條件無關：按資料版本只生成一次 HTML，
+# 重跑時直接送出幾段 markdown，毋須每個欄位各呼叫一次 st.write / st.metric。
+# 只有「辦學特色」的關鍵字標示需要按搜尋條件處理 (見 highlight.py)。
+AD_HTML = '<div style="border: 2px dashed #cccccc; padding: 15px; text-align: center; margin-top: 15px; margin-bottom: 15px;">廣告空間</div>'
+MAX_CACHED_CARDS = 1024
+
+BASIC_INFO_COLUMNS = (
+    (("學校類別", "學校類別"), ("辦學團體", "辦學團體"), ("創校年份", "創校年份"), ("校長", "校長_"), ("教學語言", "教學語言")),
+    (("學生性別", "學生性別"), ("宗教", "宗教"), ("校網", "校網"), ("校監", "校監／學校管理委員會主席"), ("家教會", "has_pta")),
+)
+FEEDER_SCHOOL_COLS = ("一條龍中學", "直屬中學", "聯繫中學")
+FACILITY_COUNT_COLS = (("🏫 課室", "課室數目"), ("🏛️ 禮堂", "禮堂數目"), ("🤸 操場", "操場數目"), ("📚 圖書館", "圖書館數目"))
+OTHER_FACILITIES = {"特別室": "特別室", "支援有特殊教育需要學生的設施": "SEN 支援設施", "其他學校設施": "其他學校設施"}
+FEATURE_TEXT_MAP = {
+    "學校關注事項": "學校關注事項", "學習和教學策略": "學習和教學策略", "小學教育課程更新重點的發展": "課程更新重點",
+    "共通能力的培養": "共通能力培養", "正確價值觀、態度和行為的培養": "價值觀培養", "全校參與照顧學生的多樣性": "照顧學生多樣性",
+    "全校參與模式融合教育": "融合教育模式", "非華語學生的教育支援": "非華語學生支援", "課程剪裁及調適措施": "課程剪裁調適",
+    "家校合作": "家校合作", "校風": "校風", "學校發展計劃": "學校發展計劃", "教師專業培訓及發展": "教師專業發展",
+    "其他未來發展": "其他未來發展"
+}
+# 在這一項之後插入廣告空間
+FEATURE_AD_AFTER = "全校參與照顧學生的多樣性"
+TEACHER_RATIO_COLS = (
+    '學士(佔全校教師人數%)', '碩士、博士或以上 (佔全校教師人數%)',
+    '0-4年資 (佔全校教師人數%)', '5-9年資(佔全校教師人數%)', '10年或以上年資 (佔全校教師人數%)',
+)
+
+# 不指定文字顏色 (沿用主題的顏色，以透明度區分標籤)，淺色及深色主題都能正常顯示
+METRIC_LABEL_STYLE = 'font-size: 0.875rem; opacity: 0.6;'
+METRIC_VALUE_STYLE = 'font-size: 2.25rem; line-height: 1.2;'
+# 介乎 Streamlit 淺色 (#09ab3b) 及深色 (#3dd56d) 主題之間的綠色
+METRIC_DELTA_STYLE = 'font-size: 1rem; color: #21c354;'
+
+
+def has_text(value):
+    return pd.notna(value) and str(value).strip() not in ['', '沒有']
+
+
+def _field(title, value):
+    return f'<p style="margin-bottom: 0.5rem;"><strong>{title}:</strong> {html.escape(str(value))}</p>'
+
+
+def _metric(label, value, delta=None, arrow='↑'):
+    delta_html = f'<div style="{METRIC_DELTA_STYLE}">{arrow} {delta}</div>' if delta is not None else ''
+    return (f'<div style="flex: 1 1 12em;"><div style="{METRIC_LABEL_STYLE}">{label}</div>'
+            f'<div style="{METRIC_VALUE_STYLE}">{value}</div>{delta_html}</div>')
+
+
+def _teacher_metrics(school):
+    approved_teachers = school.get('核准編制教師職位數目')
+    total_teachers = school.get('全校教師總人數')
+    approved = _metric("核准編制教師職位", "沒有資料" if pd.isna(approved_teachers) else f"{int(approved_teachers)} 人")
+    if pd.isna(total_teachers):
+        total = _metric("全校教師總人數", "沒有資料")
+    elif pd.isna(approved_teachers):
+        total = _metric("全校教師總人數", f"{int(total_teachers)} 人")
+    else:
+        # 與 st.metric 相同：人數多於編制為綠色向上；少於編制時 (delta_color="inverse") 亦以綠色顯示向下
+        diff = total_teachers - approved_teachers
+        if diff >= 0:
+            total = _metric("全校教師總人數", f"{int(total_teachers)} 人", f"+{int(diff)}")
+        else:
+            total = _metric("全校教師總人數", f"{int(total_teachers)} 人", f"{int(diff)}", arrow='↓')
+    return f'<div style="display: flex; flex-wrap: wrap; gap: 1rem;">{approved}{total}</div>'
+
+
+@dataclass(frozen=True)
+class SchoolCard:
+    title: str
+    articles: tuple
+    # 師資比例圖表按鈕之前 / 之後的靜態內容 (markdown + HTML)
+    summary_html: str
+    details_html: str
+    # (欄位, 標題, 原文)，原文在顯示時才按搜尋關鍵字標示
+    feature_fields: tuple
+    # 在哪一項特色之後插入廣告空間 (不論該項有否內容)
+    feature_ad_after: int
+    teacher_ratios: dict
+
+
+def render_card(school):
+    info_columns = ''.join(
+        '<div style="flex: 1 1 16em;">' + ''.join(_field(title, school.get(col, '未提供')) for title, col in fields) + '</div>'
+        for fields in BASIC_INFO_COLUMNS
+    )
+    basic_info = [
+        f'<div style="display: flex; flex-wrap: wrap; gap: 0 1rem;">{info_columns}</div>',
+        _field("學校佔地面積", school.get('學校佔地面積', '未提供')),
+        _field("學費/堂費", school.get('fees_text', '沒有')),
+        _field("校車服務", school.get('bus_service_text', '沒有')),
+    ]
+    basic_info += [_field(col, school.get(col)) for col in FEEDER_SCHOOL_COLS if has_text(school.get(col))]
+
+    facility_counts = ' | '.join(f"{label}: {html.escape(str(school.get(col, 'N/A')))}" for label, col in FACILITY_COUNT_COLS)
+    facilities = [f'<p>{facility_counts}</p>']
+    facilities += [_field(title, school.get(col, '')) for col, title in OTHER_FACILITIES.items() if has_text(school.get(col, ''))]
+
+    summary_html = '\n\n'.join([
+        "#### 📖 學校基本資料", ''.join(basic_info), AD_HTML,
+        "---", "#### 🏫 學校設施詳情", ''.join(facilities),
+        "---", "#### 🧑‍🏫 師資團隊概覽", _teacher_metrics(school),
+    ])
+
+    homework_details = {
+        "小一測驗/考試次數": f"{school.get('一年級全年全科測驗次數', 'N/A')} / {school.get('一年級全年全科考試次數', 'N/A')}",
+        "高年級測驗/考試次數": f"{school.get('二至六年級全年全科測驗次數', 'N/A')} / {school.get('二至六年級全年全科考試次數', 'N/A')}",
+        "小一免試評估": school.get('p1_no_exam_assessment', 'N/A'), "多元學習評估": school.get('多元學習評估', '未提供'),
+        "避免長假後測考": school.get('avoid_holiday_exams', 'N/A'), "下午導修時段": school.get('afternoon_tutorial', 'N/A'),
+    }
+    homework = ''.join(_field(title, value) for title, value in homework_details.items() if pd.notna(value) and str(value).strip() != '')
+    details_html = '\n\n'.join([AD_HTML, "---", "#### 📚 課業與評估安排", homework, "---", "#### ✨ 辦學特色與發展計劃"])
+
+    feature_fields = tuple(
+        (col, title, school.get(col, '')) for col, title in FEATURE_TEXT_MAP.items() if has_text(school.get(col, ''))
+    )
+    ad_position = list(FEATURE_TEXT_MAP).index(FEATURE_AD_AFTER)
+    feature_ad_after = sum(1 for col, _, _ in feature_fields if list(FEATURE_TEXT_MAP).index(col) <= ad_position)
+
+    return SchoolCard(
+        title=f"**{school.get('學校名稱', 'N/A')}** ({school.get('地區', 'N/A')})",
+        articles=tuple(school.get('articles', [])),
+        summary_html=summary_html,
+        details_html=details_html,
+        feature_fields=feature_fields,
+        feature_ad_after=feature_ad_after,
+        teacher_ratios={col: school.get(col, 0) for col in TEACHER_RATIO_COLS},
+    )
+
+
+# --- 每個資料版本一份卡片快取 ---
+# 命中時連 detail store 也不用讀；未命中的學校一次過取出完整資料再生成卡片。
+class CardRenderer:
+    def __init__(self, dataset, maxsize=MAX_CACHED_CARDS):
+        self.dataset = dataset
+        self._cards = QueryCache(maxsize)
+
+    @property
+    def version(self):
+        return self.dataset.version
+
+    def _render(self, rows):
+        return {row: render_card(school) for row, school in zip(rows, self.dataset.records(rows))}
+
+    def cards(self, rows):
+        return self._cards.get_many([int(row) for row in rows], self._render)
+
+    def __len__(self):
+        return len(self._cards)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from .query_cache import QueryCache
+
+# --- 師資比例圖表 ---
+# (標題, [(類別, 欄位), ...], 顏色)
+CHART_SPECS = {
+    'edu': ("學歷分佈", [('學士', '學士(佔全校教師人數%)'), ('碩士或以上', '碩士、博士或以上 (佔全校教師人數%)')], px.colors.sequential.Greens_r),
+    'exp': ("年資分佈", [('0-4年', '0-4年資 (佔全校教師人數%)'), ('5-9年', '5-9年資(佔全校教師人數%)'), ('10年以上', '10年或以上年資 (佔全校教師人數%)')], px.colors.sequential.Blues_r),
+}
+MAX_CACHED_CHARTS = 2048
+# 比較圖每所學校一行
+COMPARISON_ROW_HEIGHT = 28
+MAX_COMPARISON_SCHOOLS = 200
+
+
+def pie_figure(kind, values):
+    _, categories, colors = CHART_SPECS[kind]
+    chart_df = pd.DataFrame({'類別': [label for label, _ in categories], '比例': values})
+    if not chart_df['比例'].sum() > 0:
+        return None
+    fig = px.pie(chart_df, values='比例', names='類別', color_discrete_sequence=colors)
+    fig.update_layout(
+        showlegend=False, margin=dict(l=70, r=70, t=40, b=40), height=380, font=dict(size=16),
+        uniformtext_minsize=14, uniformtext_mode='hide'
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label', textfont_color='white')
+    return fig
+
+
+def comparison_figure(kind, table, rows):
+    # 一個橫向堆疊棒形圖包含所有學校，每個類別一條 trace，數值直接取自欄位陣列
+    title, categories, colors = CHART_SPECS[kind]
+    subset = table.iloc[rows]
+    # 學校名稱可能重複 (同一學校列於兩區)，以位置作 y 值，再用 ticktext 顯示名稱
+    positions = np.arange(len(subset))
+    labels = [f"{name} ({district})" for name, district in zip(subset['學校名稱'], subset['地區'])]
+    fig = go.Figure([
+        go.Bar(
+            name=label, y=positions, x=pd.to_numeric(subset[col], errors='coerce').fillna(0).to_numpy(dtype=float),
+            orientation='h', marker_color=color, hovertemplate=f'%{{customdata}}<br>{label}: %{{x}}%<extra></extra>',
+            customdata=labels,
+        )
+        for (label, col), color in zip(categories, colors)
+    ])
+    fig.update_layout(
+        barmode='stack', title=title, height=120 + COMPARISON_ROW_HEIGHT * len(subset),
+        margin=dict(l=10, r=10, t=60, b=40), legend=dict(orientation='h', y=1.02, yanchor='bottom', x=0),
+        xaxis=dict(title='佔全校教師人數 %', range=[0, 100]),
+        yaxis=dict(tickvals=positions, ticktext=labels, autorange='reversed'),
+    )
+    return fig
+
+
+# --- 圖表快取 ---
+# 以 (資料版本, 學校, 圖表) 為鍵保存 figure JSON；同一版本內的數值不會改變，
+# 重跑或其他 session 再按「顯示師資比例圖表」時毋須重新建立 DataFrame 及 px.pie。
+class ChartCache:
+    def __init__(self, maxsize=MAX_CACHED_CHARTS):
+        self._charts = QueryCache(maxsize)
+
+    def _get_or_build(self, key, build):
+        # 沒有數據的學校亦記下 None，避免重複計算
+        def build_json():
+            fig = build()
+            return None if fig is None else fig.to_json()
+
+        chart_json = self._charts.get_or_compute(key, build_json)
+        return None if chart_json is None else pio.from_json(chart_json)
+
+    def pie(self, version, row, kind, ratios):
+        # ratios: {欄位: 百分比}；回傳 None 表示沒有相關數據
+        _, categories, _ = CHART_SPECS[kind]
+        return self._get_or_build(
+            (version, int(row), kind),
+            lambda: pie_figure(kind, [ratios.get(col, 0) for _, col in categories]),
+        )
+
+    def comparison(self, version, table, rows, kind):
+        rows = np.asarray(rows, dtype=np.int64)[:MAX_COMPARISON_SCHOOLS]
+        return self._get_or_build(
+            (version, 'comparison', kind, rows.tobytes()),
+            lambda: comparison_figure(kind, table, rows),
+        )
+
+    def __len__(self):
+        return len(self._charts)
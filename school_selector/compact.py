@@ -0,0 +1,122 @@
+import dataclasses
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .processing import PERCENTAGE_COLS, YES_NO_COLS
+
+# --- 精簡資料表 ---
+# 每部機器會執行多個 Streamlit worker，各自持有一份資料表；精簡模式可減少每份的記憶體。
+LOW_CARDINALITY_COLS = ['學校類別', '地區', '校網', '宗教', '學生性別', '教學語言', '辦學團體', 'bus_service_text']
+# 是/否 旗標：轉為只有兩個類別的 categorical (每行 1 byte 代碼)，數值及顯示與原來相同
+FLAG_COLS = ['has_school_bus', 'has_feeder_school', *YES_NO_COLS.values()]
+FLAG_CATEGORIES = ['否', '是']
+# 已有全文索引及標籤矩陣後便不再需要的合併文字欄位
+CONCATENATED_TEXT_COLS = ['full_text_search', 'features_text']
+
+
+def is_string_column(series):
+    return pd.api.types.infer_dtype(series, skipna=True) == 'string'
+
+
+def arrow_string_dtype():
+    try:
+        import pyarrow  # noqa: F401 (Streamlit 已依賴 pyarrow)
+    except ImportError:
+        return 'string'
+    return 'string[pyarrow]'
+
+
+def compact_table(table, drop_concatenated_text=True):
+    table = table.drop(columns=[col for col in CONCATENATED_TEXT_COLS if drop_concatenated_text and col in table.columns])
+    string_dtype = arrow_string_dtype()
+    converted = {}
+    for col in table.columns:
+        series = table[col]
+        if col in FLAG_COLS:
+            converted[col] = pd.Categorical(series, categories=FLAG_CATEGORIES)
+        elif col in LOW_CARDINALITY_COLS:
+            converted[col] = series.astype('category')
+        elif col in PERCENTAGE_COLS:
+            converted[col] = series.astype('float32')
+        elif series.dtype == object and is_string_column(series):
+            converted[col] = series.astype(string_dtype)
+    return table.assign(**converted)
+
+
+# --- 記憶體報告 ---
+def memory_report(table):
+    usage = table.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'dtype': table.dtypes.astype(str),
+        'bytes': usage,
+    }).sort_values('bytes', ascending=False)
+    report.index.name = 'column'
+    return report
+
+
+def compare_memory(table):
+    compacted = compact_table(table)
+    before = memory_report(table)
+    after = memory_report(compacted)
+    report = before.join(after, lsuffix='_before', rsuffix='_after', how='left')
+    report['bytes_after'] = report['bytes_after'].fillna(0).astype('int64')
+    return report, int(before['bytes'].sum()), int(after['bytes'].sum())
+
+
+def format_memory_report(report, total_before, total_after, top=20):
+    lines = [f"{'column':<40} {'before':>20} {'KiB':>9}  {'after':>16} {'KiB':>9}"]
+    for col, row in report.head(top).iterrows():
+        after_dtype = row['dtype_after'] if isinstance(row['dtype_after'], str) else '(dropped)'
+        lines.append(
+            f"{str(col)[:40]:<40} {row['dtype_before']:>20} {row['bytes_before'] / 1024:>9.1f}  "
+            f"{after_dtype:>16} {row['bytes_after'] / 1024:>9.1f}"
+        )
+    lines.append(f"總計：{total_before / 2 ** 20:.2f} MiB -> {total_after / 2 ** 20:.2f} MiB")
+    return '\n'.join(lines)
+
+
+# --- 整個 SchoolDataset 的記憶體用量 ---
+# 資料表以外，全文索引、BM25、相似度等都各自持有陣列及文字；逐個組件估計，共用的物件只計一次。
+def deep_sizeof(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(obj, pd.Index):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, pd.Categorical):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        size = sys.getsizeof(obj) if obj.base is None else sys.getsizeof(obj) + deep_sizeof(obj.base, seen)
+        if obj.dtype == object:
+            size += sum(deep_sizeof(item, seen) for item in obj.ravel().tolist())
+        return size
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def dataset_memory_report(dataset):
+    # 回傳 {組件: 位元組}；排在前面的組件先計算共用物件 (例如 filter_engine 引用的資料表計入 table)
+    seen = set()
+    return {
+        field.name: deep_sizeof(getattr(dataset, field.name), seen)
+        for field in dataclasses.fields(dataset) if field.name != 'version'
+    }
+
+
+def format_dataset_memory(report):
+    lines = [f"{'component':<16} {'KiB':>10}"]
+    lines += [f"{name:<16} {size / 1024:>10.1f}" for name, size in report.items()]
+    lines.append(f"總計：{sum(report.values()) / 2 ** 20:.2f} MiB")
+    return '\n'.join(lines)
@@ -0,0 +1,197 @@
+import glob
+import hashlib
+import io
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+import pandas as pd
+import requests
+
+# --- 資料來源設定 ---
+DATA_URL = "https://raw.githubusercontent.com/kingyeung625/hk-school-selector/3f177778e7a09e9d890e77d07017c2a7364cebb1/school_data_with_articles.xlsx"
+MAIN_SHEET = '學校資料'
+ARTICLES_SHEET = '相關文章'
+
+# 快照格式有變時遞增，舊快照便會自動失效
+SNAPSHOT_VERSION = 1
+CACHE_DIR = os.environ.get(
+    'SCHOOL_SELECTOR_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache')
+)
+
+
+def get_data_source():
+    return os.environ.get('SCHOOL_DATA_SOURCE', DATA_URL)
+
+
+def is_remote_source(source):
+    return re.match(r'^https?://', str(source)) is not None
+
+
+def source_key(source):
+    # 用於比較兩個來源是否相同：本機路徑轉為絕對路徑
+    return str(source) if is_remote_source(source) else os.path.realpath(source)
+
+
+# --- 讀取原始檔案 ---
+def read_source_bytes(source):
+    if is_remote_source(source):
+        response = requests.get(source, timeout=30)
+        response.raise_for_status()
+        return response.content
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_workbook(data):
+    # 只開啟一次活頁簿，同時讀取兩個工作表
+    with pd.ExcelFile(io.BytesIO(data), engine='openpyxl') as workbook:
+        main_df = workbook.parse(MAIN_SHEET)
+        articles_df = workbook.parse(ARTICLES_SHEET) if ARTICLES_SHEET in workbook.sheet_names else None
+    return main_df, articles_df
+
+
+# --- 本機快照 ---
+def snapshot_path(digest):
+    return os.path.join(CACHE_DIR, f"workbook-{digest[:16]}-v{SNAPSHOT_VERSION}.pkl")
+
+
+def remove_snapshots(digest):
+    for path in glob.glob(os.path.join(CACHE_DIR, f"workbook-{digest[:16]}-v*.pkl")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def load_snapshot(digest):
+    path = snapshot_path(digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        payload = pd.read_pickle(path)
+    except Exception:
+        return None
+    if payload.get('digest') != digest:
+        return None
+    return payload['main'], payload['articles']
+
+
+def write_snapshot(digest, main_df, articles_df):
+    path = snapshot_path(digest)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        pd.to_pickle({'digest': digest, 'main': main_df, 'articles': articles_df}, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        # 快取目錄不可寫入時照常運作，只是下次啟動要重新解析
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@dataclass(frozen=True)
+class WorkbookSnapshot:
+    digest: str
+    main_df: pd.DataFrame
+    articles_df: pd.DataFrame | None
+
+
+# --- 進程內快取 ---
+# 只記住每個來源的雜湊值：每個進程只讀取來源一次，但不在記憶體保留原始工作表
+# (處理後便用不著；之後需要時從本機快照讀回)。
+_source_digests = {}
+_workbook_lock = threading.Lock()
+
+
+def known_digest(source=None):
+    # 本進程已讀取過的來源的雜湊值，未讀取過則回傳 None
+    with _workbook_lock:
+        return _source_digests.get(source or get_data_source())
+
+
+def load_workbook(source=None):
+    source = source or get_data_source()
+    with _workbook_lock:
+        digest = _source_digests.get(source)
+        sheets = load_snapshot(digest) if digest is not None else None
+        if sheets is None:
+            data = read_source_bytes(source)
+            digest = content_hash(data)
+            sheets = load_snapshot(digest)
+            if sheets is None:
+                sheets = read_workbook(data)
+                write_snapshot(digest, *sheets)
+            _source_digests[source] = digest
+    return WorkbookSnapshot(digest, *sheets)
+
+
+def update_workbook(source, snapshot):
+    # 來源已更新 (見 SourceWatcher)：記下新的雜湊值，並寫入快照供其他進程使用
+    write_snapshot(snapshot.digest, snapshot.main_df, snapshot.articles_df)
+    with _workbook_lock:
+        _source_digests[source] = snapshot.digest
+
+
+def clear_workbook_cache():
+    with _workbook_lock:
+        _source_digests.clear()
+
+
+# --- 監察來源檔案有否更新 ---
+# 本機檔案先比較 mtime 及大小；網址以 ETag / Last-Modified 發出條件式請求，
+# 伺服器回覆 304 即毋須下載。兩者都有變化時才讀取內容並比較雜湊值。
+class SourceWatcher:
+    def __init__(self, source, digest=None, validators=None):
+        # validators：之前讀取時記下的 mtime / 大小或 ETag / Last-Modified (見 validators)
+        self.source = source
+        self.digest = digest
+        validators = validators or {}
+        self._stat = validators.get('stat')
+        self._etag = validators.get('etag')
+        self._last_modified = validators.get('last_modified')
+
+    @property
+    def validators(self):
+        return {'stat': self._stat, 'etag': self._etag, 'last_modified': self._last_modified}
+
+    def _read_local(self):
+        stat = os.stat(self.source)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._stat:
+            return None
+        with open(self.source, 'rb') as f:
+            data = f.read()
+        self._stat = signature
+        return data
+
+    def _read_remote(self):
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+        response = requests.get(self.source, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        self._etag = response.headers.get('ETag')
+        self._last_modified = response.headers.get('Last-Modified')
+        return response.content
+
+    def poll(self):
+        # 內容有變時回傳 (雜湊值, 內容)，否則回傳 None
+        data = self._read_remote() if is_remote_source(self.source) else self._read_local()
+        if data is None:
+            return None
+        digest = content_hash(data)
+        if digest == self.digest:
+            return None
+        self.digest = digest
+        return digest, data
@@ -0,0 +1,314 @@
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .build import (
+    ARTIFACT_VERSION, DEFAULT_ARTIFACT_PATH, ArtifactError, build_indexes, check_schema, load_prebuilt_artifact
+)
+from .compact import CONCATENATED_TEXT_COLS, compact_table
+from .data_loader import (
+    CACHE_DIR, SourceWatcher, WorkbookSnapshot, get_data_source, known_digest, load_snapshot, load_workbook,
+    read_workbook, remove_snapshots, source_key, update_workbook
+)
+from .detail_store import DetailStore, remove_stores
+from .facets import FacetIndex
+from .feature_tags import TagMatrix
+from .filter_engine import CATEGORICAL_FILTERS, EQUALS_FILTERS, MAX_FILTERS, RANGE_FILTERS, FilterEngine
+from .processing import PERCENTAGE_COLS, process_dataframe, refresh_table, row_keys
+from .ranking import Bm25Ranker
+from .search_index import NgramIndex
+from .similarity import SimilarityIndex
+
+logger = logging.getLogger(__name__)
+
+def _env_flag(name, default):
+    value = os.environ.get(name, '').strip().lower()
+    return default if not value else value not in ('0', 'false', 'no', 'off')
+
+
+# SCHOOL_SELECTOR_COMPACT=1：索引建立後改用精簡的資料表 (見 compact.py)
+COMPACT_DEFAULT = _env_flag('SCHOOL_SELECTOR_COMPACT', False)
+# SCHOOL_SELECTOR_LAZY_DETAILS=0：把所有欄位留在記憶體，不使用 detail store
+LAZY_DETAILS_DEFAULT = _env_flag('SCHOOL_SELECTOR_LAZY_DETAILS', True)
+# SCHOOL_SELECTOR_REFRESH_INTERVAL=秒數：定期檢查資料來源有否更新 (不設定或 0 即停用)
+REFRESH_INTERVAL = float(os.environ.get('SCHOOL_SELECTOR_REFRESH_INTERVAL') or 0)
+# 被取代的資料版本保留這麼多秒 (讓進行中的重跑完成)，之後關閉其 detail store 並刪除快取檔案
+RETIRE_DELAY = 60
+
+# 篩選時需要、常駐記憶體的欄位；其餘欄位只在顯示該校時才從 detail store 讀取
+RESIDENT_COLUMNS = [
+    '學校名稱', *CATEGORICAL_FILTERS.values(), *EQUALS_FILTERS.values(), *MAX_FILTERS.values(), *RANGE_FILTERS.values(),
+    *PERCENTAGE_COLS,
+]
+
+
+# --- 每個進程共用一份、唯讀的學校資料表及索引 ---
+# version 是來源檔案內容的雜湊值，可作為所有衍生快取的鍵，
+# 毋須每次重跑都對整個 DataFrame 計算雜湊。呼叫者不應修改 table。
+@dataclass(frozen=True)
+class SchoolDataset:
+    version: str
+    table: pd.DataFrame
+    search_index: NgramIndex
+    tag_matrix: TagMatrix
+    filter_engine: FilterEngine
+    # None 表示 table 已包含所有欄位
+    detail_store: DetailStore = None
+    facets: FacetIndex = None
+    similarity: SimilarityIndex = None
+    ranker: Bm25Ranker = None
+
+    @classmethod
+    def from_table(cls, version, table, compact=COMPACT_DEFAULT, lazy_details=LAZY_DETAILS_DEFAULT, indexes=None):
+        # indexes：build_indexes 的結果 (見 build.py)，沒有時在此建立。
+        # 索引須在分拆及精簡前建立：標籤矩陣及相似度需要 features_text，全文索引需要原來的文字
+        if indexes is None:
+            indexes = build_indexes(table)
+        search_index, tag_matrix = indexes['search_index'], indexes['tag_matrix']
+        detail_store = None
+        if lazy_details:
+            resident = [col for col in RESIDENT_COLUMNS if col in table.columns]
+            detail_columns = [col for col in table.columns if col not in resident and col not in CONCATENATED_TEXT_COLS]
+            try:
+                detail_store = DetailStore.open_or_build(table, detail_columns, version)
+                table = table[resident]
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("無法建立 detail store，所有欄位將留在記憶體：%s", e)
+        if compact:
+            table = compact_table(table)
+        filter_engine = FilterEngine(table, search_index, tag_matrix)
+        return cls(
+            version, table, search_index, tag_matrix, filter_engine, detail_store,
+            FacetIndex.from_engine(filter_engine), indexes['similarity'], indexes['ranker'],
+        )
+
+    def records(self, rows):
+        # 回傳指定學校的完整資料 ({欄位: 值})，供顯示結果時使用
+        records = self.table.iloc[list(rows)].to_dict('records')
+        if self.detail_store is not None:
+            for record, details in zip(records, self.detail_store.get_many(rows)):
+                record.update(details)
+        return records
+
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+# (資料表檔案, build 時間, 來源) -> 預先處理的資料表是否與來源相符；每個進程只檢查一次，
+# 之後的更改由 DatasetRefresher 處理。不相符時只警告一次，不會每次重跑都記錄
+_artifact_checks = {}
+
+
+def artifact_mismatch(artifact, source):
+    # 預先處理的資料表與目前的來源相符時回傳 None，否則回傳原因。
+    # 本機檔案先比較 mtime 及大小，網址以 ETag 發出條件式請求；有變化時才比較內容的雜湊值
+    if artifact.get('source') != source_key(source):
+        return f"來自 {artifact.get('source')}"
+    watcher = SourceWatcher(source, artifact['source_digest'], artifact.get('source_validators'))
+    try:
+        change = watcher.poll()
+    except OSError as e:
+        return f"未能檢查來源內容：{e}"
+    return None if change is None else f"來源內容已更改 (版本 {change[0][:12]})"
+
+
+def load_dataset(source=None, artifact_path=DEFAULT_ARTIFACT_PATH, warn=logger.warning, compact=COMPACT_DEFAULT):
+    source = source or get_data_source()
+    # 已執行 `python -m school_selector.build` 時直接採用預先處理的資料表 (須來自同一個來源，而且內容未有更改)
+    artifact = load_prebuilt_artifact(artifact_path)
+    if artifact is not None:
+        key = (artifact_path, artifact.get('built_at'), source)
+        with _datasets_lock:
+            if key not in _artifact_checks:
+                reason = _artifact_checks[key] = artifact_mismatch(artifact, source)
+                if reason is not None:
+                    logger.warning(
+                        "預先處理的資料表 %s 與目前的資料來源 %s 不符 (%s)，改為直接讀取資料來源；請重新執行 build。",
+                        artifact_path, source, reason
+                    )
+            if _artifact_checks[key] is not None:
+                artifact = None
+    if artifact is not None:
+        version = artifact['source_digest']
+        with _datasets_lock:
+            dataset = _datasets.get(version)
+            if dataset is None:
+                if 'table' not in artifact:
+                    artifact = load_prebuilt_artifact(artifact_path, with_table=True)
+                dataset = _datasets[version] = SchoolDataset.from_table(
+                    version, artifact['table'], compact, indexes=artifact['indexes']
+                )
+        return dataset
+
+    # 已處理過的來源毋須再讀取工作表；原始工作表處理完畢即釋放
+    digest = known_digest(source)
+    with _datasets_lock:
+        dataset = _datasets.get(digest)
+        if dataset is None:
+            workbook = load_workbook(source)
+            dataset = _datasets.get(workbook.digest)
+            if dataset is None:
+                table = process_dataframe(workbook.main_df, workbook.articles_df, warn=warn)
+                dataset = _datasets[workbook.digest] = SchoolDataset.from_table(workbook.digest, table, compact)
+    return dataset
+
+
+def clear_datasets():
+    with _datasets_lock:
+        _datasets.clear()
+        _artifact_checks.clear()
+
+
+# --- 資料來源更新 ---
+# 背景執行緒定期檢查來源 (見 SourceWatcher)；有變時只重新處理改動的行，
+# 再建立新的索引，完成後才一次過替換 self.dataset。進行中的重跑繼續使用舊版本，
+# 下次重跑便取得新版本，session 不受影響。
+# 增量處理需要上一版的完整資料表及行鍵：不在啟動時重新處理，亦不常駐記憶體，
+# 偵測到更改時才從預先處理的資料表、上次更新時寫入的檔案或本機快照取得。
+def table_snapshot_path(version):
+    return os.path.join(CACHE_DIR, f"table-{version[:16]}-v{ARTIFACT_VERSION}.pkl")
+
+
+def load_table_snapshot(version):
+    path = table_snapshot_path(version)
+    if not os.path.exists(path):
+        return None
+    try:
+        payload = pd.read_pickle(path)
+    except Exception:
+        return None
+    if payload.get('digest') != version:
+        return None
+    return payload['table'], payload['keys']
+
+
+def write_table_snapshot(version, table, keys):
+    path = table_snapshot_path(version)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        pd.to_pickle({'digest': version, 'table': table, 'keys': keys}, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        # 寫入失敗時下次更新由本機快照重新處理
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def remove_table_snapshots(version):
+    for path in glob.glob(os.path.join(CACHE_DIR, f"table-{version[:16]}-v*.pkl")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class DatasetRefresher:
+    def __init__(self, source=None, interval=REFRESH_INTERVAL, warn=logger.warning, compact=COMPACT_DEFAULT,
+                 artifact_path=DEFAULT_ARTIFACT_PATH):
+        self.source = source or get_data_source()
+        self.interval = interval
+        self.compact = compact
+        self.warn = warn
+        self.artifact_path = artifact_path
+        self.dataset = load_dataset(self.source, artifact_path, warn=warn, compact=compact)
+        self.refreshes = 0
+        # [(取代時間, 舊 SchoolDataset), ...]
+        self._retired = []
+        # 採用預先處理的資料表時沿用其記下的 mtime / ETag，第一次檢查毋須重新讀取來源
+        artifact = self._artifact()
+        self.watcher = SourceWatcher(
+            self.source, self.dataset.version, artifact.get('source_validators') if artifact is not None else None
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _artifact(self, with_table=False):
+        # 與目前版本相同的預先處理資料表，沒有則回傳 None
+        artifact = load_prebuilt_artifact(self.artifact_path)
+        if artifact is None or artifact['source_digest'] != self.dataset.version:
+            return None
+        return load_prebuilt_artifact(self.artifact_path, with_table=True) if with_table else artifact
+
+    def _previous(self):
+        # 回傳目前版本的 (完整資料表, 行鍵)；都取不到時回傳 (None, None)，refresh_table 便整份重新處理
+        artifact = self._artifact(with_table=True)
+        if artifact is not None:
+            return artifact['table'], artifact['row_keys']
+        previous = load_table_snapshot(self.dataset.version)
+        if previous is not None:
+            return previous
+        sheets = load_snapshot(self.dataset.version)
+        if sheets is None:
+            return None, None
+        return process_dataframe(*sheets, warn=self.warn), row_keys(*sheets)
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dataset-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def release_retired(self, delay=RETIRE_DELAY):
+        # 每次檢查來源時呼叫；回傳已釋放的版本數目
+        now = time.monotonic()
+        expired = [dataset for retired_at, dataset in self._retired if now - retired_at >= delay]
+        self._retired = [(retired_at, dataset) for retired_at, dataset in self._retired if now - retired_at < delay]
+        for dataset in expired:
+            if dataset.detail_store is not None:
+                dataset.detail_store.close()
+            # 來源改回舊內容時，目前的版本可能與被取代的版本相同
+            if dataset.version != self.dataset.version:
+                remove_stores(dataset.version)
+                remove_snapshots(dataset.version)
+                remove_table_snapshots(dataset.version)
+        return len(expired)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("檢查資料來源 %s 時發生錯誤", self.source)
+
+    def refresh(self):
+        # 來源有變並已替換資料時回傳 True
+        with self._lock:
+            self.release_retired()
+            change = self.watcher.poll()
+            if change is None:
+                return False
+            digest, data = change
+            started = time.perf_counter()
+            main_df, articles_df = read_workbook(data)
+            previous, previous_keys = self._previous()
+            table, keys, changed_rows = refresh_table(previous, previous_keys, main_df, articles_df, warn=self.warn)
+            try:
+                check_schema(table)
+            except ArtifactError as e:
+                # 保留現有資料；watcher 已記下這個版本，同一份檔案不會反覆嘗試
+                logger.warning("新的資料來源未能通過檢查，繼續使用版本 %s：%s", self.dataset.version[:12], e)
+                return False
+            dataset = SchoolDataset.from_table(digest, table, self.compact)
+            update_workbook(self.source, WorkbookSnapshot(digest, main_df, articles_df))
+            write_table_snapshot(digest, table, keys)
+            with _datasets_lock:
+                _datasets.pop(self.dataset.version, None)
+                _datasets[digest] = dataset
+            self._retired.append((time.monotonic(), self.dataset))
+            self.dataset = dataset
+            self.refreshes += 1
+            logger.info(
+                "資料來源已更新至版本 %s：重新處理 %d / %d 行，用時 %.2f 秒",
+                digest[:12], changed_rows, len(table), time.perf_counter() - started
+            )
+            return True
@@ -0,0 +1,104 @@
+import glob
+import os
+import pathlib
+import pickle
+import sqlite3
+import threading
+
+from .data_loader import CACHE_DIR
+from .query_cache import QueryCache
+
+# --- 學校詳細資料 (按需載入) ---
+# 篩選用不著的長篇欄位存於 SQLite (以 mmap 讀取)，以學校的行位置為鍵；
+# 同一部機器上的 worker 共用同一個檔案，每個資料版本只建立一次。
+# 處理後的欄位有所增減時須加一，令舊檔案不再被使用
+STORE_VERSION = 2
+DEFAULT_CACHE_SIZE = 128
+MMAP_SIZE = 64 * 1024 * 1024
+
+
+def store_path(version, directory=CACHE_DIR):
+    return os.path.join(directory, f"details-{version[:16]}-v{STORE_VERSION}.sqlite3")
+
+
+def remove_stores(version, directory=CACHE_DIR):
+    # 刪除某個資料版本的所有 detail store (包括舊 STORE_VERSION 的檔案)；
+    # 其他進程仍開啟的檔案在 POSIX 上可繼續讀取，刪除失敗 (例如 Windows) 則留待下次
+    for path in glob.glob(os.path.join(directory, f"details-{version[:16]}-v*.sqlite3")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def write_store(table, columns, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('CREATE TABLE details (row INTEGER PRIMARY KEY, payload BLOB NOT NULL)')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        records = table[columns].to_dict('records')
+        conn.executemany(
+            'INSERT INTO details (row, payload) VALUES (?, ?)',
+            ((row, pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)) for row, record in enumerate(records))
+        )
+        conn.execute("INSERT INTO meta (key, value) VALUES ('rows', ?)", (str(len(records)),))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+class DetailStore:
+    def __init__(self, path, columns, cache_size=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.columns = list(columns)
+        self._cache = QueryCache(cache_size)
+        # sqlite 連線不可同時由多個執行緒使用
+        self._lock = threading.Lock()
+        # 以唯讀模式開啟；路徑須轉為 file: URI，否則目錄名稱中的 ?、# 或 % 會被當作 URI 語法
+        uri = pathlib.Path(path).resolve().as_uri() + '?mode=ro'
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+
+    @classmethod
+    def open_or_build(cls, table, columns, version, directory=CACHE_DIR, cache_size=DEFAULT_CACHE_SIZE):
+        path = store_path(version, directory)
+        if not os.path.exists(path):
+            write_store(table, list(columns), path)
+        store = cls(path, columns, cache_size)
+        if store.num_rows != len(table):
+            # 檔案與資料表不符 (例如建立中途失敗)，重新建立
+            store.close()
+            write_store(table, list(columns), path)
+            store = cls(path, columns, cache_size)
+        return store
+
+    @property
+    def num_rows(self):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'rows'").fetchone()
+        return int(row[0]) if row else -1
+
+    def _read(self, rows):
+        with self._lock:
+            results = self._conn.execute(
+                f"SELECT row, payload FROM details WHERE row IN ({','.join('?' * len(rows))})", rows
+            ).fetchall()
+        return {row: pickle.loads(payload) for row, payload in results}
+
+    def get_many(self, rows):
+        return self._cache.get_many([int(row) for row in rows], self._read)
+
+    def get(self, row):
+        return self.get_many([row])[0]
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
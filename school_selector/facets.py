@@ -0,0 +1,86 @@
+import numpy as np
+
+from .filter_engine import CATEGORICAL_FILTERS, EQUALS_FILTERS, FilterResult
+
+# --- 篩選選項 (facet) ---
+# 每個資料版本建立一次：選項列表、地區 -> 校網對應，以及每行的類別代碼。
+# 重跑時只需以目前的遮罩對代碼做 bincount，便得出每個選項的即時數目。
+FACET_FILTERS = {**CATEGORICAL_FILTERS, **EQUALS_FILTERS}
+# 按學校數目 (多至少) 排列選項的條件，其餘按名稱排列
+ORDER_BY_COUNT = {'body'}
+
+
+class Facet:
+    def __init__(self, column, categories, codes, order_by_count=False):
+        self.column = column
+        self.categories = list(categories)
+        self.codes = codes
+        self.totals = np.bincount(codes[codes >= 0], minlength=len(self.categories))
+        # 與 sorted(df[col].dropna().unique()) 相同：只列出實際出現的值
+        present = [i for i in range(len(self.categories)) if self.totals[i] > 0]
+        if order_by_count:
+            present.sort(key=lambda i: (-self.totals[i], self.categories[i]))
+        else:
+            present.sort(key=lambda i: self.categories[i])
+        self.options = [self.categories[i] for i in present]
+
+    def counts(self, mask=None):
+        codes = self.codes if mask is None else self.codes[mask]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.categories))
+        return dict(zip(self.categories, counts.tolist()))
+
+
+class FacetIndex:
+    def __init__(self, num_rows, facets, nets_by_district, tag_matrix=None):
+        self.num_rows = num_rows
+        self.facets = facets
+        self.nets_by_district = nets_by_district
+        self.tag_matrix = tag_matrix
+
+    @classmethod
+    def from_engine(cls, filter_engine):
+        facets = {}
+        for filter_type, col in FACET_FILTERS.items():
+            if col in filter_engine.columns:
+                column = filter_engine.categorical(col)
+                facets[filter_type] = Facet(col, column.categories, column.codes, filter_type in ORDER_BY_COUNT)
+
+        nets_by_district = {}
+        if 'district' in facets and 'net' in facets:
+            district, net = facets['district'], facets['net']
+            valid = (district.codes >= 0) & (net.codes >= 0)
+            pairs = np.unique(np.stack([district.codes[valid], net.codes[valid]], axis=1), axis=0)
+            for district_code, net_code in pairs.tolist():
+                nets_by_district.setdefault(district.categories[district_code], []).append(net.categories[net_code])
+            nets_by_district = {name: sorted(nets) for name, nets in nets_by_district.items()}
+        return cls(filter_engine.num_rows, facets, nets_by_district, filter_engine.tag_matrix)
+
+    def options(self, filter_type):
+        facet = self.facets.get(filter_type)
+        return list(facet.options) if facet is not None else []
+
+    def nets_for(self, districts):
+        # 未選地區時列出所有校網
+        if not districts:
+            return self.options('net')
+        return sorted({net for district in districts for net in self.nets_by_district.get(district, [])})
+
+    def live_counts(self, filter_engine, active_filters):
+        # 多選 (isin) 的選項以「或」合併：數目套用「其他」所有條件 (不計同一 facet 本身的選擇)，
+        # 已選了某些地區時，其他地區仍顯示加入後會多出的學校數目。
+        # 標籤以「且」合併 (見 TagMatrix.mask)：數目套用所有條件，即加入該標籤後的結果數目。
+        scratch = FilterResult(rows=np.empty(0, dtype=np.int64))
+        masks = [(filter_type, filter_engine.filter_mask(filter_type, value, scratch)) for filter_type, value in active_filters]
+
+        def mask_without(excluded):
+            mask = np.ones(self.num_rows, dtype=bool)
+            for filter_type, filter_mask in masks:
+                if filter_type != excluded:
+                    mask &= filter_mask
+            return mask
+
+        counts = {filter_type: facet.counts(mask_without(filter_type)) for filter_type, facet in self.facets.items()}
+        if self.tag_matrix is not None:
+            tag_counts = self.tag_matrix.matrix[mask_without(None)].sum(axis=0)
+            counts['features'] = dict(zip(self.tag_matrix.tags, tag_counts.tolist()))
+        return counts
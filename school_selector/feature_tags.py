@@ -0,0 +1,37 @@
+import re
+
+import numpy as np
+
+# --- 預設辦學特色標籤 ---
+FEATURE_MAPPING = {"【教學模式與重點】": {"自主學習及探究": ['自主學習', '探究'],"STEAM": ['STEAM', '創客'], "電子學習": ['電子學習', 'e-learning'], "閱讀": ['閱讀'], "資優教育": ['資優'], "專題研習": ['專題研習'], "跨課程學習": ['跨課程'], "兩文三語": ['兩文三語'], "英文教育": ['英文'], "家校合作": ['家校合作'], "境外交流": ['境外交流'], "藝術": ['藝術'], "體育": ['體育']},"【價值觀與品德】": {"中華文化教育": ['中華文化'], "正向、價值觀、生命教育": ['正向', '價值觀', '生命教育'], "國民教育、國安教育": ['國民', '國安'], "服務教育": ['服務'], "關愛及精神健康": ['關愛', '健康']},"【學生支援與發展】": {"全人發展": ['全人發展', '多元發展'], "生涯規劃、啟發潛能": ['生涯規劃', '潛能'], "拔尖補底、照顧差異": ['拔尖補底', '個別差異'], "融合教育": ['融合教育']}}
+
+
+def tag_keywords(mapping=FEATURE_MAPPING):
+    return {tag: terms for category in mapping.values() for tag, terms in category.items()}
+
+
+# --- 學校 × 標籤 布林矩陣 ---
+# 載入資料時每個標籤只掃描一次 features_text，之後多個標籤的篩選只是逐欄 AND。
+class TagMatrix:
+    def __init__(self, tags, keywords, matrix):
+        self.tags = tags
+        self.keywords = keywords
+        self.matrix = matrix
+        self._tag_ids = {tag: i for i, tag in enumerate(tags)}
+
+    @classmethod
+    def from_table(cls, table, mapping=FEATURE_MAPPING):
+        keywords = tag_keywords(mapping)
+        tags = list(keywords)
+        features_text = table['features_text'].fillna('').astype(str)
+        matrix = np.zeros((len(table), len(tags)), dtype=bool)
+        for i, tag in enumerate(tags):
+            pattern = '|'.join(re.escape(term) for term in keywords[tag])
+            matrix[:, i] = features_text.str.contains(pattern, case=False, regex=True).to_numpy()
+        return cls(tags, keywords, matrix)
+
+    def mask(self, selected_tags):
+        tag_ids = [self._tag_ids[tag] for tag in selected_tags if tag in self._tag_ids]
+        if not tag_ids:
+            return np.ones(len(self.matrix), dtype=bool)
+        return self.matrix[:, tag_ids].all(axis=1)
@@ -0,0 +1,147 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .highlight import Highlighter, flatten_keywords
+from .ranking import top_k_page
+
+# --- 篩選條件與欄位的對應 ---
+# 多選 (isin) 條件
+CATEGORICAL_FILTERS = {
+    'category': '學校類別', 'gender': '學生性別', 'religion': '宗教',
+    'body': '辦學團體', 'district': '地區', 'net': '校網',
+}
+# 單選 (==) 條件
+EQUALS_FILTERS = {
+    'language': '教學語言',
+    'feeder': 'has_feeder_school', 'bus': 'has_school_bus',
+    'p1_no_exam': 'p1_no_exam_assessment', 'avoid_holiday': 'avoid_holiday_exams',
+    'afternoon_tut': 'afternoon_tutorial',
+}
+# 上限 (<=) 條件
+MAX_FILTERS = {
+    'max_p1_tests': '一年級全年全科測驗次數', 'max_p2_6_tests': '二至六年級全年全科測驗次數',
+    'max_p1_exams': '一年級全年全科考試次數', 'max_p2_6_exams': '二至六年級全年全科考試次數',
+}
+# 範圍條件：值為 (下限, 上限)，None 表示該邊不設限；欄位由 processing.parse_text_fields 解析
+RANGE_FILTERS = {
+    'fee': 'total_fee', 'start_time': 'school_start_minutes', 'end_time': 'school_end_minutes',
+    'site_area': 'site_area_sqm', 'founded': 'founded_year', 'school_days': 'school_days_per_week',
+}
+
+
+@dataclass
+class FilterResult:
+    # 符合條件的學校在資料表中的行位置 (依原有次序)
+    rows: np.ndarray
+    # 與 app 原有格式相同：全文關鍵字為字串，預設標籤為關鍵字列表
+    highlight_keywords: list = field(default_factory=list)
+    _highlighter: Highlighter = field(default=None, repr=False)
+    _scores: np.ndarray = field(default=None, repr=False)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def ranking_terms(self):
+        return flatten_keywords(self.highlight_keywords)
+
+    def page(self, page, items_per_page, ranker=None):
+        # 提供 ranker (見 ranking.py) 時按相關程度排序；沒有關鍵字或標籤時仍按原有次序
+        if ranker is None or not self.ranking_terms:
+            return self.rows[page * items_per_page:(page + 1) * items_per_page]
+        if self._scores is None:
+            self._scores = ranker.scores(self.rows, self.ranking_terms)
+        return top_k_page(self.rows, self._scores, page, items_per_page)
+
+    @property
+    def highlighter(self):
+        # 與結果一同放在快取中，同一搜尋的標示結果可跨 session 重用
+        if self._highlighter is None:
+            self._highlighter = Highlighter(self.highlight_keywords)
+        return self._highlighter
+
+
+class CategoricalColumn:
+    def __init__(self, series):
+        categorical = pd.Categorical(series)
+        self.categories = categorical.categories
+        self.codes = categorical.codes
+
+    def mask(self, values):
+        # 多留一格給缺失值 (code = -1)，令其永遠不符合
+        allowed = np.zeros(len(self.categories) + 1, dtype=bool)
+        ids = self.categories.get_indexer(list(values))
+        allowed[ids[ids >= 0]] = True
+        return allowed[self.codes]
+
+
+# --- 篩選引擎 ---
+# 與 Streamlit 無關：把 active_filters 編譯成單一布林遮罩，只回傳行位置，不複製資料表。
+class FilterEngine:
+    def __init__(self, table, search_index=None, tag_matrix=None):
+        self.num_rows = len(table)
+        self.columns = list(table.columns)
+        self.search_index = search_index
+        self.tag_matrix = tag_matrix
+        self._table = table
+        self._categoricals = {}
+        self._numerics = {}
+        self._names = table['學校名稱'].fillna('').astype(str).str.casefold() if '學校名稱' in table.columns else None
+        for col in [*CATEGORICAL_FILTERS.values(), *EQUALS_FILTERS.values()]:
+            if col in table.columns:
+                self.categorical(col)
+
+    def categorical(self, col):
+        if col not in self._categoricals:
+            self._categoricals[col] = CategoricalColumn(self._table[col])
+        return self._categoricals[col]
+
+    def _numeric(self, col):
+        if col not in self._numerics:
+            self._numerics[col] = pd.to_numeric(self._table[col], errors='coerce').to_numpy(dtype=float)
+        return self._numerics[col]
+
+    def filter_mask(self, filter_type, value, result):
+        if filter_type in CATEGORICAL_FILTERS:
+            return self.categorical(CATEGORICAL_FILTERS[filter_type]).mask(value)
+        if filter_type in EQUALS_FILTERS:
+            return self.categorical(EQUALS_FILTERS[filter_type]).mask([value])
+        if filter_type in MAX_FILTERS:
+            return self._numeric(MAX_FILTERS[filter_type]) <= int(value)
+        if filter_type in RANGE_FILTERS:
+            low, high = value
+            values = self._numeric(RANGE_FILTERS[filter_type])
+            # 未能解析 (NaN) 的學校不符合任何範圍
+            mask = ~np.isnan(values)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            return mask
+        if filter_type == 'slider':
+            col_name, min_val = value
+            return self._numeric(col_name) >= min_val
+        if filter_type == 'name':
+            return self._names.str.contains(str(value).casefold(), regex=False).to_numpy()
+        if filter_type == 'full_text':
+            result.highlight_keywords.append(value)
+            mask = np.zeros(self.num_rows, dtype=bool)
+            mask[self.search_index.search(value).rows] = True
+            return mask
+        if filter_type == 'features':
+            keywords = self.tag_matrix.keywords
+            result.highlight_keywords.extend(keywords[option] for option in value if option in keywords)
+            return self.tag_matrix.mask(value)
+        raise ValueError(f"未知的篩選條件：{filter_type}")
+
+    def apply(self, active_filters):
+        result = FilterResult(rows=np.empty(0, dtype=np.int64))
+        mask = np.ones(self.num_rows, dtype=bool)
+        for filter_type, value in active_filters:
+            mask &= self.filter_mask(filter_type, value, result)
+        result.rows = np.flatnonzero(mask)
+        # 結果可能放入跨 session 的快取，設為唯讀以免被修改
+        result.rows.flags.writeable = False
+        return result
@@ -0,0 +1,63 @@
+import re
+
+from .query_cache import QueryCache
+
+# --- 文字處理 ---
+LIST_MARKER_PATTERN = re.compile(r'(\s*[（(]?\d+[.)）]\s*|\s*[①②③④⑤⑥⑦⑧⑨⑩]\s*)')
+HIGHLIGHT_TEMPLATE = '<span style="background-color: yellow;">{}</span>'
+MAX_CACHED_FIELDS = 2048
+
+
+def flatten_keywords(keywords):
+    flat_keywords = []
+    for item in keywords or []:
+        if isinstance(item, (list, tuple)):
+            flat_keywords.extend(item)
+        else:
+            flat_keywords.append(item)
+    return [str(keyword) for keyword in flat_keywords if str(keyword)]
+
+
+def split_list_items(text_str):
+    # 把「1. …」、「(2) …」、「③ …」等列點拆開：回傳 (首段文字, [(列點符號, 內容), ...])
+    parts = LIST_MARKER_PATTERN.split(text_str)
+    items = []
+    for i in range(1, len(parts), 2):
+        if i + 1 < len(parts):
+            items.append((parts[i].strip(), parts[i + 1].strip()))
+    return parts[0], items
+
+
+# --- 關鍵字標示 ---
+# 每個搜尋建立一次：關鍵字只編譯成一個正規表示式，逐段文字標示時同時得知有否命中，
+# 並按 (學校, 欄位) 快取輸出的 HTML。
+class Highlighter:
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(flatten_keywords(keywords)))
+        # 較長的關鍵字優先，避免「電子學習」只標示到「學習」
+        ordered = sorted(self.keywords, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(k) for k in ordered), re.IGNORECASE) if ordered else None
+        self._cache = QueryCache(MAX_CACHED_FIELDS)
+
+    def _mark(self, segment):
+        if self.pattern is None:
+            return segment, 0
+        return self.pattern.subn(lambda match: HIGHLIGHT_TEMPLATE.format(match.group(0)), segment)
+
+    def format(self, text):
+        # 回傳 (HTML, 是否命中任何關鍵字)
+        text_str = str(text).strip()
+        if not text_str:
+            return "", False
+        head, items = split_list_items(text_str)
+        head_html, matches = self._mark(head)
+        html_output = f'<p style="margin:0; padding:0;">{head_html}'
+        for marker, content in items:
+            content_html, count = self._mark(content)
+            matches += count
+            html_output += f'<div style="margin-left: 2em; text-indent: -2em; padding-top: 5px;">{marker} {content_html}</div>'
+        html_output += '</p>'
+        return html_output, matches > 0
+
+    def format_cached(self, key, text):
+        return self._cache.get_or_compute(key, lambda: self.format(text))
@@ -0,0 +1,131 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .article_images import REQUEST_TIMEOUT, FetchError, fetch_og_image, make_session
+from .data_loader import get_data_source, load_workbook
+
+logger = logging.getLogger(__name__)
+
+# --- 文章縮圖預先抓取 ---
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_PATH = os.environ.get(
+    'SCHOOL_SELECTOR_IMAGE_MANIFEST',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'build', 'article_images.json')
+)
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+# 同一網站兩次請求之間最少相隔的秒數
+DEFAULT_HOST_INTERVAL = 0.5
+
+
+def article_pairs(articles_df):
+    if articles_df is None or articles_df.empty:
+        return []
+    articles_df = articles_df.dropna(subset=['文章標題', '文章連結']).drop_duplicates(subset=['文章連結'])
+    return list(zip(articles_df['文章標題'], articles_df['文章連結']))
+
+
+class HostRateLimiter:
+    def __init__(self, min_interval=DEFAULT_HOST_INTERVAL):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def fetch_with_retries(url, session, limiter, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=REQUEST_TIMEOUT):
+    # 回傳 (縮圖網址, 是否成功)
+    for attempt in range(retries + 1):
+        limiter.wait(url)
+        try:
+            return fetch_og_image(url, session, timeout), True
+        except FetchError as e:
+            if not e.retryable or attempt == retries:
+                logger.warning("無法取得 %s 的縮圖：%s", url, e)
+                return None, False
+            time.sleep(backoff * 2 ** attempt)
+
+
+def prefetch_images(urls, max_workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                    host_interval=DEFAULT_HOST_INTERVAL, timeout=REQUEST_TIMEOUT, session=None):
+    urls = list(dict.fromkeys(urls))
+    session = session if session is not None else make_session(max_workers)
+    limiter = HostRateLimiter(host_interval)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='og-prefetch') as executor:
+        results = executor.map(lambda url: fetch_with_retries(url, session, limiter, retries, backoff, timeout), urls)
+        return dict(zip(urls, results))
+
+
+# --- 清單檔案 ---
+def write_manifest(results, path=DEFAULT_MANIFEST_PATH, source_digest=None):
+    # 只寫入成功的結果 (包括頁面沒有 og:image 的情況)；失敗的網址留待 app 執行時再抓取
+    payload = {
+        'version': MANIFEST_VERSION,
+        'source_digest': source_digest,
+        'generated_at': time.time(),
+        'images': {url: image_url for url, (image_url, ok) in results.items() if ok},
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    return payload
+
+
+def load_manifest(path=DEFAULT_MANIFEST_PATH, source_digest=None):
+    # source_digest：目前資料的版本；清單來自另一份 Excel 檔時不採用 (文章或已增減)，改由 app 執行時抓取
+    try:
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if payload.get('version') != MANIFEST_VERSION:
+        return {}
+    if source_digest is not None and payload.get('source_digest') != source_digest:
+        logger.warning(
+            "縮圖清單 %s 來自另一版本的資料 (%s)，目前為 %s，將不採用；請重新執行 prefetch_articles。",
+            path, str(payload.get('source_digest'))[:12], source_digest[:12]
+        )
+        return {}
+    return payload.get('images', {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="預先抓取所有相關文章的 og:image，輸出 app 啟動時讀取的縮圖清單。")
+    parser.add_argument('--source', default=None, help="Excel 檔案路徑或 URL (預設為 SCHOOL_DATA_SOURCE 或 DATA_URL)")
+    parser.add_argument('--output', default=DEFAULT_MANIFEST_PATH, help="輸出檔案路徑")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="同時進行的請求數目")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="失敗後重試次數")
+    parser.add_argument('--host-interval', type=float, default=DEFAULT_HOST_INTERVAL, help="同一網站兩次請求之間最少相隔的秒數")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    started = time.perf_counter()
+    workbook = load_workbook(args.source or get_data_source())
+    urls = [url for _, url in article_pairs(workbook.articles_df)]
+    results = prefetch_images(urls, max_workers=args.workers, retries=args.retries, host_interval=args.host_interval)
+    payload = write_manifest(results, args.output, workbook.digest)
+    failed = len(results) - len(payload['images'])
+    print(f"已輸出 {args.output}：{len(payload['images'])} 篇文章，{failed} 篇失敗，用時 {time.perf_counter() - started:.2f} 秒")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- 欄位設定 ---
+TEXT_COLUMNS_FOR_FEATURES = [
+    '學校關注事項', '學習和教學策略', '小學教育課程更新重點的發展', '共通能力的培養', '正確價值觀、態度和行為的培養',
+    '全校參與照顧學生的多樣性', '全校參與模式融合教育', '非華語學生的教育支援', '課程剪裁及調適措施',
+    '家校合作', '校風', '學校發展計劃', '教師專業培訓及發展', '其他未來發展', '辦學宗旨', '全方位學習', '特別室', '其他學校設施'
+]
+PERCENTAGE_COLS = [
+    '已接受師資培訓(佔全校教師人數%)', '學士(佔全校教師人數%)', '碩士、博士或以上 (佔全校教師人數%)', '特殊教育培訓 (佔全校教師人數%)',
+    '0-4年資 (佔全校教師人數%)', '5-9年資(佔全校教師人數%)', '10年或以上年資 (佔全校教師人數%)'
+]
+TEACHER_COUNT_COLS = ['核准編制教師職位數目', '全校教師總人數']
+EXAM_COUNT_COLS = [
+    '一年級全年全科測驗次數', '一年級全年全科考試次數',
+    '二至六年級全年全科測驗次數', '二至六年級全年全科考試次數'
+]
+YES_NO_COLS = {
+    '小一上學期以多元化的進展性評估代替測驗及考試': 'p1_no_exam_assessment',
+    '避免緊接在長假期後安排測考，讓學生在假期有充分的休息': 'avoid_holiday_exams',
+    '按校情靈活編排時間表，盡量在下午安排導修時段，讓學生能在教師指導下完成部分家課': 'afternoon_tutorial',
+    '家教會': 'has_pta'
+}
+FEEDER_COLS = ['一條龍中學', '直屬中學', '聯繫中學']
+# 只以文字儲存的欄位 -> (數值欄位, 類型)；供範圍篩選使用
+PARSED_COLS = {
+    '學費': ('tuition_fee', 'amount'), '堂費': ('hall_fee', 'amount'),
+    '一般上學時間': ('school_start_minutes', 'clock'), '一般放學時間': ('school_end_minutes', 'clock'),
+    '學校佔地面積': ('site_area_sqm', 'number'), '創校年份': ('founded_year', 'number'),
+    '每週上學日數': ('school_days_per_week', 'number'),
+}
+FEE_COLS = ['學費', '堂費']
+ARTICLE_COLS = ['學校名稱', '文章標題', '文章連結']
+
+
+def standardize_category(cat):
+    cat_str = str(cat)
+    if '官立' in cat_str: return '官立'
+    if '直資' in cat_str: return '直資'
+    if '資助' in cat_str: return '資助'
+    if '私立' in cat_str: return '私立'
+    return cat
+
+
+def group_articles(articles_df):
+    articles_df = articles_df.dropna(subset=['文章標題', '文章連結'])
+    pairs = pd.Series(list(zip(articles_df['文章標題'], articles_df['文章連結'])), index=articles_df.index)
+    return pairs.groupby(articles_df['學校名稱']).agg(list).reset_index(name='articles')
+
+
+def to_percentage(series):
+    # 整欄判斷：若所有數值都不大於 1，視為小數並換算成百分比
+    s = pd.to_numeric(series.astype(str).str.replace('%', '', regex=False), errors='coerce').fillna(0)
+    if not s.empty and s.max() > 0 and s.max() <= 1: s = s * 100
+    return s.round(1)
+
+
+# --- 核心功能函式 (處理資料) ---
+def process_dataframe(df, articles_df=None, warn=logger.warning):
+    # 不修改傳入的資料表：快取中的原始工作表可安全地重複使用
+    df = df.replace('-', '沒有')
+
+    if articles_df is not None and not articles_df.empty:
+        if all(col in articles_df.columns for col in ARTICLE_COLS):
+            df = pd.merge(df, group_articles(articles_df), on='學校名稱', how='left')
+            df['articles'] = df['articles'].apply(lambda x: x if isinstance(x, list) else [])
+        else:
+            warn("Excel 檔案中的「相關文章」工作表缺少必要的欄位（學校名稱, 文章標題, 文章連結），將忽略相關文章。")
+            df['articles'] = [[] for _ in range(len(df))]
+    else:
+        df['articles'] = [[] for _ in range(len(df))]
+
+    df['full_text_search'] = df.astype(str).agg(' '.join, axis=1)
+
+    existing_feature_columns = [col for col in TEXT_COLUMNS_FOR_FEATURES if col in df.columns]
+    df['features_text'] = df[existing_feature_columns].fillna('').astype(str).agg(' '.join, axis=1)
+    for col in PERCENTAGE_COLS:
+        if col in df.columns:
+            df[col] = to_percentage(df[col])
+
+    for col in TEACHER_COUNT_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    for col in EXAM_COUNT_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+
+    for col, new_name in YES_NO_COLS.items():
+        if col in df.columns:
+            is_yes = df[col].astype(str).str.strip().str.lower().isin(['有', 'yes'])
+            df[new_name] = is_yes.map({True: '是', False: '否'})
+
+    if '學校類別' in df.columns:
+        df['學校類別'] = df['學校類別'].apply(standardize_category)
+
+    bus_series = df['校車服務'].fillna('沒有').astype(str) if '校車服務' in df.columns else pd.Series('沒有', index=df.index)
+    has_bus_data = bus_series.str.strip().isin(['', '沒有']) == False
+    df['has_school_bus'] = '否'
+    df.loc[has_bus_data, 'has_school_bus'] = '是'
+    df['bus_service_text'] = '沒有'
+    cond_both = bus_series.str.contains("校車") & bus_series.str.contains("保姆車")
+    cond_bus_only = bus_series.str.contains("校車") & ~bus_series.str.contains("保姆車")
+    cond_nanny_only = ~bus_series.str.contains("校車") & bus_series.str.contains("保姆車")
+    df.loc[cond_both, 'bus_service_text'] = '有校車及保姆車'
+    df.loc[cond_bus_only, 'bus_service_text'] = '有校車'
+    df.loc[cond_nanny_only, 'bus_service_text'] = '有保姆車'
+
+    existing_feeder_cols = [col for col in FEEDER_COLS if col in df.columns]
+    if existing_feeder_cols:
+        # 逐欄向量化判斷，取代逐行 apply(axis=1)
+        feeder_values = df[existing_feeder_cols]
+        has_value = feeder_values.notna() & ~feeder_values.astype(str).apply(lambda s: s.str.strip()).isin(['', '沒有'])
+        df['has_feeder_school'] = has_value.any(axis=1).map({True: '是', False: '否'})
+    else:
+        df['has_feeder_school'] = '否'
+
+    # 放在最後：解析出的數值欄位不應出現在 full_text_search 內
+    return parse_text_fields(df)
+
+
+# --- 文字欄位轉為數值 ---
+# 載入資料時一次過以向量化的正規表示式解析，重跑時的範圍篩選只是數值比較。
+NUMBER_PATTERN = r'(\d[\d,]*(?:\.\d+)?)'
+AMOUNT_PATTERN = r'\$?\s*' + NUMBER_PATTERN
+CLOCK_PATTERN = r'(上午|下午)?\s*(\d{1,2})\s*[:：]\s*(\d{2})'
+
+
+def has_text_values(series):
+    return series.notna() & ~series.astype(str).str.strip().isin(['', '沒有'])
+
+
+def parse_numbers(series, pattern=NUMBER_PATTERN):
+    # 取第一個數字，例如「$52000 P13$52000,P46$53000」-> 52000、「約 4000平方米」-> 4000
+    extracted = series.astype(str).str.extract(pattern, expand=False).str.replace(',', '', regex=False)
+    return pd.to_numeric(extracted, errors='coerce').where(has_text_values(series))
+
+
+def parse_clock(series):
+    # 「上午 8:00」-> 480、「下午 3:30」-> 930 (由午夜起計的分鐘)
+    parts = series.astype(str).str.extract(CLOCK_PATTERN)
+    hours = pd.to_numeric(parts[1], errors='coerce')
+    minutes = pd.to_numeric(parts[2], errors='coerce')
+    hours = hours.where(~((parts[0] == '下午') & (hours < 12)), hours + 12)
+    return (hours * 60 + minutes).where(has_text_values(series))
+
+
+def parse_text_fields(df):
+    parsers = {'amount': lambda s: parse_numbers(s, AMOUNT_PATTERN), 'clock': parse_clock, 'number': parse_numbers}
+    for col, (new_name, kind) in PARSED_COLS.items():
+        if col not in df.columns:
+            df[new_name] = 0.0 if col in FEE_COLS else np.nan
+            continue
+        values = parsers[kind](df[col]).astype(float)
+        if col in FEE_COLS:
+            # 資助及官立學校不收學費，空白即 0；有文字但無法解析的仍為 NaN
+            values = values.where(has_text_values(df[col]), 0.0)
+        df[new_name] = values
+    df['total_fee'] = df['tuition_fee'] + df['hall_fee']
+
+    # 卡片顯示用，例如「$20500 （分10期繳付）」；學費及堂費都有時以「 / 」分隔
+    fees_text = pd.Series('', index=df.index)
+    for col in FEE_COLS:
+        if col in df.columns:
+            text = df[col].astype(str).str.strip()
+            joined = fees_text.where(fees_text == '', fees_text + ' / ') + text
+            fees_text = joined.where(has_text_values(df[col]), fees_text)
+    df['fees_text'] = fees_text.where(fees_text != '', '沒有')
+    return df
+
+
+def unparsed_values(df):
+    # 有文字但未能解析的欄位值：[學校名稱, 欄位, 原文]
+    frames = []
+    for col, (new_name, _) in PARSED_COLS.items():
+        if col in df.columns and new_name in df.columns:
+            failed = has_text_values(df[col]) & df[new_name].isna()
+            frames.append(pd.DataFrame({'學校名稱': df.loc[failed, '學校名稱'], '欄位': col, '原文': df.loc[failed, col]}))
+    if not frames:
+        return pd.DataFrame(columns=['學校名稱', '欄位', '原文'])
+    return pd.concat(frames).sort_index(kind='stable')
+
+
+# --- 增量處理 ---
+def row_keys(df, articles_df=None):
+    # 每行的鍵：(學校名稱, 原始資料雜湊值, 該校文章雜湊值)；任何一項不同即視為已更改
+    row_hashes = pd.util.hash_pandas_object(df.astype(str), index=False).tolist()
+    article_hashes = {}
+    if articles_df is not None and not articles_df.empty and all(col in articles_df.columns for col in ARTICLE_COLS):
+        grouped = group_articles(articles_df)
+        article_hashes = dict(zip(grouped['學校名稱'], pd.util.hash_array(grouped['articles'].map(repr).to_numpy()).tolist()))
+    return [(name, row_hash, article_hashes.get(name, 0)) for name, row_hash in zip(df['學校名稱'], row_hashes)]
+
+
+def refresh_table(previous, previous_keys, df, articles_df=None, warn=logger.warning):
+    # 以學校名稱及原始內容比對上一版：沒有改動的行直接沿用已處理的結果，只重新處理新增或已更改的行。
+    # 回傳 (資料表, 新的行鍵, 重新處理的行數)
+    keys = row_keys(df, articles_df)
+    if previous is None or previous_keys is None or len(previous_keys) != len(previous):
+        return process_dataframe(df, articles_df, warn=warn), keys, len(df)
+
+    available = {}
+    for position, key in enumerate(previous_keys):
+        available.setdefault(key, []).append(position)
+    reused = np.full(len(keys), -1, dtype=np.int64)
+    for row, key in enumerate(keys):
+        positions = available.get(key)
+        if positions:
+            reused[row] = positions.pop(0)
+    kept = np.flatnonzero(reused >= 0)
+    changed = np.flatnonzero(reused < 0)
+    if len(kept) == 0:
+        return process_dataframe(df, articles_df, warn=warn), keys, len(df)
+
+    parts = [previous.iloc[reused[kept]]]
+    if len(changed):
+        processed = process_dataframe(df.iloc[changed], articles_df, warn=warn)
+        if list(processed.columns) != list(previous.columns):
+            # 欄位有變 (例如工作表新增欄位)：整份重新處理
+            return process_dataframe(df, articles_df, warn=warn), keys, len(df)
+        parts.append(processed)
+    table = pd.concat(parts, ignore_index=True)
+    table = table.iloc[np.argsort(np.concatenate([kept, changed]), kind='stable')].reset_index(drop=True)
+    # 百分比是否要乘以 100 按整欄判斷，須以整份新資料重新計算
+    for col in PERCENTAGE_COLS:
+        if col in table.columns:
+            table[col] = to_percentage(df[col].replace('-', '沒有')).to_numpy()
+    return table, keys, len(changed)
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+
+
+def canonicalize_filters(active_filters):
+    # 多選值排序、條件排序，令次序不同但意思相同的搜尋共用同一個快取項目
+    canonical = []
+    for filter_type, value in active_filters:
+        if isinstance(value, (list, set)):
+            value = tuple(sorted(value))
+        canonical.append((filter_type, value))
+    return tuple(sorted(canonical, key=repr))
+
+
+# --- 跨 session 共用的 LRU 快取 ---
+# 搜尋結果、卡片、圖表、標示結果、detail store 及 BM25 詞頻都以此快取。
+class QueryCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, session_stats=None):
+        # session_stats：可選的 {'hits': n, 'misses': n}，用於記錄個別 session 的命中率
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if session_stats is not None:
+                    session_stats['hits'] = session_stats.get('hits', 0) + 1
+                return self._entries[key]
+            self.misses += 1
+        if session_stats is not None:
+            session_stats['misses'] = session_stats.get('misses', 0) + 1
+        value = compute()
+        self._store({key: value})
+        return value
+
+    def get_many(self, keys, compute_missing):
+        # 批次版本：compute_missing(未命中的鍵) 須回傳 {鍵: 值}，一次過計算所有未命中的項目
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            computed = compute_missing(missing)
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def _store(self, values):
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hit_ratio}
@@ -0,0 +1,97 @@
+import heapq
+
+import numpy as np
+
+from .feature_tags import tag_keywords
+from .highlight import flatten_keywords
+from .query_cache import QueryCache
+from .search_index import COLUMN_SEPARATOR, normalize
+
+# --- BM25 相關程度排序 (可選；預設仍按資料表次序) ---
+# 以 BM25F 的方式合併各欄位：詞頻及文件長度都先按欄位權重加權。
+K1 = 1.2
+B = 0.75
+DEFAULT_COLUMN_WEIGHT = 1.0
+COLUMN_WEIGHTS = {
+    '學校關注事項': 3.0, '辦學宗旨': 2.0, '學習和教學策略': 2.0, '小學教育課程更新重點的發展': 2.0,
+    '共通能力的培養': 1.5, '正確價值觀、態度和行為的培養': 1.5, '全校參與照顧學生的多樣性': 1.5,
+    '全校參與模式融合教育': 1.5, '學校發展計劃': 1.5, '全方位學習': 1.5,
+    '特別室': 0.5, '其他學校設施': 0.5, '相關文章': 0.5,
+}
+MAX_CACHED_TERMS = 1024
+
+
+class Bm25Ranker:
+    def __init__(self, search_index, column_weights=COLUMN_WEIGHTS, precompute_terms=()):
+        self.search_index = search_index
+        self.weights = np.array(
+            [column_weights.get(col, DEFAULT_COLUMN_WEIGHT) for col in search_index.columns], dtype=np.float64
+        )
+        # 每所學校的加權文件長度 (字數)
+        lengths = np.array(
+            [[len(text) for text in document.split(COLUMN_SEPARATOR)] for document in search_index.documents],
+            dtype=np.float64
+        ).reshape(search_index.num_rows, len(self.weights))
+        self.lengths = lengths @ self.weights
+        average = self.lengths.mean() if len(self.lengths) else 0
+        self.length_norm = (1 - B + B * self.lengths / average) if average > 0 else np.ones_like(self.lengths)
+        # 預設標籤的關鍵字在載入資料時先算好並一直保留，其他關鍵字於首次搜尋時計算並快取
+        self._pinned = {}
+        for term in precompute_terms:
+            term = normalize(str(term))
+            self._pinned[term] = self._compute_term_stats(term)
+        self._terms = QueryCache(MAX_CACHED_TERMS)
+
+    @classmethod
+    def from_index(cls, search_index, column_weights=COLUMN_WEIGHTS):
+        return cls(search_index, column_weights, flatten_keywords(tag_keywords().values()))
+
+    def __getstate__(self):
+        # 存入 build 檔案時只保存預先計算的部分，不保存執行時的快取
+        state = self.__dict__.copy()
+        del state['_terms']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._terms = QueryCache(MAX_CACHED_TERMS)
+
+    def _compute_term_stats(self, term):
+        # 回傳 (包含該詞的行位置, 加權詞頻, idf)；候選學校由 n-gram 索引找出，只為這些學校逐欄點算
+        rows = self.search_index.search(term).rows
+        documents = self.search_index.documents
+        frequencies = np.array([
+            sum(weight * text.count(term) for weight, text in zip(self.weights, documents[row].split(COLUMN_SEPARATOR)) if term in text)
+            for row in rows.tolist()
+        ], dtype=np.float64)
+        num_rows = self.search_index.num_rows
+        idf = np.log(1 + (num_rows - len(rows) + 0.5) / (len(rows) + 0.5))
+        return rows, frequencies, idf
+
+    def term_stats(self, term):
+        term = normalize(str(term))
+        if term in self._pinned:
+            return self._pinned[term]
+        return self._terms.get_or_compute(term, lambda: self._compute_term_stats(term))
+
+    def scores(self, rows, terms):
+        # rows：已排序的結果行位置；回傳與 rows 對齊的 BM25 分數
+        scores = np.zeros(len(rows), dtype=np.float64)
+        for term in dict.fromkeys(normalize(str(term)) for term in terms):
+            if not term:
+                continue
+            term_rows, frequencies, idf = self.term_stats(term)
+            positions = np.searchsorted(rows, term_rows)
+            found = positions < len(rows)
+            found[found] = rows[positions[found]] == term_rows[found]
+            tf = frequencies[found]
+            norm = self.length_norm[term_rows[found]]
+            scores[positions[found]] += idf * tf * (K1 + 1) / (tf + K1 * norm)
+        return scores
+
+
+def top_k_page(rows, scores, page, items_per_page):
+    # 以 heap 只選出首 (page + 1) × items_per_page 名，不對所有結果排序；同分時按原有次序
+    k = (page + 1) * items_per_page
+    best = heapq.nlargest(k, range(len(rows)), key=lambda i: (scores[i], -i))
+    return rows[best[page * items_per_page:]]
@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .processing import EXAM_COUNT_COLS, PERCENTAGE_COLS, TEACHER_COUNT_COLS
+
+# 由 process_dataframe 衍生或轉換成數值、不應參與全文搜尋的欄位
+# (數值轉成文字後，搜尋「100」或「0.0」會命中大部分學校)
+DERIVED_COLUMNS = {
+    'articles', 'full_text_search', 'features_text', 'bus_service_text',
+    'has_school_bus', 'has_feeder_school', 'p1_no_exam_assessment', 'avoid_holiday_exams',
+    'afternoon_tutorial', 'has_pta', 'fees_text', 'tuition_fee', 'hall_fee', 'total_fee',
+    'school_start_minutes', 'school_end_minutes', 'site_area_sqm', 'founded_year', 'school_days_per_week',
+    *PERCENTAGE_COLS, *TEACHER_COUNT_COLS, *EXAM_COUNT_COLS,
+}
+ARTICLE_TITLES_COLUMN = '相關文章'
+# 欄位之間以此分隔，避免跨欄位拼出不存在的詞
+COLUMN_SEPARATOR = '\x00'
+
+
+def searchable_columns(table):
+    return [col for col in table.columns if col not in DERIVED_COLUMNS]
+
+
+def cell_to_text(value):
+    if isinstance(value, float) and np.isnan(value):
+        return ''
+    return str(value)
+
+
+def normalize(text):
+    return text.casefold()
+
+
+@dataclass
+class SearchResult:
+    query: str
+    rows: np.ndarray
+
+    def __len__(self):
+        return len(self.rows)
+
+
+# --- 字元 n-gram 倒排索引 ---
+# 以單字及雙字 (bigram) 作索引鍵：中文關鍵字通常只有兩三個字，
+# 查詢時先以 bigram 倒排列表取交集得出候選學校，再只對候選學校逐欄驗證。
+class NgramIndex:
+    def __init__(self, columns, documents, gram_ids, offsets, postings):
+        self.columns = columns
+        # documents[row]：已正規化、以 COLUMN_SEPARATOR 連接各欄位的整行文字，
+        # 用於驗證候選學校；BM25 (見 ranking.py) 按分隔符拆開逐欄點算，毋須另存每欄文字
+        self.documents = documents
+        self._gram_ids = gram_ids
+        self._offsets = offsets
+        self._postings = postings
+
+    @classmethod
+    def from_table(cls, table, columns=None):
+        columns = list(columns) if columns is not None else searchable_columns(table)
+        column_texts = {col: [normalize(cell_to_text(v)) for v in table[col].tolist()] for col in columns}
+        if 'articles' in table.columns:
+            columns.append(ARTICLE_TITLES_COLUMN)
+            column_texts[ARTICLE_TITLES_COLUMN] = [
+                normalize(' '.join(str(title) for title, _ in articles)) for articles in table['articles'].tolist()
+            ]
+
+        documents = [COLUMN_SEPARATOR.join(column_texts[col][row] for col in columns) for row in range(len(table))]
+        postings_lists = {}
+        for row, document in enumerate(documents):
+            grams = set(document)
+            grams.update(document[i:i + 2] for i in range(len(document) - 1))
+            grams = {gram for gram in grams if COLUMN_SEPARATOR not in gram}
+            for gram in grams:
+                postings_lists.setdefault(gram, []).append(row)
+
+        gram_ids = {}
+        offsets = np.zeros(len(postings_lists) + 1, dtype=np.int64)
+        for gram_id, (gram, rows) in enumerate(postings_lists.items()):
+            gram_ids[gram] = gram_id
+            offsets[gram_id + 1] = offsets[gram_id] + len(rows)
+        postings = np.fromiter(
+            (row for rows in postings_lists.values() for row in rows), dtype=np.int32, count=int(offsets[-1])
+        )
+        return cls(columns, documents, gram_ids, offsets, postings)
+
+    @property
+    def num_rows(self):
+        return len(self.documents)
+
+    def postings(self, gram):
+        gram_id = self._gram_ids.get(gram)
+        if gram_id is None:
+            return np.empty(0, dtype=np.int32)
+        return self._postings[self._offsets[gram_id]:self._offsets[gram_id + 1]]
+
+    def candidates(self, query):
+        if len(query) == 1:
+            return self.postings(query)
+        grams = {query[i:i + 2] for i in range(len(query) - 1)}
+        lists = sorted((self.postings(gram) for gram in grams), key=len)
+        result = lists[0]
+        for rows in lists[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def search(self, query):
+        query = normalize(str(query))
+        if not query:
+            return SearchResult(query, np.arange(self.num_rows, dtype=np.int32))
+        documents = self.documents
+        rows = [row for row in self.candidates(query).tolist() if query in documents[row]]
+        return SearchResult(query, np.asarray(rows, dtype=np.int32))
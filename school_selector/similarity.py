@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from .processing import EXAM_COUNT_COLS, PERCENTAGE_COLS
+
+# --- 類似學校 ---
+# 每所學校一個向量：features_text 的字元 bigram TF-IDF，加上標準化後的數值欄位。
+# 兩部分各自 L2 正規化，相似度 = TEXT_WEIGHT × 文字餘弦 + (1 - TEXT_WEIGHT) × 數值餘弦。
+TEXT_WEIGHT = 0.7
+NUMERIC_COLS = [*PERCENTAGE_COLS, *EXAM_COUNT_COLS]
+FLAG_COLS = ['has_school_bus', 'has_feeder_school']
+DEFAULT_TOP_K = 5
+
+
+def bigram_codes(texts):
+    # 把所有文字接成一個 Unicode code point 陣列 (以空白分隔各校)，相鄰兩字組成一個 64-bit 鍵；
+    # 中文沒有分詞，以相鄰字元組合作詞彙，跨越空白的組合不計。回傳 (行位置, 鍵)
+    texts = [' '.join(str(text).casefold().split()) for text in texts]
+    codes = np.frombuffer(' '.join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    row_ids = np.repeat(np.arange(len(texts)), [len(text) + 1 for text in texts])[:len(codes)]
+    valid = (codes[:-1] != ord(' ')) & (codes[1:] != ord(' '))
+    keys = (codes[:-1] << 21) | codes[1:]
+    return row_ids[:-1][valid], keys[valid]
+
+
+def _l2_normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def numeric_features(table):
+    columns = []
+    for col in NUMERIC_COLS:
+        if col in table.columns:
+            columns.append(pd.to_numeric(table[col], errors='coerce').to_numpy(dtype=float))
+    for col in FLAG_COLS:
+        if col in table.columns:
+            columns.append((table[col].astype(str) == '是').to_numpy(dtype=float))
+    if not columns or len(table) == 0:
+        return np.zeros((len(table), 0), dtype=np.float32)
+    values = np.column_stack(columns)
+    # 缺失值當作平均值；標準差為 0 的欄位不影響相似度
+    means = np.nanmean(values, axis=0)
+    values = np.where(np.isnan(values), means, values)
+    stds = values.std(axis=0)
+    z_scores = np.divide(values - values.mean(axis=0), stds, out=np.zeros_like(values), where=stds > 0)
+    return _l2_normalize(z_scores).astype(np.float32)
+
+
+class SimilarityIndex:
+    def __init__(self, data, indices, indptr, vocabulary_size, numeric, names):
+        # CSR：第 row 行的非零項為 data[indptr[row]:indptr[row + 1]]，欄位編號在 indices
+        self.data = data
+        self.indices = indices
+        self.indptr = indptr
+        self.vocabulary_size = vocabulary_size
+        self.numeric = numeric
+        self.names = names
+
+    @classmethod
+    def from_table(cls, table, text_column='features_text'):
+        texts = table[text_column].fillna('').astype(str).tolist() if text_column in table.columns else [''] * len(table)
+        num_rows = len(table)
+        row_ids, keys = bigram_codes(texts)
+        _, gram_ids = np.unique(keys, return_inverse=True)
+        num_grams = int(gram_ids.max()) + 1 if len(gram_ids) else 0
+        # (行, 詞彙) 配對排序後即為 CSR 次序，同時得出詞頻
+        pairs, counts = np.unique(row_ids * num_grams + gram_ids, return_counts=True)
+        rows, grams = pairs // max(num_grams, 1), pairs % max(num_grams, 1)
+        document_frequency = np.bincount(grams, minlength=num_grams)
+        # 只出現在一所學校的詞彙不會令任何兩所學校相似，不必保留
+        keep = document_frequency[grams] > 1
+        rows, grams, counts = rows[keep], grams[keep], counts[keep]
+        vocabulary, indices = np.unique(grams, return_inverse=True)
+        indices = indices.astype(np.int32)
+        indptr = np.zeros(num_rows + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(rows, minlength=num_rows))
+
+        # 次線性詞頻 × IDF，再逐行 L2 正規化
+        idf = np.log((1 + num_rows) / (1 + document_frequency[vocabulary])) + 1
+        data = (np.log1p(counts) * idf[indices]).astype(np.float32)
+        norms = np.sqrt(np.bincount(rows, weights=data.astype(np.float64) ** 2, minlength=num_rows))
+        data /= np.where(norms > 0, norms, 1)[rows].astype(np.float32)
+
+        names = table['學校名稱'].fillna('').astype(str).to_numpy() if '學校名稱' in table.columns else np.full(num_rows, '')
+        return cls(data, indices, indptr, len(vocabulary), numeric_features(table), names)
+
+    @property
+    def num_rows(self):
+        return len(self.indptr) - 1
+
+    def scores(self, row):
+        # 一次稀疏矩陣 × 向量：把該校的向量鋪成密集向量，逐項相乘後按行加總
+        start, end = self.indptr[row], self.indptr[row + 1]
+        query = np.zeros(self.vocabulary_size, dtype=np.float32)
+        query[self.indices[start:end]] = self.data[start:end]
+        products = self.data * query[self.indices]
+        text_scores = np.zeros(self.num_rows, dtype=np.float32)
+        non_empty = np.flatnonzero(np.diff(self.indptr))
+        if len(products):
+            text_scores[non_empty] = np.add.reduceat(products, self.indptr[non_empty])
+        numeric_scores = self.numeric @ self.numeric[row] if self.numeric.shape[1] else 0
+        return TEXT_WEIGHT * text_scores + (1 - TEXT_WEIGHT) * numeric_scores
+
+    def top_k(self, row, k=DEFAULT_TOP_K):
+        # 回傳 (行位置, 相似度)，由高至低；不包括該校本身 (及同名、列於另一地區的同一學校)
+        scores = self.scores(row)
+        scores[self.names == self.names[row]] = -np.inf
+        candidates = np.flatnonzero(np.isfinite(scores))
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return top, scores[top]
+
+
+def similar_schools(dataset, row, k=DEFAULT_TOP_K):
+    # 獨立使用：回傳與指定學校最相似的 k 所學校，每項為 {'id', '學校名稱', '地區', 'similarity'}
+    rows, scores = dataset.similarity.top_k(int(row), k)
+    names = dataset.table['學校名稱'].iloc[rows].tolist()
+    districts = dataset.table['地區'].iloc[rows].tolist() if '地區' in dataset.table.columns else [None] * len(rows)
+    return [
+        {'id': int(r), '學校名稱': name, '地區': district, 'similarity': round(float(score), 4)}
+        for r, name, district, score in zip(rows.tolist(), names, districts, scores.tolist())
+    ]
@@ -0,0 +1,182 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# --- 設定 (環境變數) ---
+# SCHOOL_SELECTOR_TIMING=1          記錄每次重跑各階段的時間，並以 JSON 寫入 log
+# SCHOOL_SELECTOR_TIMING_SIDEBAR=1  在側邊欄顯示本次重跑的時間及快取命中率
+# SCHOOL_SELECTOR_METRICS_PORT=9100 以 Prometheus 文字格式在 /metrics 提供累計數據
+def _env_flag(name):
+    return os.environ.get(name, '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+
+ENABLED = _env_flag('SCHOOL_SELECTOR_TIMING')
+SIDEBAR_ENABLED = ENABLED and _env_flag('SCHOOL_SELECTOR_TIMING_SIDEBAR')
+METRICS_PORT = int(os.environ.get('SCHOOL_SELECTOR_METRICS_PORT', 0) or 0)
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+if ENABLED and not logger.handlers:
+    # 每次重跑輸出一行 JSON，方便交給 log 收集工具
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+# --- 進程累計數據 ---
+class StageMetrics:
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {'count': 0, 'sum': 0.0, 'buckets': [0] * len(self.buckets)})
+            entry['count'] += 1
+            entry['sum'] += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: {**entry, 'buckets': list(entry['buckets'])} for stage, entry in self._stages.items()}
+
+    def prometheus_text(self, gauges=None):
+        lines = [
+            '# HELP school_selector_stage_seconds Time spent in each stage of a Streamlit rerun.',
+            '# TYPE school_selector_stage_seconds histogram',
+        ]
+        for stage, entry in sorted(self.snapshot().items()):
+            for bound, count in zip(self.buckets, entry['buckets']):
+                lines.append(f'school_selector_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'school_selector_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'school_selector_stage_seconds_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+            lines.append(f'school_selector_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f'# TYPE school_selector_{name} gauge')
+            lines.append(f'school_selector_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = StageMetrics()
+# 額外匯出的數值，例如快取命中次數：{名稱: 無參數函式}
+_gauge_sources = {}
+
+
+def register_gauge(name, func):
+    _gauge_sources[name] = func
+
+
+def gauge_values():
+    values = {}
+    for name, func in list(_gauge_sources.items()):
+        try:
+            values[name] = func()
+        except Exception:
+            continue
+    return values
+
+
+# --- 每次重跑的計時 ---
+class RerunTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, seconds):
+        self.spans.append((name, seconds))
+        metrics.observe(name, seconds)
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def finish(self):
+        total = self.total
+        metrics.observe('rerun', total)
+        logger.info(json.dumps({
+            'event': 'rerun',
+            'total_ms': round(total * 1000, 2),
+            'spans_ms': {name: round(seconds * 1000, 2) for name, seconds in self.spans},
+        }, ensure_ascii=False))
+        return total
+
+
+_current_timer = contextvars.ContextVar('school_selector_timer', default=None)
+
+
+def start_rerun():
+    if not ENABLED:
+        return None
+    timer = RerunTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+@contextmanager
+def span(name):
+    timer = _current_timer.get() if ENABLED else None
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
+
+
+def record_span(name, started):
+    # 不方便用 with 包住的程式區塊：先記下 time.perf_counter()，完成後再呼叫
+    timer = _current_timer.get() if ENABLED else None
+    if timer is not None:
+        timer.add(name, time.perf_counter() - started)
+
+
+# --- Prometheus 端點 ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.prometheus_text(gauge_values()).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_server_attempted = False
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host='127.0.0.1'):
+    global _metrics_server, _metrics_server_attempted
+    if not port:
+        return None
+    with _metrics_server_lock:
+        if not _metrics_server_attempted:
+            _metrics_server_attempted = True
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                # 多個 worker 共用同一埠時只有第一個能成功開啟
+                logger.warning("無法在埠 %s 開啟 metrics 端點：%s", port, e)
+                return None
+            threading.Thread(target=_metrics_server.serve_forever, name='metrics-server', daemon=True).start()
+    return _metrics_server
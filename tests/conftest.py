@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import pytest
+
+# 快取目錄在 import 時決定：測試使用臨時目錄，不會寫入專案的 .cache
+os.environ.setdefault('SCHOOL_SELECTOR_CACHE_DIR', tempfile.mkdtemp(prefix='school-selector-tests-'))
+
+from school_selector.data_loader import content_hash, read_workbook  # noqa: E402
+from school_selector.dataset import SchoolDataset  # noqa: E402
+from school_selector.processing import process_dataframe  # noqa: E402
+
+# 以附帶的 Excel 檔測試；直接讀取檔案內容，不經 load_workbook，不會寫入快取目錄
+WORKBOOK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'school_data_with_articles.xlsx')
+
+
+@pytest.fixture(scope='session')
+def workbook_path():
+    return WORKBOOK_PATH
+
+
+@pytest.fixture(scope='session')
+def workbook():
+    with open(WORKBOOK_PATH, 'rb') as f:
+        return read_workbook(f.read())
+
+
+@pytest.fixture(scope='session')
+def processed_table(workbook):
+    main_df, articles_df = workbook
+    return process_dataframe(main_df, articles_df)
+
+
+@pytest.fixture(scope='session')
+def dataset(processed_table):
+    # 與 app 相同：常駐資料表加 detail store (存於臨時的快取目錄)
+    with open(WORKBOOK_PATH, 'rb') as f:
+        version = content_hash(f.read())
+    dataset = SchoolDataset.from_table(version, processed_table, compact=False, lazy_details=True)
+    yield dataset
+    dataset.detail_store.close()
@@ -0,0 +1,112 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
+
+import numpy as np
+import pytest
+
+from school_selector.api import QueryError, SchoolApiHandler, encode_cursor, parse_filters, query_schools
+from school_selector.query_cache import QueryCache
+
+
+@pytest.fixture(scope='module')
+def server(dataset):
+    class Handler(SchoolApiHandler):
+        cache = QueryCache()
+        dataset_loader = staticmethod(lambda: dataset)
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(server, path, params=()):
+    url = f"{server}{path}?{urlencode(params, quote_via=quote)}"
+    try:
+        with urlopen(url) as response:
+            return response.status, json.load(response)
+    except HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_parse_filters_matches_app_format():
+    params = {
+        'district': ['沙田區', '大埔區'], 'feature': ['STEAM'], 'q': ['奧數'], 'language': [''],
+        'bus': ['是'], 'min_master': ['40'], 'max_p1_exams': ['2'], 'max_end_time': ['15:30'], 'min_fee': ['1000'],
+    }
+    assert parse_filters(params) == [
+        ('full_text', '奧數'), ('district', ['沙田區', '大埔區']), ('features', ['STEAM']), ('bus', '是'),
+        ('max_p1_exams', 2), ('slider', ('碩士、博士或以上 (佔全校教師人數%)', 40.0)),
+        ('fee', (1000.0, None)), ('end_time', (None, 930)),
+    ]
+
+
+@pytest.mark.parametrize('params', [
+    {'max_end_time': ['25:00']}, {'min_start_time': ['8點']}, {'min_fee': ['abc']}, {'max_fee': ['nan']},
+    {'min_site_area': ['1', '2']}, {'bus': ['有']}, {'feature': ['不存在的標籤']}, {'colour': ['red']},
+])
+def test_invalid_parameters(params):
+    with pytest.raises(QueryError):
+        parse_filters(params)
+
+
+def test_cursor_walk_returns_every_result_once(dataset):
+    params = {'district': ['沙田區', '大埔區', '元朗區'], 'limit': ['7']}
+    expected = dataset.filter_engine.apply(parse_filters(params)).rows.tolist()
+    seen = []
+    cursor = None
+    while True:
+        page = query_schools(dataset, {**params, **({'cursor': [cursor]} if cursor else {})})
+        assert page['total'] == len(expected)
+        seen += [item['id'] for item in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == expected
+    assert len(set(seen)) == len(seen)
+
+
+def test_items_use_the_requested_fields(dataset):
+    page = query_schools(dataset, {'q': ['奧數'], 'fields': ['學校名稱,fees_text,tuition_fee']})
+    rows = [item['id'] for item in page['items']]
+    for item, record in zip(page['items'], dataset.records(rows)):
+        assert set(item) == {'id', '學校名稱', 'fees_text', 'tuition_fee'}
+        assert item['fees_text'] == record['fees_text']
+        assert item['tuition_fee'] == (None if np.isnan(record['tuition_fee']) else record['tuition_fee'])
+
+
+def test_stale_cursor(dataset):
+    with pytest.raises(QueryError):
+        query_schools(dataset, {'cursor': [encode_cursor('0' * 64, 3)]})
+    with pytest.raises(QueryError):
+        query_schools(dataset, {'cursor': ['不是游標']})
+
+
+def test_http_schools(server, dataset):
+    status, payload = get(server, '/schools', [('district', '沙田區'), ('language', ''), ('limit', '5')])
+    assert status == 200
+    assert payload['version'] == dataset.version
+    assert payload['total'] == int((dataset.table['地區'] == '沙田區').sum())
+    assert len(payload['items']) == 5
+
+
+@pytest.mark.parametrize('params', [[('max_end_time', '25:00')], [('min_fee', 'abc')], [('limit', '0')], [('colour', 'red')]])
+def test_http_bad_request(server, params):
+    status, payload = get(server, '/schools', params)
+    assert status == 400
+    assert payload['error']
+
+
+def test_http_similar(server, dataset):
+    status, payload = get(server, '/similar', [('id', '3'), ('k', '4')])
+    assert status == 200
+    assert payload['學校名稱'] == dataset.table['學校名稱'].iloc[3]
+    assert len(payload['items']) == 4 and all(item['id'] != 3 for item in payload['items'])
+    assert get(server, '/similar', [('id', str(len(dataset.table)))])[0] == 400
+    assert get(server, '/unknown')[0] == 404
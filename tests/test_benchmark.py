@@ -0,0 +1,29 @@
+from school_selector.benchmark import ITEMS_PER_PAGE, find_regressions, render_page
+from school_selector.card_renderer import CardRenderer
+
+
+def result(case, ms):
+    return {'scale': 1, 'phase': 'filter', 'case': case, 'min_seconds': ms / 1000}
+
+
+def test_small_differences_are_not_regressions():
+    baseline = [result('homework', 0.12), result('full_text', 40)]
+    # 慢了兩倍但只差 0.23 毫秒：雜訊
+    assert find_regressions([result('homework', 0.35), result('full_text', 41)], baseline, 0.25) == []
+
+
+def test_regressions_need_both_ratio_and_delta():
+    baseline = [result('homework', 2), result('full_text', 40)]
+    regressions = find_regressions([result('homework', 4), result('full_text', 60)], baseline, 0.25)
+    assert regressions == ['filter/homework (x1)：2.00 ms -> 4.00 ms', 'filter/full_text (x1)：40.00 ms -> 60.00 ms']
+    assert find_regressions([result('homework', 4)], baseline, 0.25, min_delta_ms=5) == []
+
+
+def test_render_page_highlights_the_card_feature_fields(dataset):
+    active_filters = [('full_text', '奧數')]
+    html = render_page(dataset, active_filters)
+    rows = dataset.filter_engine.apply(active_filters).page(0, ITEMS_PER_PAGE)
+    cards = CardRenderer(dataset).cards(rows)
+    assert len(html) == sum(len(card.feature_fields) for card in cards)
+    assert all(text.startswith('<p') for text, _ in html)
+    assert any(matched for _, matched in html)
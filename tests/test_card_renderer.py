@@ -0,0 +1,74 @@
+import pytest
+
+from school_selector.card_renderer import (
+    FEATURE_AD_AFTER, FEATURE_TEXT_MAP, METRIC_DELTA_STYLE, TEACHER_RATIO_COLS, CardRenderer, render_card
+)
+
+
+def school(**overrides):
+    return {
+        '學校名稱': '測試小學', '地區': '沙田區', '學校類別': '資助', '校網': '91', 'fees_text': '沒有',
+        'bus_service_text': '有校車', '直屬中學': '測試中學', '聯繫中學': '沒有',
+        '核准編制教師職位數目': 50.0, '全校教師總人數': 53.0,
+        '校風': '1. 推動閱讀 2. 關愛 <b>', '學校關注事項': '自主學習', '家校合作': '',
+        'articles': [('文章', 'https://example.com/a')],
+        **{col: 20.0 for col in TEACHER_RATIO_COLS}, **overrides,
+    }
+
+
+def test_render_card_fields():
+    card = render_card(school())
+    assert card.title == '**測試小學** (沙田區)'
+    assert card.articles == (('文章', 'https://example.com/a'),)
+    assert '<strong>直屬中學:</strong> 測試中學' in card.summary_html
+    # 「沒有」的欄位不顯示，文字須經 escape
+    assert '聯繫中學' not in card.summary_html
+    assert [col for col, _, _ in card.feature_fields] == ['學校關注事項', '校風']
+    assert card.feature_fields[1][2] == '1. 推動閱讀 2. 關愛 <b>'
+    assert card.teacher_ratios == {col: 20.0 for col in TEACHER_RATIO_COLS}
+
+
+def test_ad_position_counts_only_fields_before_the_ad():
+    order = list(FEATURE_TEXT_MAP)
+    after = order[order.index(FEATURE_AD_AFTER) + 1]
+    assert render_card(school(**{order[0]: '甲', order[1]: '乙', after: '丙'})).feature_ad_after == 2
+    assert render_card(school(學校關注事項='', 校風='乙')).feature_ad_after == 0
+
+
+@pytest.mark.parametrize('approved, total, expected', [
+    (50.0, 53.0, '↑ +3'), (50.0, 48.0, '↓ -2'), (float('nan'), 53.0, None),
+])
+def test_teacher_metrics(approved, total, expected):
+    html = render_card(school(核准編制教師職位數目=approved, 全校教師總人數=total)).summary_html
+    assert f'{int(total)} 人' in html
+    if expected is None:
+        assert METRIC_DELTA_STYLE not in html
+    else:
+        assert f'<div style="{METRIC_DELTA_STYLE}">{expected}</div>' in html
+
+
+def test_html_is_escaped():
+    assert '&lt;script&gt;' in render_card(school(學校類別='<script>')).summary_html
+
+
+class CountingDataset:
+    def __init__(self, dataset):
+        self.version = dataset.version
+        self.dataset = dataset
+        self.requested = []
+
+    def records(self, rows):
+        self.requested.append(list(rows))
+        return self.dataset.records(rows)
+
+
+def test_renderer_matches_full_records_and_caches(dataset):
+    counting = CountingDataset(dataset)
+    renderer = CardRenderer(counting)
+    cards = renderer.cards([5, 3, 5])
+    assert cards[0] is cards[2]
+    assert cards == [render_card(record) for record in dataset.records([5, 3, 5])]
+    # 未命中的學校一次過讀取；命中快取時不再讀取資料
+    assert renderer.cards([3, 8])[0] is cards[1]
+    assert counting.requested == [[5, 3], [8]]
+    assert len(renderer) == 3
@@ -0,0 +1,71 @@
+import base64
+
+import numpy as np
+import pandas as pd
+
+from school_selector.charts import CHART_SPECS, MAX_COMPARISON_SCHOOLS, ChartCache, comparison_figure, pie_figure
+
+
+def values(data):
+    # figure JSON 以 base64 存放數值陣列 (plotly.js 的 typed array 格式)
+    if isinstance(data, dict):
+        return np.frombuffer(base64.b64decode(data['bdata']), dtype=data['dtype']).tolist()
+    return list(data)
+
+
+def ratios(edu=(60.0, 40.0), exp=(10.0, 20.0, 70.0)):
+    values = dict(zip([col for _, col in CHART_SPECS['edu'][1]], edu))
+    values.update(zip([col for _, col in CHART_SPECS['exp'][1]], exp))
+    return values
+
+
+def test_pie_is_cached_per_version_row_and_kind():
+    cache = ChartCache()
+    fig = cache.pie('v1', 3, 'edu', ratios())
+    assert values(fig.data[0]['values']) == [60.0, 40.0]
+    assert list(fig.data[0]['labels']) == ['學士', '碩士或以上']
+    # 同一個鍵直接使用快取 (即使傳入的數值不同)
+    assert values(cache.pie('v1', 3, 'edu', ratios(edu=(1.0, 1.0))).data[0]['values']) == [60.0, 40.0]
+    assert values(cache.pie('v2', 3, 'edu', ratios(edu=(1.0, 1.0))).data[0]['values']) == [1.0, 1.0]
+    assert values(cache.pie('v1', 3, 'exp', ratios()).data[0]['values']) == [10.0, 20.0, 70.0]
+    assert len(cache) == 3
+
+
+def test_cached_figures_are_independent_copies():
+    cache = ChartCache()
+    fig = cache.pie('v1', 3, 'edu', ratios())
+    fig.update_layout(height=10)
+    assert cache.pie('v1', 3, 'edu', ratios()).layout.height == 380
+
+
+def test_no_data_is_cached_as_none():
+    cache = ChartCache()
+    assert pie_figure('edu', [0, 0]) is None
+    assert cache.pie('v1', 4, 'edu', ratios(edu=(0.0, np.nan))) is None
+    assert cache.pie('v1', 4, 'edu', ratios()) is None
+    assert len(cache) == 1
+
+
+def test_comparison_figure():
+    table = pd.DataFrame({
+        '學校名稱': ['甲', '乙', '甲'], '地區': ['沙田區', '大埔區', '元朗區'],
+        **{col: [10.0, np.nan, 30.0] for _, col in CHART_SPECS['edu'][1]},
+    })
+    fig = comparison_figure('edu', table, [2, 0])
+    assert len(fig.data) == 2
+    assert values(fig.data[0]['x']) == [30.0, 10.0]
+    assert list(fig.layout.yaxis.ticktext) == ['甲 (元朗區)', '甲 (沙田區)']
+    assert values(comparison_figure('edu', table, [1]).data[0]['x']) == [0.0]
+
+
+def test_comparison_is_cached_per_row_set_and_limited():
+    table = pd.DataFrame({
+        '學校名稱': [f'學校{i}' for i in range(MAX_COMPARISON_SCHOOLS + 5)], '地區': '沙田區',
+        **{col: 50.0 for _, col in CHART_SPECS['exp'][1]},
+    })
+    cache = ChartCache()
+    fig = cache.comparison('v1', table, np.arange(len(table)), 'exp')
+    assert len(values(fig.data[0]['x'])) == MAX_COMPARISON_SCHOOLS
+    cache.comparison('v1', table, np.arange(len(table)), 'exp')
+    cache.comparison('v1', table, np.arange(3), 'exp')
+    assert len(cache) == 2
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from school_selector.compact import (
+    CONCATENATED_TEXT_COLS, FLAG_COLS, LOW_CARDINALITY_COLS, compact_table, compare_memory, dataset_memory_report,
+    deep_sizeof
+)
+from school_selector.feature_tags import TagMatrix
+from school_selector.filter_engine import FilterEngine
+from school_selector.processing import PERCENTAGE_COLS
+from school_selector.search_index import NgramIndex
+
+
+@pytest.fixture(scope='module')
+def compact(processed_table):
+    return compact_table(processed_table)
+
+
+def test_dtypes(processed_table, compact):
+    assert not set(CONCATENATED_TEXT_COLS) & set(compact.columns)
+    for col in FLAG_COLS:
+        assert list(compact[col].cat.categories) == ['否', '是']
+    for col in LOW_CARDINALITY_COLS:
+        assert isinstance(compact[col].dtype, pd.CategoricalDtype)
+    for col in PERCENTAGE_COLS:
+        assert compact[col].dtype == np.float32
+    assert pd.api.types.is_string_dtype(compact['校風']) and compact['校風'].dtype != object
+    # 非文字的 object 欄位 (文章列表) 保持原樣
+    assert compact['articles'].dtype == object
+
+
+def test_values_are_unchanged(processed_table, compact):
+    for col in compact.columns:
+        before, after = processed_table[col], compact[col]
+        if col in PERCENTAGE_COLS:
+            np.testing.assert_allclose(after.to_numpy(dtype=float), before.to_numpy(dtype=float), atol=1e-4)
+        else:
+            assert after.isna().tolist() == before.isna().tolist(), col
+            assert after[after.notna()].astype(object).tolist() == before[before.notna()].tolist(), col
+
+
+@pytest.mark.parametrize('active_filters', [
+    [('district', ['沙田區', '大埔區']), ('bus', '是')],
+    [('gender', ['女']), ('language', '英文')],
+    [('slider', ('碩士、博士或以上 (佔全校教師人數%)', 40)), ('max_p1_exams', 1)],
+    [('full_text', '奧數'), ('features', ['閱讀'])],
+])
+def test_filters_give_the_same_rows(processed_table, compact, active_filters):
+    search_index, tag_matrix = NgramIndex.from_table(processed_table), TagMatrix.from_table(processed_table)
+    full = FilterEngine(processed_table, search_index, tag_matrix).apply(active_filters).rows
+    np.testing.assert_array_equal(FilterEngine(compact, search_index, tag_matrix).apply(active_filters).rows, full)
+
+
+def test_compact_table_uses_less_memory(processed_table):
+    report, before, after = compare_memory(processed_table)
+    assert after < before / 2
+    assert report.loc['full_text_search', 'bytes_after'] == 0
+
+
+def test_deep_sizeof_counts_shared_objects_once():
+    array = np.zeros(1000)
+    shared = {'a': array, 'b': array}
+    assert deep_sizeof(shared) < deep_sizeof({'a': array, 'b': np.zeros(1000)})
+    assert deep_sizeof(array) >= array.nbytes
+
+
+def test_dataset_memory_report(dataset):
+    report = dataset_memory_report(dataset)
+    assert 'version' not in report
+    assert report['table'] >= dataset.table.memory_usage(deep=True).sum()
+    # filter_engine 引用的資料表已計入 table
+    assert report['filter_engine'] < deep_sizeof(dataset.filter_engine)
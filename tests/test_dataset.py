@@ -0,0 +1,117 @@
+import logging
+import os
+import shutil
+import time
+
+import pandas as pd
+import pytest
+
+from school_selector.build import build_artifact, load_prebuilt_artifact, write_artifact
+from school_selector.data_loader import ARTICLES_SHEET, MAIN_SHEET, clear_workbook_cache, known_digest
+from school_selector.dataset import DatasetRefresher, clear_datasets, load_dataset
+
+
+@pytest.fixture
+def no_artifact(tmp_path):
+    # 不採用 build 的輸出，直接讀取 Excel 檔
+    return os.path.join(tmp_path, 'missing.pkl')
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    clear_datasets()
+    clear_workbook_cache()
+    yield
+    clear_datasets()
+    clear_workbook_cache()
+
+
+def test_dataset_is_shared_within_the_process(workbook_path, no_artifact):
+    dataset = load_dataset(workbook_path, artifact_path=no_artifact)
+    assert load_dataset(workbook_path, artifact_path=no_artifact) is dataset
+    assert known_digest(workbook_path) == dataset.version
+
+
+def test_clearing_caches_rebuilds_the_same_version(workbook_path, no_artifact):
+    dataset = load_dataset(workbook_path, artifact_path=no_artifact)
+    clear_datasets()
+    clear_workbook_cache()
+    assert known_digest(workbook_path) is None
+    rebuilt = load_dataset(workbook_path, artifact_path=no_artifact)
+    assert rebuilt is not dataset
+    assert rebuilt.version == dataset.version
+    assert len(rebuilt.table) == len(dataset.table)
+
+
+def test_records_merge_resident_and_detail_columns(workbook_path, no_artifact, processed_table):
+    dataset = load_dataset(workbook_path, artifact_path=no_artifact)
+    record = dataset.records([3])[0]
+    for col in ['學校名稱', '地區', '校風', 'fees_text', 'articles']:
+        assert record[col] == processed_table[col].iloc[3]
+
+
+def write_workbook(path, main_df, articles_df):
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        main_df.to_excel(writer, sheet_name=MAIN_SHEET, index=False)
+        articles_df.to_excel(writer, sheet_name=ARTICLES_SHEET, index=False)
+
+
+@pytest.fixture
+def built(tmp_path, workbook_path):
+    # 複製附帶的 Excel 檔並執行 build，回傳 (Excel 檔, 預先處理的資料表)
+    source = os.path.join(tmp_path, 'schools.xlsx')
+    shutil.copy(workbook_path, source)
+    artifact_path = os.path.join(tmp_path, 'school_table.pkl')
+    write_artifact(build_artifact(source), artifact_path)
+    return source, artifact_path
+
+
+def test_current_artifact_is_used_without_reading_the_source(built):
+    source, artifact_path = built
+    # 只更改 mtime：內容相同，仍然採用預先處理的資料表
+    os.utime(source, (time.time() + 10, time.time() + 10))
+    dataset = load_dataset(source, artifact_path=artifact_path)
+    assert dataset.version == load_prebuilt_artifact(artifact_path)['source_digest']
+    assert known_digest(source) is None
+
+
+def test_artifact_is_ignored_after_the_source_changes(built, workbook, caplog):
+    source, artifact_path = built
+    main_df, articles_df = workbook
+    main_df = main_df.copy()
+    main_df.loc[3, '校風'] = '全新校風 測試'
+    write_workbook(source, main_df, articles_df)
+    dataset = load_dataset(source, artifact_path=artifact_path)
+    assert dataset.version != load_prebuilt_artifact(artifact_path)['source_digest']
+    assert dataset.records([3])[0]['校風'] == '全新校風 測試'
+    assert '不符' in caplog.text
+    # 每個進程只警告一次
+    caplog.clear()
+    load_dataset(source, artifact_path=artifact_path)
+    assert caplog.text == ''
+
+
+def test_refresher_starts_from_the_artifact_and_refreshes_incrementally(built, workbook, caplog):
+    source, artifact_path = built
+    refresher = DatasetRefresher(source, interval=0, artifact_path=artifact_path)
+    # 啟動時不重新讀取及處理來源
+    assert known_digest(source) is None
+    assert refresher.refresh() is False
+
+    main_df, articles_df = workbook
+    main_df = main_df.copy()
+    main_df.loc[3, '校風'] = '全新校風 測試'
+    write_workbook(source, main_df, articles_df)
+    caplog.set_level(logging.INFO, logger='school_selector.dataset')
+    assert refresher.refresh() is True
+    assert refresher.dataset.records([3])[0]['校風'] == '全新校風 測試'
+    # 以預先處理的資料表作為上一版，只重新處理改動的一行
+    assert f"重新處理 1 / {len(main_df)} 行" in caplog.text
+
+    # 下一次更新以上次寫入的資料表為基礎
+    main_df.loc[5, '校風'] = '另一個校風'
+    write_workbook(source, main_df, articles_df)
+    caplog.clear()
+    assert refresher.refresh() is True
+    assert refresher.dataset.records([5])[0]['校風'] == '另一個校風'
+    assert f"重新處理 1 / {len(main_df)} 行" in caplog.text
@@ -0,0 +1,28 @@
+import os
+import sqlite3
+
+import pytest
+
+from school_selector.detail_store import DetailStore
+
+COLUMNS = ['校風', 'fees_text', 'articles']
+
+
+@pytest.mark.parametrize('directory', ['plain', 'with ? # % chars'])
+def test_reads_rows_back(tmp_path, processed_table, directory):
+    store = DetailStore.open_or_build(processed_table, COLUMNS, 'a' * 64, directory=os.path.join(tmp_path, directory))
+    try:
+        assert store.num_rows == len(processed_table)
+        for row, details in zip([7, 3, 7], store.get_many([7, 3, 7])):
+            assert details == {col: processed_table[col].iloc[row] for col in COLUMNS}
+    finally:
+        store.close()
+
+
+def test_store_is_read_only(tmp_path, processed_table):
+    store = DetailStore.open_or_build(processed_table, COLUMNS, 'b' * 64, directory=str(tmp_path))
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            store._conn.execute('DELETE FROM details')
+    finally:
+        store.close()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from school_selector.facets import FACET_FILTERS
+
+CASES = {
+    'none': [],
+    'district': [('district', ['沙田區', '大埔區'])],
+    'district+category': [('district', ['沙田區']), ('category', ['資助', '直資']), ('bus', '是')],
+    'features': [('district', ['沙田區']), ('features', ['資優教育'])],
+    'full_text': [('full_text', '面試'), ('gender', ['男女']), ('max_p1_exams', 2)],
+}
+
+
+@pytest.mark.parametrize('active_filters', CASES.values(), ids=CASES.keys())
+def test_counts_match_value_counts_without_the_facets_own_filter(dataset, active_filters):
+    engine, table = dataset.filter_engine, dataset.table
+    counts = dataset.facets.live_counts(engine, active_filters)
+    for filter_type, col in FACET_FILTERS.items():
+        others = [(t, v) for t, v in active_filters if t != filter_type]
+        expected = table[col].iloc[engine.apply(others).rows].value_counts().to_dict()
+        assert {option: n for option, n in counts[filter_type].items() if n} == expected, filter_type
+
+
+@pytest.mark.parametrize('active_filters', CASES.values(), ids=CASES.keys())
+def test_tag_counts_equal_the_results_after_adding_the_tag(dataset, active_filters):
+    engine = dataset.filter_engine
+    counts = dataset.facets.live_counts(engine, active_filters)['features']
+    selected = next((value for t, value in active_filters if t == 'features'), [])
+    others = [(t, v) for t, v in active_filters if t != 'features']
+    for tag in counts:
+        expected = len(engine.apply(others + [('features', list(dict.fromkeys(selected + [tag])))]))
+        assert counts[tag] == expected, tag
+
+
+def test_options_and_nets(dataset):
+    facets, table = dataset.facets, dataset.table
+    assert facets.options('district') == sorted(table['地區'].dropna().unique())
+    body_counts = table['辦學團體'].value_counts()
+    assert [body_counts[body] for body in facets.options('body')] == sorted(body_counts, reverse=True)
+    nets = facets.nets_for(['沙田區'])
+    assert nets == sorted(table.loc[table['地區'] == '沙田區', '校網'].dropna().unique())
+    assert facets.nets_for([]) == facets.options('net')
+
+
+def test_no_filters_counts_every_school(dataset):
+    counts = dataset.facets.live_counts(dataset.filter_engine, [])
+    assert sum(counts['district'].values()) == np.count_nonzero(dataset.table['地區'].notna())
@@ -0,0 +1,115 @@
+import re
+
+import numpy as np
+import pytest
+
+from school_selector.feature_tags import FEATURE_MAPPING, TagMatrix
+from school_selector.filter_engine import FilterEngine
+from school_selector.search_index import NgramIndex
+
+
+def legacy_filter(df, active_filters):
+    # 重構前 app.py 逐個條件篩選 DataFrame 的做法，作為比較的基準
+    filtered_df = df
+    for filter_type, value in active_filters:
+        if filter_type == 'name': filtered_df = filtered_df[filtered_df['學校名稱'].str.contains(value, case=False, na=False)]
+        elif filter_type == 'category': filtered_df = filtered_df[filtered_df['學校類別'].isin(value)]
+        elif filter_type == 'gender': filtered_df = filtered_df[filtered_df['學生性別'].isin(value)]
+        elif filter_type == 'religion': filtered_df = filtered_df[filtered_df['宗教'].isin(value)]
+        elif filter_type == 'language': filtered_df = filtered_df[filtered_df['教學語言'] == value]
+        elif filter_type == 'body': filtered_df = filtered_df[filtered_df['辦學團體'].isin(value)]
+        elif filter_type == 'feeder': filtered_df = filtered_df[filtered_df['has_feeder_school'] == value]
+        elif filter_type == 'bus': filtered_df = filtered_df[filtered_df['has_school_bus'] == value]
+        elif filter_type == 'full_text':
+            filtered_df = filtered_df[filtered_df['full_text_search'].str.contains(value, case=False, na=False)]
+        elif filter_type == 'district': filtered_df = filtered_df[filtered_df['地區'].isin(value)]
+        elif filter_type == 'net': filtered_df = filtered_df[filtered_df['校網'].isin(value)]
+        elif filter_type == 'features':
+            for option in value:
+                search_terms = []
+                for category in FEATURE_MAPPING.values():
+                    if option in category: search_terms = category[option]; break
+                if search_terms:
+                    regex_pattern = '|'.join([re.escape(term) for term in search_terms])
+                    filtered_df = filtered_df[filtered_df['features_text'].str.contains(regex_pattern, case=False, na=False, regex=True)]
+        elif filter_type == 'slider':
+            col_name, min_val = value; filtered_df = filtered_df[filtered_df[col_name] >= min_val]
+        elif filter_type == 'max_p1_tests': filtered_df = filtered_df[filtered_df['一年級全年全科測驗次數'] <= int(value)]
+        elif filter_type == 'max_p2_6_tests': filtered_df = filtered_df[filtered_df['二至六年級全年全科測驗次數'] <= int(value)]
+        elif filter_type == 'max_p1_exams': filtered_df = filtered_df[filtered_df['一年級全年全科考試次數'] <= int(value)]
+        elif filter_type == 'max_p2_6_exams': filtered_df = filtered_df[filtered_df['二至六年級全年全科考試次數'] <= int(value)]
+        elif filter_type == 'p1_no_exam': filtered_df = filtered_df[filtered_df['p1_no_exam_assessment'] == value]
+        elif filter_type == 'avoid_holiday': filtered_df = filtered_df[filtered_df['avoid_holiday_exams'] == value]
+        elif filter_type == 'afternoon_tut': filtered_df = filtered_df[filtered_df['afternoon_tutorial'] == value]
+    return filtered_df
+
+
+@pytest.fixture(scope='module')
+def engine(processed_table):
+    return FilterEngine(processed_table, NgramIndex.from_table(processed_table), TagMatrix.from_table(processed_table))
+
+
+CASES = {
+    'name': [('name', '聖公會')],
+    'name_case': [('name', 'st')],
+    'category': [('category', ['直資', '私立'])],
+    'gender': [('gender', ['女'])],
+    'religion': [('religion', ['天主教', '佛教'])],
+    'language': [('language', '英文')],
+    'body': [('body', ['保良局', '政府'])],
+    'feeder': [('feeder', '是')],
+    'bus': [('bus', '否')],
+    'full_text': [('full_text', '奧數')],
+    'full_text_case': [('full_text', 'steam')],
+    'full_text_missing': [('full_text', '沒有這個關鍵字的學校')],
+    'district': [('district', ['沙田區', '大埔區'])],
+    'net': [('net', ['元朗區\xa0\xa0\xa0校網編號 : 72'])],
+    'features': [('features', ['STEAM', '閱讀'])],
+    'features_all': [('features', ['資優教育', '境外交流', '電子學習'])],
+    'slider': [('slider', ('碩士、博士或以上 (佔全校教師人數%)', 40))],
+    'max_p1_tests': [('max_p1_tests', 0)],
+    'max_p2_6_tests': [('max_p2_6_tests', 3)],
+    'max_p1_exams': [('max_p1_exams', 1)],
+    'max_p2_6_exams': [('max_p2_6_exams', 2)],
+    'p1_no_exam': [('p1_no_exam', '是')],
+    'avoid_holiday': [('avoid_holiday', '是')],
+    'afternoon_tut': [('afternoon_tut', '否')],
+    'combined': [
+        ('district', ['沙田區', '大埔區']), ('category', ['資助']), ('bus', '是'),
+        ('full_text', '面試'), ('features', ['閱讀']), ('max_p1_exams', 2),
+    ],
+    'combined_empty': [('gender', ['男']), ('language', '英文'), ('religion', ['佛教'])],
+}
+
+
+@pytest.mark.parametrize('active_filters', CASES.values(), ids=CASES.keys())
+def test_matches_legacy_filter(processed_table, engine, active_filters):
+    expected = processed_table.index.get_indexer(legacy_filter(processed_table, active_filters).index)
+    np.testing.assert_array_equal(engine.apply(active_filters).rows, expected)
+
+
+def test_no_filters_returns_every_row(processed_table, engine):
+    np.testing.assert_array_equal(engine.apply([]).rows, np.arange(len(processed_table)))
+
+
+def test_highlight_keywords_follow_filters(engine):
+    result = engine.apply([('full_text', '奧數'), ('features', ['STEAM', '不存在的標籤'])])
+    assert result.highlight_keywords == ['奧數', FEATURE_MAPPING['【教學模式與重點】']['STEAM']]
+
+
+def test_range_filter_excludes_unparsed_values(processed_table, engine):
+    rows = engine.apply([('end_time', (None, 15 * 60 + 30))]).rows
+    end_minutes = processed_table['school_end_minutes'].to_numpy()
+    assert np.all(end_minutes[rows] <= 15 * 60 + 30)
+    assert not np.isnan(end_minutes[rows]).any()
+
+
+def test_unknown_filter_type(engine):
+    with pytest.raises(ValueError):
+        engine.apply([('unknown', 1)])
+
+
+def test_result_rows_are_read_only(engine):
+    rows = engine.apply([('gender', ['女'])]).rows
+    with pytest.raises(ValueError):
+        rows[0] = 0
@@ -0,0 +1,50 @@
+from school_selector.highlight import HIGHLIGHT_TEMPLATE, Highlighter, flatten_keywords, split_list_items
+
+
+def mark(text):
+    return HIGHLIGHT_TEMPLATE.format(text)
+
+
+def test_flatten_keywords():
+    assert flatten_keywords(['奧數', ['STEAM', '創客'], ('閱讀',), '', 0]) == ['奧數', 'STEAM', '創客', '閱讀', '0']
+    assert flatten_keywords(None) == []
+
+
+def test_split_list_items():
+    head, items = split_list_items('關注事項：1. 提升自主學習 (2) 推動閱讀 ③ 關愛')
+    assert head == '關注事項：'
+    assert items == [('1.', '提升自主學習'), ('(2)', '推動閱讀'), ('③', '關愛')]
+
+
+def test_longer_keywords_win_and_matching_ignores_case():
+    html, matched = Highlighter(['學習', '電子學習', 'steam']).format('推動電子學習及 STEAM 教育，重視學習')
+    assert matched
+    assert html == f'<p style="margin:0; padding:0;">推動{mark("電子學習")}及 {mark("STEAM")} 教育，重視{mark("學習")}</p>'
+
+
+def test_list_items_are_marked_separately():
+    html, matched = Highlighter([['閱讀']]).format('1. 推動閱讀 2. 發展體育')
+    assert matched
+    assert html.count('<div style="margin-left: 2em;') == 2
+    assert f'1. 推動{mark("閱讀")}</div>' in html
+    assert mark('體育') not in html
+
+
+def test_no_keywords_or_no_match():
+    assert Highlighter([]).format('推動閱讀') == ('<p style="margin:0; padding:0;">推動閱讀</p>', False)
+    assert Highlighter(['奧數']).format('推動閱讀')[1] is False
+    assert Highlighter(['奧數']).format('   ') == ('', False)
+
+
+def test_keywords_are_escaped():
+    html, matched = Highlighter(['C++', 'a.b']).format('學習 C++ 及 axb')
+    assert matched
+    assert mark('C++') in html and mark('axb') not in html
+
+
+def test_format_cached_reuses_the_result():
+    highlighter = Highlighter(['閱讀'])
+    first = highlighter.format_cached((1, '校風'), '推動閱讀')
+    # 同一個鍵不再重新標示
+    assert highlighter.format_cached((1, '校風'), '另一段文字') is first
+    assert highlighter.format_cached((2, '校風'), '另一段文字') == ('<p style="margin:0; padding:0;">另一段文字</p>', False)
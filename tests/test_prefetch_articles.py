@@ -0,0 +1,131 @@
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from school_selector.article_images import ArticleImageCache, ArticleImageFetcher
+from school_selector.prefetch_articles import MANIFEST_VERSION, load_manifest, prefetch_images, write_manifest
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'articles')
+RETRIES = 2
+
+# 路徑 -> (失敗時的狀態碼, 失敗次數)；失敗次數用完後回傳 og_image.html
+FAILURES = {
+    '/missing': (404, None),
+    '/flaky-503': (503, RETRIES),
+    '/rate-limited': (429, RETRIES),
+    '/always-500': (500, None),
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # 離線代替真正的文章網站：按路徑回傳 fixtures/articles 的 HTML 或指定的錯誤
+    requests = Counter()
+
+    def do_GET(self):
+        self.requests[self.path] += 1
+        status, times = FAILURES.get(self.path, (None, 0))
+        if status is not None and (times is None or self.requests[self.path] <= times):
+            self.send_error(status)
+            return
+        name = 'og_image.html' if self.path in FAILURES else self.path.lstrip('/')
+        with open(os.path.join(FIXTURE_DIR, name), 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        # 不聲明 charset，由頁面的 <meta charset> 決定編碼
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_requests():
+    FixtureHandler.requests.clear()
+
+
+def prefetch(urls):
+    return prefetch_images(urls, max_workers=2, retries=RETRIES, backoff=0, host_interval=0)
+
+
+def test_extracts_og_image(server):
+    results = prefetch([f"{server}/og_image.html", f"{server}/big5.html", f"{server}/no_og_image.html"])
+    assert results == {
+        f"{server}/og_image.html": ('https://images.example.com/學校/封面.jpg', True),
+        f"{server}/big5.html": ('https://images.example.com/圖片.jpg', True),
+        # 頁面沒有 og:image 亦算成功，不會再嘗試
+        f"{server}/no_og_image.html": (None, True),
+    }
+
+
+def test_does_not_retry_client_errors(server):
+    assert prefetch([f"{server}/missing"]) == {f"{server}/missing": (None, False)}
+    assert FixtureHandler.requests['/missing'] == 1
+
+
+@pytest.mark.parametrize('path', ['/flaky-503', '/rate-limited'])
+def test_retries_server_errors_and_rate_limits(server, path):
+    assert prefetch([f"{server}{path}"]) == {f"{server}{path}": ('https://images.example.com/學校/封面.jpg', True)}
+    assert FixtureHandler.requests[path] == RETRIES + 1
+
+
+def test_gives_up_after_retries(server):
+    assert prefetch([f"{server}/always-500"]) == {f"{server}/always-500": (None, False)}
+    assert FixtureHandler.requests['/always-500'] == RETRIES + 1
+
+
+def test_duplicate_urls_are_fetched_once(server):
+    prefetch([f"{server}/og_image.html"] * 3)
+    assert FixtureHandler.requests['/og_image.html'] == 1
+
+
+def test_manifest_round_trip(tmp_path):
+    results = {
+        'https://example.com/a': ('https://images.example.com/a.jpg', True),
+        'https://example.com/b': (None, True),
+        'https://example.com/c': (None, False),
+    }
+    path = os.path.join(tmp_path, 'build', 'article_images.json')
+    payload = write_manifest(results, path, source_digest='abc123')
+    assert payload['version'] == MANIFEST_VERSION
+    assert payload['source_digest'] == 'abc123'
+    # 失敗的網址不寫入清單，留待 app 執行時再抓取
+    assert load_manifest(path) == {'https://example.com/a': 'https://images.example.com/a.jpg', 'https://example.com/b': None}
+
+
+def test_load_manifest_ignores_missing_or_outdated_files(tmp_path):
+    assert load_manifest(os.path.join(tmp_path, 'missing.json')) == {}
+    path = os.path.join(tmp_path, 'old.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"version": 0, "images": {"https://example.com/a": "x"}}')
+    assert load_manifest(path) == {}
+
+
+def test_load_manifest_ignores_a_manifest_from_another_workbook(tmp_path, caplog):
+    path = os.path.join(tmp_path, 'article_images.json')
+    write_manifest({'https://example.com/a': ('https://images.example.com/a.jpg', True)}, path, source_digest='abc123')
+    assert load_manifest(path, source_digest='abc123') == {'https://example.com/a': 'https://images.example.com/a.jpg'}
+    assert load_manifest(path, source_digest='def456') == {}
+    assert '另一版本' in caplog.text
+
+
+def test_resolve_prefers_the_given_manifest(tmp_path):
+    cache = ArticleImageCache(os.path.join(tmp_path, 'images.sqlite3'))
+    fetcher = ArticleImageFetcher(cache=cache, manifest={'https://example.com/a': 'old.jpg'})
+    assert fetcher.resolve(['https://example.com/a'], {'https://example.com/a': 'new.jpg'}) == {'https://example.com/a': 'new.jpg'}
+    assert fetcher.resolve(['https://example.com/a']) == {'https://example.com/a': 'old.jpg'}
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from school_selector.processing import parse_text_fields, process_dataframe, refresh_table, row_keys, unparsed_values
+
+
+@pytest.fixture
+def previous(workbook):
+    main_df, articles_df = workbook
+    return process_dataframe(main_df, articles_df), row_keys(main_df, articles_df)
+
+
+def edited_workbook(workbook):
+    # 改動一格文字及一個百分比、刪除一行、加入一所新學校，並為另一所學校加入文章
+    main_df, articles_df = workbook
+    main_df = main_df.copy()
+    main_df.loc[3, '校風'] = '全新校風 測試'
+    main_df.loc[10, '學士(佔全校教師人數%)'] = 0.5
+    new_school = main_df.iloc[[7]].assign(學校名稱='新學校')
+    main_df = pd.concat([main_df, new_school], ignore_index=True).drop(index=20).reset_index(drop=True)
+    new_article = pd.DataFrame({'學校名稱': [main_df.loc[30, '學校名稱']], '文章標題': ['新文章'], '文章連結': ['https://example.com/1']})
+    articles_df = pd.concat([articles_df, new_article], ignore_index=True)
+    return main_df, articles_df
+
+
+def test_refresh_matches_full_reprocess(workbook, previous):
+    main_df, articles_df = edited_workbook(workbook)
+    table, keys, changed_rows = refresh_table(*previous, main_df, articles_df)
+    pd.testing.assert_frame_equal(table, process_dataframe(main_df, articles_df))
+    assert keys == row_keys(main_df, articles_df)
+    # 只重新處理改動的三行 (校風、百分比、文章) 及新學校
+    assert changed_rows == 4
+
+
+def test_refresh_without_changes_reuses_every_row(workbook, previous):
+    main_df, articles_df = workbook
+    table, _, changed_rows = refresh_table(*previous, main_df, articles_df)
+    pd.testing.assert_frame_equal(table, previous[0])
+    assert changed_rows == 0
+
+
+def test_refresh_without_previous_table_processes_everything(workbook):
+    main_df, articles_df = workbook
+    table, _, changed_rows = refresh_table(None, None, main_df, articles_df)
+    pd.testing.assert_frame_equal(table, process_dataframe(main_df, articles_df))
+    assert changed_rows == len(main_df)
+
+
+def test_process_dataframe_does_not_modify_its_input(workbook):
+    main_df, articles_df = workbook
+    before = main_df.copy()
+    process_dataframe(main_df, articles_df)
+    pd.testing.assert_frame_equal(main_df, before)
+
+
+def test_parse_text_fields_ranges():
+    df = pd.DataFrame({
+        '學校名稱': ['甲', '乙', '丙', '丁'],
+        '學費': ['$52000 P13$52000,P46$53000', None, '全免', '$1,200'],
+        '堂費': ['$300', '沒有', None, ''],
+        '一般上學時間': ['上午 8:00', '8：15', None, '上午8:10'],
+        # 「下午」而沒有時間：不能解析，範圍篩選不包括這所學校
+        '一般放學時間': ['下午 3:30', '15:45', '下午', '下午 12:40'],
+        '學校佔地面積': ['約 4,000平方米', '5800.5', '沒有', None],
+        '創校年份': ['1965', '1999年', None, '不詳'],
+    })
+    df = parse_text_fields(df)
+    np.testing.assert_array_equal(df['tuition_fee'], [52000, 0, np.nan, 1200])
+    np.testing.assert_array_equal(df['hall_fee'], [300, 0, 0, 0])
+    np.testing.assert_array_equal(df['total_fee'], [52300, 0, np.nan, 1200])
+    assert df['fees_text'].tolist() == ['$52000 P13$52000,P46$53000 / $300', '沒有', '全免', '$1,200']
+    np.testing.assert_array_equal(df['school_start_minutes'], [480, 495, np.nan, 490])
+    np.testing.assert_array_equal(df['school_end_minutes'], [930, 945, np.nan, 760])
+    np.testing.assert_array_equal(df['site_area_sqm'], [4000, 5800.5, np.nan, np.nan])
+    np.testing.assert_array_equal(df['founded_year'], [1965, 1999, np.nan, np.nan])
+    # 欄位不存在：學費類為 0，其餘為 NaN
+    assert df['school_days_per_week'].isna().all()
+
+    unparsed = unparsed_values(df)
+    assert unparsed[['學校名稱', '欄位', '原文']].values.tolist() == [
+        ['丙', '學費', '全免'], ['丙', '一般放學時間', '下午'], ['丁', '創校年份', '不詳'],
+    ]
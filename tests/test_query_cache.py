@@ -0,0 +1,74 @@
+import threading
+
+from school_selector.query_cache import QueryCache, canonicalize_filters
+
+
+def test_canonicalize_filters_ignores_order():
+    a = [('district', ['沙田區', '大埔區']), ('bus', '是'), ('slider', ('學士(佔全校教師人數%)', 40))]
+    b = [('slider', ('學士(佔全校教師人數%)', 40)), ('bus', '是'), ('district', ['大埔區', '沙田區'])]
+    assert canonicalize_filters(a) == canonicalize_filters(b)
+    assert hash(canonicalize_filters(a))
+    assert canonicalize_filters([('district', ['沙田區'])]) != canonicalize_filters([('net', ['沙田區'])])
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(maxsize=2)
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('b', lambda: 2)
+    # 讀取 a 後，b 變成最久未用
+    assert cache.get_or_compute('a', lambda: 'recomputed') == 1
+    cache.get_or_compute('c', lambda: 3)
+    assert len(cache) == 2
+    assert cache.get_or_compute('b', lambda: 'recomputed') == 'recomputed'
+    assert cache.get_or_compute('c', lambda: 'recomputed') == 3
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 4, 'hit_ratio': 2 / 6}
+
+
+def test_session_stats():
+    cache = QueryCache()
+    session = {'hits': 0, 'misses': 0}
+    cache.get_or_compute('a', lambda: 1, session_stats=session)
+    cache.get_or_compute('a', lambda: 1, session_stats=session)
+    cache.get_or_compute('a', lambda: 1)
+    assert session == {'hits': 1, 'misses': 1}
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_get_many_computes_missing_keys_in_one_batch():
+    cache = QueryCache(maxsize=3)
+    batches = []
+
+    def compute(keys):
+        batches.append(keys)
+        return {key: key * 10 for key in keys}
+
+    assert cache.get_many([1, 2, 1], compute) == [10, 20, 10]
+    assert cache.get_many([2, 3, 4], compute) == [20, 30, 40]
+    assert batches == [[1, 2], [3, 4]]
+    # 容量為 3：最久未用的 1 已被移除
+    assert cache.get_many([1], compute) == [10]
+    assert batches[-1] == [1]
+
+
+def test_clear():
+    cache = QueryCache()
+    cache.get_or_compute('a', lambda: 1)
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get_or_compute('a', lambda: 2) == 2
+
+
+def test_concurrent_use_keeps_the_size_limit():
+    cache = QueryCache(maxsize=50)
+
+    def worker(offset):
+        for i in range(500):
+            cache.get_or_compute((offset + i) % 120, lambda: i)
+
+    threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 50
+    assert cache.hits + cache.misses == 8 * 500
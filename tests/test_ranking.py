@@ -0,0 +1,68 @@
+import math
+import pickle
+
+import numpy as np
+import pytest
+
+from school_selector.ranking import B, K1, top_k_page
+from school_selector.search_index import COLUMN_SEPARATOR
+
+
+@pytest.fixture(scope='module')
+def ranker(dataset):
+    return dataset.ranker
+
+
+def brute_force_scores(search_index, weights, terms):
+    # 直接按 BM25F 公式逐校逐欄計算，不經 n-gram 索引及快取
+    columns = [document.split(COLUMN_SEPARATOR) for document in search_index.documents]
+    lengths = np.array([sum(w * len(text) for w, text in zip(weights, texts)) for texts in columns])
+    average = lengths.mean()
+    scores = np.zeros(len(columns))
+    for term in dict.fromkeys(term.casefold() for term in terms):
+        frequencies = np.array([sum(w * text.count(term) for w, text in zip(weights, texts)) for texts in columns])
+        matched = sum(term in document for document in search_index.documents)
+        idf = math.log(1 + (len(columns) - matched + 0.5) / (matched + 0.5))
+        norm = 1 - B + B * lengths / average
+        scores += np.where(frequencies > 0, idf * frequencies * (K1 + 1) / (frequencies + K1 * norm), 0)
+    return scores
+
+
+@pytest.mark.parametrize('terms', [['奧數'], ['STEAM', '創客'], ['閱讀', '電子學習', 'e-learning'], ['沒有這個詞']])
+def test_scores_match_brute_force(dataset, ranker, terms):
+    rows = np.arange(dataset.search_index.num_rows)
+    expected = brute_force_scores(dataset.search_index, ranker.weights, terms)
+    np.testing.assert_allclose(ranker.scores(rows, terms), expected, rtol=1e-9)
+
+
+def test_scores_follow_the_given_rows(dataset, ranker):
+    rows = dataset.filter_engine.apply([('district', ['沙田區'])]).rows
+    all_scores = ranker.scores(np.arange(dataset.search_index.num_rows), ['閱讀'])
+    np.testing.assert_allclose(ranker.scores(rows, ['閱讀']), all_scores[rows])
+
+
+@pytest.mark.parametrize('active_filters', [[('full_text', '奧數')], [('features', ['STEAM', '閱讀'])]])
+def test_pages_follow_a_full_sort(dataset, ranker, active_filters):
+    result = dataset.filter_engine.apply(active_filters)
+    scores = ranker.scores(result.rows, result.ranking_terms)
+    # 分數由高至低，同分時保持原有次序
+    expected = result.rows[np.lexsort((np.arange(len(scores)), -scores))]
+    pages = [result.page(page, 10, ranker) for page in range((len(result) + 9) // 10)]
+    np.testing.assert_array_equal(np.concatenate(pages), expected)
+
+
+def test_without_ranker_pages_keep_table_order(dataset):
+    result = dataset.filter_engine.apply([('full_text', '奧數')])
+    np.testing.assert_array_equal(result.page(0, 10), result.rows[:10])
+
+
+def test_top_k_page_breaks_ties_by_position():
+    rows = np.array([5, 6, 7, 8])
+    assert top_k_page(rows, np.array([1.0, 2.0, 2.0, 0.0]), 0, 2).tolist() == [6, 7]
+    assert top_k_page(rows, np.array([1.0, 2.0, 2.0, 0.0]), 1, 2).tolist() == [5, 8]
+
+
+def test_precomputed_terms_survive_pickling(dataset, ranker):
+    restored = pickle.loads(pickle.dumps(ranker))
+    rows = np.arange(dataset.search_index.num_rows)
+    np.testing.assert_allclose(restored.scores(rows, ['閱讀', '奧數']), ranker.scores(rows, ['閱讀', '奧數']))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from school_selector.similarity import TEXT_WEIGHT, similar_schools
+
+
+@pytest.fixture(scope='module')
+def index(dataset):
+    return dataset.similarity
+
+
+def dense_text_vectors(index):
+    vectors = np.zeros((index.num_rows, index.vocabulary_size))
+    for row in range(index.num_rows):
+        start, end = index.indptr[row], index.indptr[row + 1]
+        vectors[row, index.indices[start:end]] = index.data[start:end]
+    return vectors
+
+
+def test_text_vectors_are_normalized(index):
+    norms = np.linalg.norm(dense_text_vectors(index), axis=1)
+    np.testing.assert_allclose(norms[norms > 0], 1, rtol=1e-5)
+
+
+@pytest.mark.parametrize('row', [0, 3, 100, 511])
+def test_scores_match_dense_cosine(index, row):
+    vectors = dense_text_vectors(index)
+    expected = TEXT_WEIGHT * (vectors @ vectors[row]) + (1 - TEXT_WEIGHT) * (index.numeric @ index.numeric[row])
+    np.testing.assert_allclose(index.scores(row), expected, atol=1e-5)
+
+
+@pytest.mark.parametrize('row', [0, 3, 100, 511])
+def test_top_k_is_the_best_other_schools(index, row):
+    rows, scores = index.top_k(row, 5)
+    assert row not in rows.tolist()
+    assert np.all(np.diff(scores) <= 0)
+    others = index.scores(row)
+    others[index.names == index.names[row]] = -np.inf
+    # 第 5 名的分數不低於其他學校
+    assert scores[-1] >= np.delete(others, rows).max() - 1e-6
+
+
+def test_similar_schools_excludes_the_query_school(dataset):
+    for row in range(0, len(dataset.table), 37):
+        name = dataset.table['學校名稱'].iloc[row]
+        items = similar_schools(dataset, row, k=10)
+        assert len(items) == 10
+        assert all(item['id'] != row and item['學校名稱'] != name for item in items)
+        assert [item['學校名稱'] for item in items] == dataset.table['學校名稱'].iloc[[item['id'] for item in items]].tolist()
@@ -0,0 +1,84 @@
+import json
+import logging
+import socket
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from school_selector import timing
+from school_selector.timing import StageMetrics, record_span, register_gauge, span, start_metrics_server, start_rerun
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(timing, 'ENABLED', True)
+    monkeypatch.setattr(timing, 'metrics', StageMetrics(buckets=(0.01, 1)))
+    return timing.metrics
+
+
+def test_disabled_timing_records_nothing(monkeypatch):
+    monkeypatch.setattr(timing, 'ENABLED', False)
+    assert start_rerun() is None
+    with span('filter'):
+        pass
+    record_span('render_results', 0)
+
+
+def test_spans_are_recorded_for_the_current_rerun(enabled, caplog):
+    timer = start_rerun()
+    with span('filter'):
+        pass
+    record_span('render_results', timer.started)
+    with pytest.raises(ValueError):
+        with span('facet_counts'):
+            raise ValueError
+    assert [name for name, _ in timer.spans] == ['filter', 'render_results', 'facet_counts']
+
+    caplog.set_level(logging.INFO, logger='school_selector.timing')
+    total = timer.finish()
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line['event'] == 'rerun'
+    assert set(line['spans_ms']) == {'filter', 'render_results', 'facet_counts'}
+    assert line['total_ms'] == round(total * 1000, 2)
+    assert set(enabled.snapshot()) == {'filter', 'render_results', 'facet_counts', 'rerun'}
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = StageMetrics(buckets=(0.01, 1))
+    for seconds in (0.005, 0.5, 2):
+        metrics.observe('filter', seconds)
+    entry = metrics.snapshot()['filter']
+    assert entry['count'] == 3 and entry['sum'] == pytest.approx(2.505)
+    assert entry['buckets'] == [1, 2]
+    text = metrics.prometheus_text({'query_cache_hits': 7})
+    assert 'school_selector_stage_seconds_bucket{stage="filter",le="1"} 2' in text
+    assert 'school_selector_stage_seconds_bucket{stage="filter",le="+Inf"} 3' in text
+    assert 'school_selector_stage_seconds_count{stage="filter"} 3' in text
+    assert 'school_selector_query_cache_hits 7' in text
+
+
+def test_metrics_endpoint(monkeypatch, enabled):
+    monkeypatch.setattr(timing, '_metrics_server', None)
+    monkeypatch.setattr(timing, '_metrics_server_attempted', False)
+    monkeypatch.setattr(timing, '_gauge_sources', {})
+    register_gauge('entries', lambda: 3)
+    register_gauge('broken', lambda: 1 / 0)
+    enabled.observe('filter', 0.002)
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = start_metrics_server(port)
+    try:
+        # 同一進程只開啟一次
+        assert start_metrics_server(port) is server
+        with urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            text = response.read().decode('utf-8')
+        assert 'school_selector_stage_seconds_count{stage="filter"} 1' in text
+        assert 'school_selector_entries 3' in text and 'broken' not in text
+        with pytest.raises(HTTPError):
+            urlopen(f"http://127.0.0.1:{port}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert start_metrics_server(0) is None